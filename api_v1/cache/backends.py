@@ -0,0 +1,449 @@
+import time
+import typing
+from abc import (
+	ABC,
+	abstractmethod
+)
+from secrets import randbits
+
+import aioredis
+
+from api_v1.settings import Settings
+from api_v1.logging import cache_logger
+from api_v1.cache.local import LocalCache
+from api_v1.cache.broker import (
+	Broker,
+	MemoryBroker,
+	RedisBroker
+)
+from api_v1.cache.tags import (
+	INVALIDATE_TAGS_SCRIPT,
+	TAG_VERSIONS_SCRIPT,
+	tag_key,
+	version_key
+)
+
+# only delete the lock if we still own it - a slow holder must not release a lock
+# that has since expired and been taken by another worker
+RELEASE_LOCK_SCRIPT: str = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+	return redis.call('DEL', KEYS[1])
+end
+return 0
+""".strip()
+
+class CacheBackend(ABC):
+
+	'''
+		Where cached responses are stored. Values are bytes, registered under tags so they can be invalidated together
+	'''
+
+	# whether every worker sees the same cache - if not, there is no point in a local cache in front of it
+	shared: bool = False
+
+	@abstractmethod
+	async def get(
+		self: 'CacheBackend',
+		key: str
+	) -> bytes | None:
+		...
+
+	@abstractmethod
+	async def set(
+		self: 'CacheBackend',
+		key: str,
+		value: bytes,
+		ttl_seconds: int,
+		tags: typing.Iterable[str] = ()
+	) -> None:
+		...
+
+	@abstractmethod
+	async def invalidate_tags(
+		self: 'CacheBackend',
+		tags: typing.Iterable[str]
+	) -> int:
+		'''
+			Deletes every value registered under any of the tags, and bumps the version of each tag
+
+			returns the number of values deleted
+		'''
+		...
+
+	@abstractmethod
+	async def versions(
+		self: 'CacheBackend',
+		tags: list[str]
+	) -> list[int]:
+		'''
+			Returns the current version of each tag, which changes whenever the tag is invalidated
+		'''
+		...
+
+	@abstractmethod
+	async def add_expiring(
+		self: 'CacheBackend',
+		key: str,
+		member: str,
+		expires_at: float
+	) -> None:
+		'''
+			Adds a member to a set, until expires_at (a unix timestamp)
+		'''
+		...
+
+	@abstractmethod
+	async def expiring_members(
+		self: 'CacheBackend',
+		key: str
+	) -> dict[str, float]:
+		'''
+			Returns the members of a set that haven't expired yet, and when each expires
+		'''
+		...
+
+	@abstractmethod
+	async def acquire_lock(
+		self: 'CacheBackend',
+		key: str,
+		token: str,
+		timeout: float
+	) -> bool:
+		...
+
+	@abstractmethod
+	async def release_lock(
+		self: 'CacheBackend',
+		key: str,
+		token: str
+	) -> None:
+		...
+
+	@abstractmethod
+	def create_broker(
+		self: 'CacheBackend'
+	) -> Broker:
+		...
+
+	async def close(
+		self: 'CacheBackend'
+	) -> None:
+		...
+
+	def __str__(
+		self: 'CacheBackend'
+	) -> str:
+		return self.__class__.__name__
+
+class MemoryCacheBackend(CacheBackend):
+
+	'''
+		Caches in the memory of this worker, evicting the least recently used values past max_bytes.
+		For deployments without Redis, and for running and benchmarking caching locally
+	'''
+
+	__slots__ = (
+		'values',
+		'_versions',
+		'_locks',
+		'_expiring',
+	)
+
+	def __init__(
+		self: 'MemoryCacheBackend',
+		max_bytes: int
+	):
+
+		self.values: LocalCache = LocalCache(
+			max_bytes = max_bytes
+		)
+		self._versions: dict[str, int] = {}
+		self._locks: dict[str, tuple[str, float]] = {}
+		self._expiring: dict[str, dict[str, float]] = {}
+
+	async def get(
+		self: 'MemoryCacheBackend',
+		key: str
+	) -> bytes | None:
+		return self.values.get(key)
+
+	async def set(
+		self: 'MemoryCacheBackend',
+		key: str,
+		value: bytes,
+		ttl_seconds: int,
+		tags: typing.Iterable[str] = ()
+	) -> None:
+
+		self.values.set(
+			key = key,
+			value = value,
+			size = len(value),
+			ttl_seconds = ttl_seconds,
+			tags = tags
+		)
+
+	async def invalidate_tags(
+		self: 'MemoryCacheBackend',
+		tags: typing.Iterable[str]
+	) -> int:
+
+		tags: list[str] = list(tags)
+
+		for tag in tags:
+			self._versions[tag] = self._version(tag) + 1
+
+		return self.values.invalidate_tags(tags)
+
+	async def versions(
+		self: 'MemoryCacheBackend',
+		tags: list[str]
+	) -> list[int]:
+		return [self._version(tag) for tag in tags]
+
+	def _version(
+		self: 'MemoryCacheBackend',
+		tag: str
+	) -> int:
+		## start at a random version, so that versions from another worker or a restart don't collide
+		return self._versions.setdefault(tag, randbits(48))
+
+	async def add_expiring(
+		self: 'MemoryCacheBackend',
+		key: str,
+		member: str,
+		expires_at: float
+	) -> None:
+
+		members: dict[str, float] = self._expiring.setdefault(key, {})
+		members[member] = max(expires_at, members.get(member, 0.0))
+
+	async def expiring_members(
+		self: 'MemoryCacheBackend',
+		key: str
+	) -> dict[str, float]:
+
+		now: float = time.time()
+		members: dict[str, float] = {
+			member: expires_at for member, expires_at in self._expiring.get(key, {}).items()
+			if expires_at > now
+		}
+		self._expiring[key] = members
+
+		return dict(members)
+
+	async def acquire_lock(
+		self: 'MemoryCacheBackend',
+		key: str,
+		token: str,
+		timeout: float
+	) -> bool:
+
+		now: float = time.monotonic()
+		holder: tuple[str, float] | None = self._locks.get(key, None)
+
+		if holder is not None and holder[1] > now:
+			return False
+
+		self._locks[key] = (token, now + timeout)
+
+		return True
+
+	async def release_lock(
+		self: 'MemoryCacheBackend',
+		key: str,
+		token: str
+	) -> None:
+
+		holder: tuple[str, float] | None = self._locks.get(key, None)
+
+		if holder is not None and holder[0] == token:
+			del self._locks[key]
+
+	def create_broker(
+		self: 'MemoryCacheBackend'
+	) -> Broker:
+		return MemoryBroker()
+
+class RedisCacheBackend(CacheBackend):
+
+	'''
+		Caches in Redis, shared by every worker
+	'''
+
+	shared: bool = True
+
+	__slots__ = (
+		'redis',
+		'tag_ttl_seconds',
+	)
+
+	def __init__(
+		self: 'RedisCacheBackend',
+		redis: aioredis.Redis,
+		tag_ttl_seconds: int
+	):
+
+		self.redis: aioredis.Redis = redis
+		self.tag_ttl_seconds: int = tag_ttl_seconds
+
+	async def get(
+		self: 'RedisCacheBackend',
+		key: str
+	) -> bytes | None:
+		return await self.redis.get(key)
+
+	async def set(
+		self: 'RedisCacheBackend',
+		key: str,
+		value: bytes,
+		ttl_seconds: int,
+		tags: typing.Iterable[str] = ()
+	) -> None:
+
+		# store the value, and register it under its tags, in one round trip
+		async with self.redis.pipeline(transaction = False) as pipe:
+			pipe.set(
+				name = key,
+				value = value,
+				ex = ttl_seconds
+			)
+
+			for tag in tags:
+				pipe.sadd(tag_key(tag), key)
+				pipe.expire(tag_key(tag), max(ttl_seconds, self.tag_ttl_seconds))
+
+			await pipe.execute()
+
+	async def invalidate_tags(
+		self: 'RedisCacheBackend',
+		tags: typing.Iterable[str]
+	) -> int:
+
+		tags: list[str] = list(tags)
+
+		if not tags:
+			return 0
+
+		keys: list[str] = [*map(tag_key, tags), *map(version_key, tags)]
+
+		return await self.redis.eval(INVALIDATE_TAGS_SCRIPT, len(keys), *keys, len(tags))
+
+	async def versions(
+		self: 'RedisCacheBackend',
+		tags: list[str]
+	) -> list[int]:
+
+		if not tags:
+			return []
+
+		versions: list[bytes] = await self.redis.eval(
+			TAG_VERSIONS_SCRIPT,
+			len(tags),
+			*map(version_key, tags),
+			randbits(48)
+		)
+
+		return [int(version) for version in versions]
+
+	async def add_expiring(
+		self: 'RedisCacheBackend',
+		key: str,
+		member: str,
+		expires_at: float
+	) -> None:
+
+		# a sorted set scored by expiry, so the expired members are trimmed in the same round trip
+		async with self.redis.pipeline(transaction = False) as pipe:
+			pipe.zadd(key, {member: expires_at})
+			pipe.zremrangebyscore(key, '-inf', time.time())
+			await pipe.execute()
+
+	async def expiring_members(
+		self: 'RedisCacheBackend',
+		key: str
+	) -> dict[str, float]:
+
+		members: list[tuple[bytes, float]] = await self.redis.zrangebyscore(
+			key,
+			time.time(),
+			'+inf',
+			withscores = True
+		)
+
+		return {member.decode(): expires_at for member, expires_at in members}
+
+	async def acquire_lock(
+		self: 'RedisCacheBackend',
+		key: str,
+		token: str,
+		timeout: float
+	) -> bool:
+
+		return bool(await self.redis.set(
+			name = key,
+			value = token,
+			px = int(timeout * 1000),
+			nx = True
+		))
+
+	async def release_lock(
+		self: 'RedisCacheBackend',
+		key: str,
+		token: str
+	) -> None:
+		await self.redis.eval(RELEASE_LOCK_SCRIPT, 1, key, token)
+
+	def create_broker(
+		self: 'RedisCacheBackend'
+	) -> Broker:
+		return RedisBroker(self.redis)
+
+	async def close(
+		self: 'RedisCacheBackend'
+	) -> None:
+		await self.redis.close()
+
+def selected_cache_backend(
+	settings: Settings
+) -> str:
+	'''
+		The cache backend CACHE_BACKEND selects - if that isn't set, redis when REDIS_ENABLED, and none otherwise.
+		A cache in the memory of each worker never hears about the changes made on the others, so it has to be asked for
+
+		returns str, one of redis, memory or none
+	'''
+
+	return settings.CACHE_BACKEND or ('redis' if settings.REDIS_ENABLED else 'none')
+
+def create_cache_backend(
+	settings: Settings
+) -> CacheBackend | None:
+	'''
+		Creates the cache backend selected by selected_cache_backend
+
+		params:
+			settings : Settings : the application settings
+
+		returns CacheBackend, or None if caching is turned off
+	'''
+
+	backend: str = selected_cache_backend(settings)
+
+	if backend == 'none':
+		return None
+
+	if backend == 'memory':
+		cache_logger.warning(
+			'CACHE_BACKEND is memory: responses are cached per worker, and with more than one worker a change made on '
+			f'one is invisible on the others for up to {settings.CACHE_TTL_SECONDS}s. Use Redis to run more than one worker'
+		)
+
+		return MemoryCacheBackend(
+			max_bytes = settings.CACHE_MEMORY_MAX_BYTES
+		)
+
+	return RedisCacheBackend(
+		redis = aioredis.from_url(settings.REDIS_URL), ## cached responses are stored as bytes
+		tag_ttl_seconds = settings.CACHE_TAG_TTL_SECONDS
+	)
@@ -0,0 +1,183 @@
+import asyncio
+import typing
+from abc import (
+	ABC,
+	abstractmethod
+)
+
+import orjson
+
+from api_v1.logging import cache_logger
+
+# the channel cache invalidations are broadcast on, so every worker can drop its local copies
+INVALIDATION_CHANNEL: str = 'cache:invalidate'
+
+class Broker(ABC):
+
+	'''
+		Publishes messages to, and receives messages from, every worker
+	'''
+
+	@abstractmethod
+	async def publish(
+		self: 'Broker',
+		channel: str,
+		message: bytes
+	) -> None:
+		...
+
+	@abstractmethod
+	def subscribe(
+		self: 'Broker',
+		channel: str
+	) -> typing.AsyncIterator[bytes]:
+		...
+
+class MemoryBroker(Broker):
+
+	'''
+		A broker within a single process - for tests, and deployments running a single worker
+	'''
+
+	__slots__ = (
+		'_subscribers',
+	)
+
+	def __init__(
+		self: 'MemoryBroker'
+	):
+
+		self._subscribers: dict[str, set[asyncio.Queue]] = {}
+
+	async def publish(
+		self: 'MemoryBroker',
+		channel: str,
+		message: bytes
+	) -> None:
+
+		for queue in self._subscribers.get(channel, ()):
+			queue.put_nowait(message)
+
+	async def subscribe(
+		self: 'MemoryBroker',
+		channel: str
+	) -> typing.AsyncIterator[bytes]:
+
+		queue: asyncio.Queue = asyncio.Queue()
+		self._subscribers.setdefault(channel, set()).add(queue)
+
+		try:
+			while True:
+				yield await queue.get()
+		finally:
+			self._subscribers[channel].discard(queue)
+
+class RedisBroker(Broker):
+
+	'''
+		A broker over Redis pub/sub, reaching every worker connected to the same Redis
+	'''
+
+	__slots__ = (
+		'redis',
+	)
+
+	def __init__(
+		self: 'RedisBroker',
+		redis: typing.Any
+	):
+
+		self.redis: typing.Any = redis
+
+	async def publish(
+		self: 'RedisBroker',
+		channel: str,
+		message: bytes
+	) -> None:
+		await self.redis.publish(channel, message)
+
+	async def subscribe(
+		self: 'RedisBroker',
+		channel: str
+	) -> typing.AsyncIterator[bytes]:
+
+		pubsub = self.redis.pubsub(ignore_subscribe_messages = True)
+		await pubsub.subscribe(channel)
+
+		try:
+			async for message in pubsub.listen():
+				if message['type'] == 'message':
+					yield message['data']
+		finally:
+			await pubsub.unsubscribe(channel)
+			await pubsub.close()
+
+async def publish_invalidation(
+	broker: Broker,
+	tags: list[str]
+) -> None:
+	await broker.publish(INVALIDATION_CHANNEL, orjson.dumps(tags))
+
+async def listen(
+	broker: Broker,
+	channel: str,
+	on_message: typing.Callable[[bytes], typing.Any],
+	on_reconnect: typing.Callable[[], typing.Any],
+	retry_seconds: float = 1.0
+) -> None:
+	'''
+		Listens for the messages broadcast by any worker on a channel, until cancelled.
+		If the subscription drops, messages may have been missed - so on_reconnect is called once it's back
+
+		params:
+			broker : Broker : the broker to listen on
+			channel : str : the channel to listen on
+			on_message : callable : called with each message
+			on_reconnect : callable : called whenever the subscription had to be re-established, may be a coroutine function
+			retry_seconds : float (optional) : how long to wait before re-subscribing
+	'''
+
+	reconnecting: bool = False
+
+	while True:
+		try:
+			if reconnecting:
+				result: typing.Any = on_reconnect()
+
+				if asyncio.iscoroutine(result):
+					await result
+
+			async for message in broker.subscribe(channel):
+				on_message(message)
+
+		except asyncio.CancelledError:
+			raise
+		except Exception:
+			cache_logger.exception(f'Subscription to {channel} dropped, re-subscribing...')
+
+		reconnecting = True
+		await asyncio.sleep(retry_seconds)
+
+async def listen_for_invalidations(
+	broker: Broker,
+	on_invalidate: typing.Callable[[list[str]], typing.Any],
+	on_reconnect: typing.Callable[[], typing.Any],
+	retry_seconds: float = 1.0
+) -> None:
+	'''
+		Listens for invalidations broadcast by any worker, until cancelled. See listen
+
+		params:
+			broker : Broker : the broker to listen on
+			on_invalidate : callable : called with the list of invalidated tags
+			on_reconnect : callable : called whenever the subscription had to be re-established
+			retry_seconds : float (optional) : how long to wait before re-subscribing
+	'''
+
+	await listen(
+		broker = broker,
+		channel = INVALIDATION_CHANNEL,
+		on_message = lambda message: on_invalidate(orjson.loads(message)),
+		on_reconnect = on_reconnect,
+		retry_seconds = retry_seconds
+	)
@@ -0,0 +1,118 @@
+import asyncio
+import typing
+from secrets import token_hex
+
+class SingleFlight:
+
+	'''
+		Makes sure that only one computation per key is in flight in this worker.
+		Concurrent callers for the same key await the result of the first caller.
+	'''
+
+	__slots__ = (
+		'_in_flight',
+	)
+
+	def __init__(
+		self: 'SingleFlight'
+	):
+
+		self._in_flight: dict[str, asyncio.Future] = {}
+
+	async def run(
+		self: 'SingleFlight',
+		key: str,
+		compute: typing.Callable[[], typing.Awaitable[typing.Any]]
+	) -> typing.Any:
+		'''
+			Runs compute() for the key, unless a computation for the key is already running
+
+			params:
+				key : str : the key the computation is for
+				compute : callable : a function returning an awaitable that computes the value
+
+			returns the computed value, or raises what compute() raised
+		'''
+
+		future: asyncio.Future | None = self._in_flight.get(key, None)
+
+		if future is not None:
+
+			try:
+				return await asyncio.shield(future)
+			except asyncio.CancelledError:
+				if not future.cancelled():
+					raise
+
+				## the caller doing the work was cancelled, so pick the work up ourselves
+				return await self.run(key, compute)
+
+		future = asyncio.get_running_loop().create_future()
+		self._in_flight[key] = future
+
+		try:
+			result: typing.Any = await compute()
+		except asyncio.CancelledError:
+			future.cancel()
+			raise
+		except BaseException as e:
+			future.set_exception(e)
+			future.exception() ## mark as retrieved, there may be no one waiting on it
+			raise
+		else:
+			future.set_result(result)
+			return result
+		finally:
+			self._in_flight.pop(key, None)
+
+	def __len__(
+		self: 'SingleFlight'
+	) -> int:
+		return len(self._in_flight)
+
+class CacheLock:
+
+	'''
+		A short lived lock in the cache backend, used so that only one worker fills a cache key at a time
+	'''
+
+	__slots__ = (
+		'backend',
+		'key',
+		'token',
+		'timeout',
+		'acquired',
+	)
+
+	def __init__(
+		self: 'CacheLock',
+		backend: 'CacheBackend',
+		key: str,
+		timeout: float
+	):
+
+		self.backend: 'CacheBackend' = backend
+		self.key: str = key
+		self.token: str = token_hex(8)
+		self.timeout: float = timeout
+		self.acquired: bool = False
+
+	async def acquire(
+		self: 'CacheLock'
+	) -> bool:
+
+		self.acquired = await self.backend.acquire_lock(
+			key = self.key,
+			token = self.token,
+			timeout = self.timeout
+		)
+
+		return self.acquired
+
+	async def release(
+		self: 'CacheLock'
+	) -> None:
+
+		if self.acquired:
+			await self.backend.release_lock(self.key, self.token)
+			self.acquired = False
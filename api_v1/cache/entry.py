@@ -0,0 +1,150 @@
+import time
+import typing
+import zlib
+
+from pydantic import BaseModel
+from starlette.responses import Response
+import orjson
+
+def encode_default(
+	obj: typing.Any
+) -> typing.Any:
+	'''
+		Lets orjson serialise the pydantic models returned by routes
+	'''
+
+	if isinstance(obj, BaseModel):
+		return obj.dict()
+
+	raise TypeError
+
+def encode_response(
+	response: typing.Any
+) -> bytes:
+	'''
+		Encodes the return value of a route into the JSON body sent to the client, in one pass
+
+		params:
+			response : any : what the route returned, for example a list of pydantic models
+
+		returns bytes
+	'''
+
+	return orjson.dumps(
+		response,
+		default = encode_default,
+		option = orjson.OPT_NON_STR_KEYS
+	)
+
+# how a cached body is stored, recorded in the header of each value
+IDENTITY_CODEC: bytes = b'identity'
+ZLIB_CODEC: bytes = b'zlib'
+
+class CacheEntry:
+
+	'''
+		A cached response, as the final body bytes sent to the client and their content type.
+		Serving one needs no parsing or encoding at all.
+		Stored as a one line header (when it goes stale, the codec of the body, and the content type) followed by the body,
+		which is compressed with zlib when it is large enough for that to pay off
+	'''
+
+	__slots__ = (
+		'body',
+		'media_type',
+		'stale_at',
+	)
+
+	def __init__(
+		self: 'CacheEntry',
+		body: bytes,
+		media_type: str = 'application/json',
+		stale_at: float = 0.0
+	):
+
+		self.body: bytes = body
+		self.media_type: str = media_type
+		self.stale_at: float = stale_at ## a unix timestamp, 0 if it never goes stale
+
+	@classmethod
+	def from_response(
+		cls: 'CacheEntry',
+		response: typing.Any
+	) -> 'CacheEntry':
+
+		if isinstance(response, Response):
+			return cls(
+				body = response.body,
+				media_type = response.media_type or 'application/octet-stream'
+			)
+
+		return cls(
+			body = encode_response(response)
+		)
+
+	def is_stale(
+		self: 'CacheEntry'
+	) -> bool:
+		return 0 < self.stale_at <= time.time()
+
+	def dumps(
+		self: 'CacheEntry',
+		compression_threshold: int = 0,
+		compression_level: int = 6
+	) -> bytes:
+		'''
+			Serialises the entry for the cache backend
+
+			params:
+				compression_threshold : int (optional) : bodies of at least this many bytes are compressed, 0 to never compress
+				compression_level : int (optional) : the zlib compression level
+
+			returns bytes
+		'''
+
+		codec: bytes = IDENTITY_CODEC
+		body: bytes = self.body
+
+		if compression_threshold and len(body) >= compression_threshold:
+			compressed: bytes = zlib.compress(body, compression_level)
+
+			## JSON nearly always shrinks, but don't pay for decompressing on every hit if it didn't
+			if len(compressed) < len(body):
+				codec, body = ZLIB_CODEC, compressed
+
+		return b"%.3f;%s;%s\n%s" % (self.stale_at, codec, self.media_type.encode(), body)
+
+	@classmethod
+	def loads(
+		cls: 'CacheEntry',
+		raw: bytes
+	) -> 'CacheEntry':
+
+		header, _, body = raw.partition(b"\n")
+		stale_at, _, header = header.partition(b";")
+		codec, _, media_type = header.partition(b";") ## the content type goes last, it may contain ';'
+
+		if codec == ZLIB_CODEC:
+			body = zlib.decompress(body)
+		elif codec != IDENTITY_CODEC:
+			## written before the codec was recorded - the body is uncompressed, and that was the content type
+			media_type = header
+
+		return cls(
+			body = body,
+			media_type = media_type.decode(),
+			stale_at = float(stale_at)
+		)
+
+	def to_response(
+		self: 'CacheEntry'
+	) -> Response:
+		return Response(
+			content = self.body,
+			media_type = self.media_type
+		)
+
+	def __len__(
+		self: 'CacheEntry'
+	) -> int:
+		return len(self.body)
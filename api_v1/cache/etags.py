@@ -0,0 +1,49 @@
+import hashlib
+import typing
+
+def make_etag(
+	identity: str,
+	validators: typing.Iterable[typing.Any]
+) -> str:
+	'''
+		Builds a strong ETag from what identifies a response, and values that change whenever its data does
+
+		params:
+			identity : str : what identifies the response, for example its cache key
+			validators : iterable : for example the versions of the response's tags
+
+		returns str
+	'''
+
+	digest: str = hashlib.blake2b(
+		'|'.join([identity, *map(str, validators)]).encode(),
+		digest_size = 16
+	).hexdigest()
+
+	return f'"{digest}"'
+
+def etag_matches(
+	if_none_match: str | None,
+	etag: str
+) -> bool:
+	'''
+		Checks the If-None-Match header of a request against an ETag, using the weak comparison
+		that If-None-Match calls for
+
+		params:
+			if_none_match : str (optional) : the If-None-Match header
+			etag : str : the current ETag of the response
+
+		returns bool
+	'''
+
+	if not if_none_match:
+		return False
+
+	for candidate in if_none_match.split(','):
+		candidate = candidate.strip()
+
+		if candidate == '*' or candidate.removeprefix('W/') == etag:
+			return True
+
+	return False
@@ -0,0 +1,89 @@
+import hashlib
+import typing
+from enum import Enum
+from urllib.parse import urlencode
+
+from pydantic import BaseModel
+from starlette.background import BackgroundTasks
+from starlette.requests import HTTPConnection
+from starlette.responses import Response
+
+# the arguments FastAPI passes to a route that aren't part of what the route returns
+IGNORED_ARGUMENT_TYPES: tuple[type, ...] = (
+	HTTPConnection,
+	Response,
+	BackgroundTasks
+)
+
+def canonical_value(
+	value: typing.Any
+) -> str:
+
+	if isinstance(value, Enum):
+		return str(value.value)
+
+	if isinstance(value, BaseModel):
+		return value.json(sort_keys = True)
+
+	if isinstance(value, (list, tuple, set, frozenset)):
+		return ','.join(sorted(map(canonical_value, value)))
+
+	return str(value)
+
+def canonical_request(
+	request: HTTPConnection,
+	kwargs: dict[str, typing.Any],
+	vary: typing.Iterable[str] | None = None,
+	vary_by_user: bool = False
+) -> str:
+	'''
+		Builds the canonical form of a call to a route: the path, followed by the route's arguments sorted by name.
+		The scheme, host and order of the query string make no difference, and neither do parameters the route
+		doesn't declare - the arguments are the ones FastAPI already parsed and validated for the route
+
+		params:
+			request : Request : the request
+			kwargs : dict : the keyword arguments the route was called with
+			vary : iterable[str] (optional) : the arguments the response depends on, all of them by default
+			vary_by_user : bool (optional) : whether the response depends on the authenticated user
+
+		returns str
+	'''
+
+	if vary is None:
+		items: list[tuple[str, typing.Any]] = [
+			(name, value) for name, value in kwargs.items()
+			if not isinstance(value, IGNORED_ARGUMENT_TYPES)
+		]
+	else:
+		items: list[tuple[str, typing.Any]] = [(name, kwargs.get(name, None)) for name in vary]
+
+	params: list[tuple[str, str]] = sorted(
+		(name, canonical_value(value)) for name, value in items
+		if value is not None
+	)
+
+	if vary_by_user:
+		params.append(('~user', str(getattr(request.user, 'pk', None) or 'anonymous')))
+
+	return f"{request.url.path.rstrip('/') or '/'}?{urlencode(params)}"
+
+def build_cache_key(
+	request: HTTPConnection,
+	kwargs: dict[str, typing.Any],
+	vary: typing.Iterable[str] | None = None,
+	vary_by_user: bool = False
+) -> str:
+	'''
+		Builds the cache key of a call to a route, a fixed length hash of its canonical form.
+		See canonical_request for the parameters
+
+		returns str
+	'''
+
+	digest: str = hashlib.blake2b(
+		canonical_request(request, kwargs, vary, vary_by_user).encode(),
+		digest_size = 16
+	).hexdigest()
+
+	return f"cache:{digest}"
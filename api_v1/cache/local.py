@@ -0,0 +1,184 @@
+import time
+import typing
+from collections import OrderedDict
+
+class LocalCacheEntry:
+
+	__slots__ = (
+		'value',
+		'size',
+		'expires_at',
+		'tags',
+	)
+
+	def __init__(
+		self: 'LocalCacheEntry',
+		value: typing.Any,
+		size: int,
+		expires_at: float,
+		tags: tuple[str, ...]
+	):
+
+		self.value: typing.Any = value
+		self.size: int = size
+		self.expires_at: float = expires_at
+		self.tags: tuple[str, ...] = tags
+
+class LocalCache:
+
+	'''
+		An in-process LRU cache, with a TTL per entry and bounded by the total size of its entries in bytes.
+		This sits in front of Redis, so that hot responses are served without any I/O.
+		Entries are registered under the same tags as in Redis, so they can be invalidated the same way
+	'''
+
+	__slots__ = (
+		'max_bytes',
+		'ttl_seconds',
+		'size',
+		'generation',
+		'_entries',
+		'_tags',
+	)
+
+	def __init__(
+		self: 'LocalCache',
+		max_bytes: int,
+		ttl_seconds: float | None = None
+	):
+
+		self.max_bytes: int = max_bytes
+		self.ttl_seconds: float | None = ttl_seconds ## caps the TTL of every entry, if set
+		self.size: int = 0
+		# bumped on every invalidation, so that a value computed before an invalidation isn't stored after it
+		self.generation: int = 0
+		self._entries: OrderedDict[str, LocalCacheEntry] = OrderedDict()
+		self._tags: dict[str, set[str]] = {}
+
+	def get(
+		self: 'LocalCache',
+		key: str
+	) -> typing.Any | None:
+
+		entry: LocalCacheEntry | None = self._entries.get(key, None)
+
+		if entry is None:
+			return None
+
+		if entry.expires_at <= time.monotonic():
+			self.delete(key)
+			return None
+
+		self._entries.move_to_end(key)
+
+		return entry.value
+
+	def set(
+		self: 'LocalCache',
+		key: str,
+		value: typing.Any,
+		size: int,
+		ttl_seconds: float | None,
+		tags: typing.Iterable[str] = (),
+		generation: int | None = None
+	) -> bool:
+		'''
+			Stores a value, evicting the least recently used entries to stay within max_bytes
+
+			params:
+				key : str : the cache key
+				value : any : the value to store
+				size : int : the size of the value in bytes
+				ttl_seconds : float : how long the value is kept for, capped at the cache's TTL
+				tags : iterable[str] (optional) : the tags the value is registered under
+				generation : int (optional) : the generation read before the value was computed, if the
+					cache has been invalidated since, the value may be stale and is not stored
+
+			returns whether the value was stored
+		'''
+
+		if generation is not None and generation != self.generation:
+			return False
+
+		if size > self.max_bytes:
+			return False
+
+		if key in self._entries:
+			self.delete(key)
+
+		if self.ttl_seconds is not None:
+			ttl_seconds = min(ttl_seconds or self.ttl_seconds, self.ttl_seconds)
+
+		tags: tuple[str, ...] = tuple(tags)
+
+		self._entries[key] = LocalCacheEntry(
+			value = value,
+			size = size,
+			expires_at = time.monotonic() + ttl_seconds,
+			tags = tags
+		)
+		self.size += size
+
+		for tag in tags:
+			self._tags.setdefault(tag, set()).add(key)
+
+		while self.size > self.max_bytes:
+			self.delete(next(iter(self._entries)))
+
+		return True
+
+	def delete(
+		self: 'LocalCache',
+		key: str
+	) -> None:
+
+		entry: LocalCacheEntry | None = self._entries.pop(key, None)
+
+		if entry is None:
+			return
+
+		self.size -= entry.size
+
+		for tag in entry.tags:
+			keys: set[str] | None = self._tags.get(tag, None)
+
+			if keys is not None:
+				keys.discard(key)
+
+				if not keys:
+					del self._tags[tag]
+
+	def invalidate_tags(
+		self: 'LocalCache',
+		tags: typing.Iterable[str]
+	) -> int:
+		'''
+			Deletes every entry registered under any of the tags
+
+			returns the number of entries deleted
+		'''
+
+		self.generation += 1
+
+		deleted: int = 0
+
+		for tag in tags:
+			for key in list(self._tags.get(tag, ())):
+				self.delete(key)
+				deleted += 1
+
+		return deleted
+
+	def clear(
+		self: 'LocalCache'
+	) -> None:
+
+		self.generation += 1
+		self.size = 0
+		self._entries.clear()
+		self._tags.clear()
+
+	def __len__(
+		self: 'LocalCache'
+	) -> int:
+		return len(self._entries)
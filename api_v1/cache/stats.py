@@ -0,0 +1,166 @@
+import bisect
+import typing
+
+# upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS: tuple[float, ...] = (
+	0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)
+
+class Histogram:
+
+	'''
+		Counts observations into buckets by upper bound, with a final bucket for anything larger
+	'''
+
+	__slots__ = (
+		'buckets',
+		'counts',
+		'count',
+		'sum',
+	)
+
+	def __init__(
+		self: 'Histogram',
+		buckets: tuple[float, ...] = LATENCY_BUCKETS
+	):
+
+		self.buckets: tuple[float, ...] = buckets
+		self.counts: list[int] = [0] * (len(buckets) + 1)
+		self.count: int = 0
+		self.sum: float = 0.0
+
+	def observe(
+		self: 'Histogram',
+		value: float
+	) -> None:
+
+		self.counts[bisect.bisect_left(self.buckets, value)] += 1
+		self.count += 1
+		self.sum += value
+
+	def to_dict(
+		self: 'Histogram'
+	) -> dict[str, typing.Any]:
+
+		return {
+			'count': self.count,
+			'sum': self.sum,
+			'buckets': {
+				**{str(bound): count for bound, count in zip(self.buckets, self.counts)},
+				'+Inf': self.counts[-1]
+			}
+		}
+
+class RouteCacheStats:
+
+	'''
+		The cache statistics of a single route
+	'''
+
+	__slots__ = (
+		'local_hits',
+		'hits',
+		'misses',
+		'stale_hits',
+		'fills',
+		'not_modified',
+		'invalidations',
+		'invalidated_keys',
+		'bytes_served',
+		'bytes_stored',
+		'latency',
+	)
+
+	def __init__(
+		self: 'RouteCacheStats'
+	):
+
+		self.local_hits: int = 0
+		self.hits: int = 0
+		self.misses: int = 0
+		self.stale_hits: int = 0
+		self.fills: int = 0
+		self.not_modified: int = 0
+		self.invalidations: int = 0
+		self.invalidated_keys: int = 0
+		self.bytes_served: int = 0
+		self.bytes_stored: int = 0
+		# one histogram per outcome: local_hit, hit, miss and fill
+		self.latency: dict[str, Histogram] = {}
+
+	def observe(
+		self: 'RouteCacheStats',
+		outcome: str,
+		seconds: float
+	) -> None:
+
+		histogram: Histogram | None = self.latency.get(outcome, None)
+
+		if histogram is None:
+			histogram = self.latency[outcome] = Histogram()
+
+		histogram.observe(seconds)
+
+	def hit_ratio(
+		self: 'RouteCacheStats'
+	) -> float | None:
+
+		lookups: int = self.local_hits + self.hits + self.misses
+
+		if not lookups:
+			return None
+
+		return (self.local_hits + self.hits) / lookups
+
+	def to_dict(
+		self: 'RouteCacheStats'
+	) -> dict[str, typing.Any]:
+
+		return {
+			'local_hits': self.local_hits,
+			'hits': self.hits,
+			'misses': self.misses,
+			'stale_hits': self.stale_hits,
+			'fills': self.fills,
+			'not_modified': self.not_modified,
+			'invalidations': self.invalidations,
+			'invalidated_keys': self.invalidated_keys,
+			'bytes_served': self.bytes_served,
+			'bytes_stored': self.bytes_stored,
+			'hit_ratio': self.hit_ratio(),
+			'latency': {outcome: histogram.to_dict() for outcome, histogram in self.latency.items()}
+		}
+
+class CacheStats:
+
+	'''
+		Cache statistics per route, for this worker. Lives on app.state.cache_stats.
+		Never reset, as they're exported as counters - which only ever go up while the worker runs
+	'''
+
+	__slots__ = (
+		'routes',
+	)
+
+	def __init__(
+		self: 'CacheStats'
+	):
+
+		self.routes: dict[str, RouteCacheStats] = {}
+
+	def route(
+		self: 'CacheStats',
+		name: str
+	) -> RouteCacheStats:
+
+		stats: RouteCacheStats | None = self.routes.get(name, None)
+
+		if stats is None:
+			stats = self.routes[name] = RouteCacheStats()
+
+		return stats
+
+	def snapshot(
+		self: 'CacheStats'
+	) -> dict[str, dict[str, typing.Any]]:
+		return {name: stats.to_dict() for name, stats in self.routes.items()}
@@ -0,0 +1,79 @@
+import inspect
+import typing
+
+# deletes every key registered under the given tag sets, and the tag sets themselves, in one round trip.
+# the version of each tag is bumped too, so that ETags built from it change.
+# KEYS holds the tag sets followed by the version keys, ARGV[1] is the number of tags
+INVALIDATE_TAGS_SCRIPT: str = """
+local unpack = unpack or table.unpack
+local count = tonumber(ARGV[1])
+local deleted = 0
+for t = 1, count do
+	local keys = redis.call('SMEMBERS', KEYS[t])
+	for i = 1, #keys, 500 do
+		deleted = deleted + redis.call('DEL', unpack(keys, i, math.min(i + 499, #keys)))
+	end
+	redis.call('DEL', KEYS[t])
+	redis.call('INCR', KEYS[count + t])
+end
+return deleted
+""".strip()
+
+# returns the version of each tag, starting unknown tags at a random version (ARGV[1]) rather than 0,
+# so a version lost to a flush of Redis doesn't restart from a value a client may have seen before
+TAG_VERSIONS_SCRIPT: str = """
+local versions = {}
+for i, key in ipairs(KEYS) do
+	redis.call('SET', key, ARGV[1], 'NX')
+	versions[i] = redis.call('GET', key)
+end
+return versions
+""".strip()
+
+TagsType = typing.Iterable[str] | typing.Callable[..., typing.Iterable[str] | typing.Awaitable[typing.Iterable[str]]]
+
+def tag_key(
+	tag: str
+) -> str:
+	'''
+		Returns the key of the Redis set holding the cache keys registered under a tag
+
+		params:
+			tag : str : the tag, for example 'project:42', 'bug:*' or 'users'
+
+		returns str
+	'''
+
+	return f"tag:{tag}"
+
+def version_key(
+	tag: str
+) -> str:
+	'''
+		Returns the key of the counter bumped every time a tag is invalidated
+	'''
+
+	return f"version:{tag}"
+
+async def resolve_tags(
+	tags: TagsType,
+	kwargs: dict[str, typing.Any]
+) -> list[str]:
+	'''
+		Resolves the tags declared on a route for one call of it
+
+		params:
+			tags : iterable or callable : either a fixed set of tags, or a (async) function given the
+				keyword arguments of the route and returning the tags
+			kwargs : dict : the keyword arguments the route was called with
+
+		returns list[str]
+	'''
+
+	if callable(tags):
+		tags = tags(**kwargs)
+
+		if inspect.isawaitable(tags):
+			tags = await tags
+
+	return list(dict.fromkeys(tags)) ## de-duplicate, keeping the order
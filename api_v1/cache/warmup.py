@@ -0,0 +1,131 @@
+import asyncio
+import time
+import typing
+from urllib.parse import urlsplit
+
+from fastapi import FastAPI
+
+from api_v1.logging import cache_logger
+
+async def request_route(
+	app: FastAPI,
+	path: str
+) -> int:
+	'''
+		Makes an anonymous GET request to the app in-process, through its whole middleware stack,
+		so that the response is cached under exactly the key a client's request would use
+
+		params:
+			app : FastAPI : the app
+			path : str : the path to request, optionally with a query string
+
+		returns the status code of the response
+	'''
+
+	url = urlsplit(path)
+	done: asyncio.Event = asyncio.Event()
+	status_code: int = 0
+
+	scope: dict[str, typing.Any] = {
+		'type': 'http',
+		'asgi': {'version': '3.0'},
+		'http_version': '1.1',
+		'method': 'GET',
+		'scheme': 'http',
+		'path': url.path,
+		'raw_path': url.path.encode(),
+		'query_string': url.query.encode(),
+		'root_path': '',
+		'headers': [(b'host', b'warmup')],
+		'client': None,
+		'server': None
+	}
+
+	request_sent: bool = False
+
+	async def receive() -> dict[str, typing.Any]:
+		nonlocal request_sent
+
+		if not request_sent:
+			request_sent = True
+			return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+		## nothing more to send - the client "disconnects" once the response is complete
+		await done.wait()
+		return {'type': 'http.disconnect'}
+
+	async def send(
+		message: dict[str, typing.Any]
+	) -> None:
+		nonlocal status_code
+
+		if message['type'] == 'http.response.start':
+			status_code = message['status']
+		elif message['type'] == 'http.response.body' and not message.get('more_body', False):
+			done.set()
+
+	try:
+		await app(scope, receive, send)
+	finally:
+		done.set()
+
+	return status_code
+
+async def warm_routes(
+	app: FastAPI,
+	paths: typing.Iterable[str],
+	concurrency: int,
+	budget_seconds: float
+) -> int:
+	'''
+		Pre-populates the cache by requesting each path, at most concurrency at a time.
+		Whatever hasn't finished within the time budget is cancelled, and is cached by the first real request instead
+
+		params:
+			app : FastAPI : the app
+			paths : iterable[str] : the paths of the cached routes to warm
+			concurrency : int : how many paths are requested at once
+			budget_seconds : float : how long warming may take in total
+
+		returns the number of paths warmed
+	'''
+
+	semaphore: asyncio.Semaphore = asyncio.Semaphore(concurrency)
+	started: float = time.perf_counter()
+
+	async def warm(
+		path: str
+	) -> bool:
+
+		async with semaphore:
+			try:
+				status_code: int = await request_route(app, path)
+			except Exception:
+				cache_logger.exception(f'Failed to warm {path}')
+				return False
+
+		if status_code != 200:
+			cache_logger.warning(f'Failed to warm {path}: {status_code}')
+			return False
+
+		return True
+
+	tasks: list[asyncio.Task] = [asyncio.create_task(warm(path)) for path in paths]
+
+	if not tasks:
+		return 0
+
+	finished, pending = await asyncio.wait(tasks, timeout = budget_seconds)
+
+	for task in pending:
+		task.cancel()
+
+	if pending:
+		await asyncio.gather(*pending, return_exceptions = True)
+		cache_logger.warning(f'Cache warm-up ran out of time, skipped {len(pending)} of {len(tasks)} routes')
+
+	warmed: int = sum(task.result() for task in finished)
+
+	cache_logger.info(f'Warmed {warmed} of {len(tasks)} routes in {time.perf_counter() - started:.3f}s')
+
+	return warmed
@@ -0,0 +1,97 @@
+import re
+import typing
+
+from fastapi.middleware.cors import CORSMiddleware
+from starlette.types import ASGIApp
+
+from api_v1.settings import Settings
+
+# any port of localhost, over http - what a frontend dev server is served from
+LOCALHOST_ORIGIN_REGEX: str = r'http://(?:localhost|127\.0\.0\.1):\d{1,5}'
+
+class OriginPolicy:
+
+	'''
+		The origins allowed to make cross-origin requests: exact origins, looked up in a set,
+		and patterns, compiled once into a single regex. Checking an origin costs the same however many are allowed
+	'''
+
+	__slots__ = (
+		'origins',
+		'pattern',
+	)
+
+	def __init__(
+		self: 'OriginPolicy',
+		origins: typing.Iterable[str] = (),
+		regexes: typing.Iterable[str] = ()
+	):
+
+		self.origins: frozenset[str] = frozenset(origins)
+
+		regexes = list(regexes)
+
+		self.pattern: re.Pattern | None = re.compile(
+			'|'.join(f'(?:{regex})' for regex in regexes)
+		) if regexes else None
+
+	def allows(
+		self: 'OriginPolicy',
+		origin: str
+	) -> bool:
+
+		if origin in self.origins:
+			return True
+
+		return self.pattern is not None and self.pattern.fullmatch(origin) is not None
+
+def create_origin_policy(
+	settings: Settings
+) -> OriginPolicy:
+	'''
+		Creates the origin policy from FRONTEND_ADDRESS, ENV_ORIGINS (comma separated), CORS_ALLOW_LOCALHOST
+		and CORS_ORIGIN_REGEXES
+
+		params:
+			settings : Settings : the application settings
+
+		returns OriginPolicy
+	'''
+
+	origins: list[str] = [settings.FRONTEND_ADDRESS] if settings.FRONTEND_ADDRESS else []
+
+	if settings.ENV_ORIGINS:
+		origins.extend(origin.strip() for origin in settings.ENV_ORIGINS.split(',') if origin.strip())
+
+	regexes: list[str] = list(settings.CORS_ORIGIN_REGEXES)
+
+	if settings.CORS_ALLOW_LOCALHOST:
+		regexes.append(LOCALHOST_ORIGIN_REGEX)
+
+	return OriginPolicy(
+		origins=origins,
+		regexes=regexes
+	)
+
+class OriginPolicyCORSMiddleware(CORSMiddleware):
+
+	'''
+		CORSMiddleware, with the origins it allows decided by an OriginPolicy
+	'''
+
+	def __init__(
+		self: 'OriginPolicyCORSMiddleware',
+		app: ASGIApp,
+		policy: OriginPolicy,
+		**kwargs: typing.Any
+	):
+
+		super().__init__(app, **kwargs)
+
+		self.policy: OriginPolicy = policy
+
+	def is_allowed_origin(
+		self: 'OriginPolicyCORSMiddleware',
+		origin: str
+	) -> bool:
+		return self.policy.allows(origin)
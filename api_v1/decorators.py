@@ -1,8 +1,10 @@
 import asyncio
 import functools
+import hashlib
 import inspect
 import typing
 import re
+import time
 
 from starlette.exceptions import HTTPException
 from starlette.requests import HTTPConnection, Request
@@ -10,11 +12,40 @@ from starlette.responses import RedirectResponse, Response
 from starlette.websockets import WebSocket
 
 from fastapi import (
-	FastAPI
+	FastAPI,
+	HTTPException as FastAPIHTTPException,
+	status
 )
 import orjson
 
 from api_v1.settings import get_settings
+from api_v1.cache.coalesce import (
+	SingleFlight,
+	CacheLock
+)
+from api_v1.cache.tags import (
+	TagsType,
+	resolve_tags
+)
+from api_v1.cache.local import LocalCache
+from api_v1.cache.entry import CacheEntry
+from api_v1.cache.stats import RouteCacheStats
+from api_v1.cache.keys import (
+	build_cache_key,
+	canonical_request
+)
+from api_v1.cache.etags import (
+	make_etag,
+	etag_matches
+)
+from api_v1.cache.broker import publish_invalidation
+from api_v1.logging import cache_logger
+from api_v1.timing import timed
+from api_v1.projects.middleware import resolve_user
+from api_v1.projects.throttle import (
+	RateLimiter,
+	retry_after
+)
 
 settings = get_settings()
 
@@ -31,7 +62,9 @@ def requires_login(
 		) -> dict | list[dict] | HTTPException:
 			request: Request | None = kwargs.get("request", None) ## get the request from the annoteted function
 
-			if not request.user.is_authenticated():
+			user: typing.Any = await resolve_user(request) ## the user is only looked up when a route needs it
+
+			if not user.is_authenticated():
 				raise HTTPException(status_code=status_code)
 
 			return await func(*args, **kwargs)
@@ -40,36 +73,188 @@ def requires_login(
 
 	return decorator
 
-def cache_route(
+def throttle(
 	app: FastAPI,
-	ttl_seconds: int = 15
+	limiter: str,
+	key: typing.Callable[..., str | None]
 ) -> typing.Callable:
+	'''
+		Limits how often a route is called per key, rejecting calls over the limit with a 429 before the route runs
+
+		params:
+			app : FastAPI : the application, holding the rate limiters
+			limiter : str : the name of the rate limiter in app.state.rate_limiters, the route isn't limited if there is none
+			key : callable : called with the route's arguments, returns what to limit by - or None not to limit the call
+	'''
 
 	def decorator(func: typing.Callable) -> typing.Callable:
 
 		@functools.wraps(func)
 		async def async_wrapper(
-			*args: typing.Any, **kwargs: typing.Any
-		) -> dict | list[dict]:
-			request: Request | None = kwargs.get("request", None) ## get the request from the annoteted function
+			*args: typing.Any,
+			**kwargs: typing.Any
+		) -> typing.Any:
+
+			rate_limiter: RateLimiter | None = app.state.rate_limiters.get(limiter, None)
+			limit_key: str | None = key(**kwargs) if rate_limiter is not None else None
+
+			if limit_key is not None:
+				wait: float = await rate_limiter.take(limit_key)
+
+				if wait:
+					raise FastAPIHTTPException(
+						status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+						detail="Too many attempts, try again later.",
+						headers={"Retry-After": retry_after(wait)}
+					)
+
+			return await func(*args, **kwargs)
+
+		return async_wrapper
+
+	return decorator
+
+def cache_route(
+	app: FastAPI,
+	ttl_seconds: int | None = None,
+	soft_ttl_seconds: int | None = None,
+	tags: TagsType = (),
+	vary: typing.Iterable[str] | None = None,
+	vary_by_user: bool = False
+) -> typing.Callable:
+	'''
+		Caches the response of a route in the cache backend, and optionally in this worker's memory in front of it
+
+		params:
+			app : FastAPI : the application, holding the cache backend
+			ttl_seconds : int (optional) : how long the response is cached for, defaults to CACHE_TTL_SECONDS
+			soft_ttl_seconds : int (optional) : after this long the response is stale - it is still served
+				until ttl_seconds, while one background job refreshes it
+			tags : iterable or callable (optional) : the tags the response is registered under,
+				see delete_cached_route. Either fixed, or a function given the route's keyword arguments
+			vary : iterable[str] (optional) : the arguments of the route the response depends on, all of them by default
+			vary_by_user : bool (optional) : whether the response depends on the authenticated user
 
-			if settings.REDIS_ENABLED:
-				cache_key: str = request.url._url
+		returns the decorator
+	'''
 
-				route_is_cached: bool = bool(await app.state.redis.exists(cache_key))
+	ttl_seconds: int = ttl_seconds or settings.CACHE_TTL_SECONDS
+
+	def decorator(func: typing.Callable) -> typing.Callable:
 
-				if route_is_cached:
-					response: dict = orjson.loads(await app.state.redis.get(cache_key))
-				else:
-					response: list = await func(*args, **kwargs)
-					await app.state.redis.set(
-						name = cache_key,
-						value = orjson.dumps([x.dict() for x in response]),
-						ex = ttl_seconds,
-						nx = True
+		# one in-flight computation per cache key in this worker
+		single_flight: SingleFlight = SingleFlight()
+
+		# the keys with a refresh scheduled in this worker
+		refreshing: set[str] = set()
+
+		async def refresh(
+			cache_key: str,
+			args: tuple,
+			kwargs: dict[str, typing.Any],
+			stats: RouteCacheStats
+		) -> None:
+
+			generation: int | None = app.state.local_cache.generation if app.state.local_cache is not None else None
+
+			try:
+				entry: CacheEntry | None = await refresh_cache(
+					app = app,
+					cache_key = cache_key,
+					ttl_seconds = ttl_seconds,
+					soft_ttl_seconds = soft_ttl_seconds,
+					tags = tags,
+					kwargs = kwargs,
+					compute = lambda: func(*args, **kwargs),
+					stats = stats
+				)
+
+				if entry is not None and app.state.local_cache is not None:
+					app.state.local_cache.set(
+						key = cache_key,
+						value = entry,
+						size = len(entry),
+						ttl_seconds = ttl_seconds,
+						tags = await resolve_tags(tags, kwargs),
+						generation = generation
 					)
+			except Exception:
+				cache_logger.exception(f'Failed to refresh {cache_key}')
+			finally:
+				refreshing.discard(cache_key)
 
-				return response
+		@functools.wraps(func)
+		async def async_wrapper(
+			*args: typing.Any, **kwargs: typing.Any
+		) -> Response:
+			request: Request | None = kwargs.get("request", None) ## get the request from the annoteted function
+
+			if app.state.cache is not None:
+				if vary_by_user:
+					await resolve_user(request)
+
+				started: float = time.perf_counter()
+				stats: RouteCacheStats = app.state.cache_stats.route(func.__name__)
+				cache_key: str = build_cache_key(request, kwargs, vary, vary_by_user)
+				local_cache: LocalCache | None = app.state.local_cache
+				entry: CacheEntry | None = None
+				outcome: str = 'local_hit'
+
+				if local_cache is not None:
+					entry = local_cache.get(cache_key) ## no I/O at all on a local hit
+					generation: int = local_cache.generation
+
+				if entry is None:
+					with timed('cache'):
+						cached: bytes | None = await app.state.cache.get(cache_key) ## a single round trip on a hit
+
+					if cached is not None:
+						entry = CacheEntry.loads(cached)
+						outcome = 'hit'
+						stats.hits += 1
+					else:
+						outcome = 'miss'
+						stats.misses += 1
+						entry = await single_flight.run(
+							key = cache_key,
+							compute = lambda: fill_cache(
+								app = app,
+								cache_key = cache_key,
+								ttl_seconds = ttl_seconds,
+								soft_ttl_seconds = soft_ttl_seconds,
+								tags = tags,
+								kwargs = kwargs,
+								compute = lambda: func(*args, **kwargs),
+								stats = stats
+							)
+						)
+
+					if local_cache is not None:
+						local_cache.set(
+							key = cache_key,
+							value = entry,
+							size = len(entry),
+							ttl_seconds = ttl_seconds,
+							tags = await resolve_tags(tags, kwargs),
+							generation = generation
+						)
+
+				if outcome == 'local_hit':
+					stats.local_hits += 1
+
+				stats.bytes_served += len(entry)
+				stats.observe(outcome, time.perf_counter() - started)
+
+				# serve the stale response straight away, and refresh it in the background
+				if entry.is_stale():
+					stats.stale_hits += 1
+
+					if cache_key not in refreshing:
+						refreshing.add(cache_key)
+						await app.state.scheduler.spawn(refresh(cache_key, args, kwargs, stats))
+
+				## the body is already encoded, so FastAPI sends it as it is
+				return entry.to_response()
 
 			else:
 				return await func(*args, **kwargs)
@@ -78,11 +263,271 @@ def cache_route(
 
 	return decorator
 
+async def store_cache_entry(
+	app: FastAPI,
+	cache_key: str,
+	entry: CacheEntry,
+	ttl_seconds: int,
+	tags: TagsType,
+	kwargs: dict[str, typing.Any]
+) -> None:
+
+	value: bytes = entry.dumps(
+		compression_threshold = settings.CACHE_COMPRESSION_THRESHOLD,
+		compression_level = settings.CACHE_COMPRESSION_LEVEL
+	)
+	resolved_tags: list[str] = await resolve_tags(tags, kwargs)
+
+	with timed('cache'):
+		await app.state.cache.set(
+			key = cache_key,
+			value = value,
+			ttl_seconds = ttl_seconds,
+			tags = resolved_tags
+		)
+
+async def compute_cache_entry(
+	compute: typing.Callable[[], typing.Awaitable[typing.Any]],
+	soft_ttl_seconds: int | None,
+	stats: RouteCacheStats
+) -> CacheEntry:
+
+	started: float = time.perf_counter()
+
+	## encoded once, and the same bytes are both cached and sent to the client
+	entry: CacheEntry = CacheEntry.from_response(await compute())
+
+	if soft_ttl_seconds:
+		entry.stale_at = time.time() + soft_ttl_seconds
+
+	stats.fills += 1
+	stats.bytes_stored += len(entry)
+	stats.observe('fill', time.perf_counter() - started)
+
+	return entry
+
+async def fill_cache(
+	app: FastAPI,
+	cache_key: str,
+	ttl_seconds: int,
+	soft_ttl_seconds: int | None,
+	tags: TagsType,
+	kwargs: dict[str, typing.Any],
+	compute: typing.Callable[[], typing.Awaitable[typing.Any]],
+	stats: RouteCacheStats
+) -> CacheEntry:
+	'''
+		Computes and caches the response for a cache key.
+		Only the worker holding the lock for the key computes it, the others wait for it to land in the cache
+
+		params:
+			app : FastAPI : the application, holding the cache backend
+			cache_key : str : the key the response is cached under
+			ttl_seconds : int : how long the response is cached for
+			soft_ttl_seconds : int : how long until the response is stale, if at all
+			tags : iterable or callable : the tags to register the response under
+			kwargs : dict : the keyword arguments of the route
+			compute : callable : computes the response
+			stats : RouteCacheStats : the cache statistics of the route
+
+		returns the response, as a CacheEntry
+	'''
+
+	lock: CacheLock = CacheLock(
+		backend = app.state.cache,
+		key = f"{cache_key}:lock",
+		timeout = settings.CACHE_LOCK_TIMEOUT
+	)
+
+	with timed('cache'):
+		acquired: bool = await lock.acquire()
+
+	if not acquired:
+
+		loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+		deadline: float = loop.time() + settings.CACHE_LOCK_TIMEOUT
+
+		# another worker is filling this key, wait for it rather than querying the database as well
+		while loop.time() < deadline:
+			await asyncio.sleep(settings.CACHE_LOCK_POLL_INTERVAL)
+
+			with timed('cache'):
+				cached: bytes | None = await app.state.cache.get(cache_key)
+
+			if cached is not None:
+				return CacheEntry.loads(cached)
+
+		# the worker holding the lock is too slow (or has died), so fill it ourselves
+
+	try:
+		entry: CacheEntry = await compute_cache_entry(compute, soft_ttl_seconds, stats)
+		await store_cache_entry(app, cache_key, entry, ttl_seconds, tags, kwargs)
+	finally:
+		with timed('cache'):
+			await lock.release()
+
+	return entry
+
+async def refresh_cache(
+	app: FastAPI,
+	cache_key: str,
+	ttl_seconds: int,
+	soft_ttl_seconds: int | None,
+	tags: TagsType,
+	kwargs: dict[str, typing.Any],
+	compute: typing.Callable[[], typing.Awaitable[typing.Any]],
+	stats: RouteCacheStats
+) -> CacheEntry | None:
+	'''
+		Recomputes a stale response in the background.
+		If another worker holds the lock for the key it is already refreshing it, so this returns
+		whatever is currently cached if that is fresh - and None otherwise
+
+		params:
+			see fill_cache
+
+		returns the refreshed response, as a CacheEntry, or None
+	'''
+
+	lock: CacheLock = CacheLock(
+		backend = app.state.cache,
+		key = f"{cache_key}:lock",
+		timeout = settings.CACHE_LOCK_TIMEOUT
+	)
+
+	if not await lock.acquire():
+		cached: bytes | None = await app.state.cache.get(cache_key)
+
+		if cached is not None:
+			entry: CacheEntry = CacheEntry.loads(cached)
+
+			if not entry.is_stale():
+				return entry
+
+		return None
+
+	try:
+		entry: CacheEntry = await compute_cache_entry(compute, soft_ttl_seconds, stats)
+		await store_cache_entry(app, cache_key, entry, ttl_seconds, tags, kwargs)
+	finally:
+		await lock.release()
+
+	return entry
+
+def conditional_route(
+	app: FastAPI,
+	tags: TagsType = (),
+	fingerprint: typing.Callable[..., typing.Awaitable[typing.Any]] | None = None,
+	vary: typing.Iterable[str] | None = None,
+	vary_by_user: bool = False
+) -> typing.Callable:
+	'''
+		Gives the response of a route an ETag, built from the versions of its tags (bumped by delete_cached_route)
+		and an optional fingerprint of its data. If the request's If-None-Match matches, a 304 is returned
+		without running the route at all. Without a cache shared by every worker, the ETag is made from the body of
+		the response instead - a fingerprint alone only covers the rows it reads, not every table the response is built from
+
+		params:
+			app : FastAPI : the application, holding the cache backend
+			tags : iterable or callable (optional) : the tags the response is built from, as for cache_route
+			fingerprint : callable (optional) : a cheap async function given the route's keyword arguments,
+				returning a value that changes whenever the data does - for example the latest date_updated.
+				Only used alongside the versions of the tags, to catch changes made outside of delete_cached_route
+			vary : iterable[str] (optional) : as for cache_route
+			vary_by_user : bool (optional) : as for cache_route
+
+		returns the decorator
+	'''
+
+	def decorator(func: typing.Callable) -> typing.Callable:
+
+		@functools.wraps(func)
+		async def async_wrapper(
+			*args: typing.Any, **kwargs: typing.Any
+		) -> Response:
+			request: Request | None = kwargs.get("request", None) ## get the request from the annoteted function
+
+			validators: list[typing.Any] = []
+
+			if vary_by_user:
+				await resolve_user(request)
+
+			## tag versions only invalidate the ETags of every worker if every worker shares them
+			if app.state.cache is not None and app.state.cache.shared:
+				validators.extend(await app.state.cache.versions(await resolve_tags(tags, kwargs)))
+
+				if fingerprint is not None:
+					validators.append(await fingerprint(**kwargs))
+
+			identity: str = canonical_request(request, kwargs, vary, vary_by_user)
+
+			if validators:
+				etag: str = make_etag(
+					identity = identity,
+					validators = validators
+				)
+
+				if etag_matches(request.headers.get('if-none-match', None), etag):
+					return not_modified(app, func, etag)
+
+			response: typing.Any = await func(*args, **kwargs)
+
+			if not isinstance(response, Response):
+				response = CacheEntry.from_response(response).to_response()
+
+			if not validators:
+				## nothing could invalidate an ETag made before running the route, so it's made from the body instead -
+				## this saves sending the body again, but not running the route
+				body: bytes | None = getattr(response, 'body', None)
+
+				if body is None:
+					return response
+
+				etag = make_etag(
+					identity = identity,
+					validators = [hashlib.blake2b(body, digest_size = 16).hexdigest()]
+				)
+
+				if etag_matches(request.headers.get('if-none-match', None), etag):
+					return not_modified(app, func, etag)
+
+			response.headers['ETag'] = etag
+
+			return response
+
+		return async_wrapper
+
+	return decorator
+
+def not_modified(
+	app: FastAPI,
+	func: typing.Callable,
+	etag: str
+) -> Response:
+
+	app.state.cache_stats.route(func.__name__).not_modified += 1
+
+	return Response(
+		status_code = 304,
+		headers = {'ETag': etag}
+	)
+
 def delete_cached_route(
 	app: FastAPI,
-	object_path: str = '',
-	related_request_url: str = ''
+	tags: TagsType = ()
 ) -> typing.Callable:
+	'''
+		Invalidates the cached responses registered under the given tags, once the route has succeeded.
+		Tags name the entities a response was built from, for example 'project:42' for a single project
+		or 'project:*' for responses built from any project
+
+		params:
+			app : FastAPI : the application, holding the cache backend
+			tags : iterable or callable : the tags to invalidate. Either fixed, or a (async) function given
+				the route's keyword arguments
+
+		returns the decorator
+	'''
 
 	def decorator(func: typing.Callable) -> typing.Callable:
 
@@ -90,52 +535,24 @@ def delete_cached_route(
 		async def async_wrapper(
 			*args: typing.Any, **kwargs: typing.Any
 		) -> dict | list[dict]:
-			request: Request = kwargs.get("request", None) ## get the request from the annoteted function
-	
-			if settings.REDIS_ENABLED:
-				cache_key: str = request.url._url
-				
-				# this lets us de-cache routes which are related to other routes.
-				# For example, updating a bug has an impact on the project -msince, the full project is cached
-				# As such, we would return stale data if we were to request the project again
-				if related_request_url:
-					alternate_cache_key = f"{request.url.scheme}://{request.url.netloc}{related_request_url}"
-					cache_key: str = alternate_cache_key
-
-				# this lets us have the 'path' to the attribute that we want to append to the url
-				# a string with three parts, seperated by fullstops
-				# this lets us 'append' additional information to the cache key if we need
-				# for example: ?project_id=someID
-				if object_path:
-
-					object_name_in_kwargs, object_attr, extra_args = object_path.split('.')
-
-					# get object from kwargs
-					object_from_kwargs = kwargs.get(object_name_in_kwargs, None)
-
-					# if we have a object
-					if object_from_kwargs:
-
-						# try get the specified attr (for example, 'name', 'id')
-						object_attr_from_object = getattr(object_from_kwargs, object_attr, None)
-						
-						# if this exists..
-						if object_attr_from_object:
-
-							# append the additional cache key args to the cache key
-							additional_args = f"{extra_args}{object_attr_from_object}"
-							cache_key = f"{cache_key}{additional_args}"
-
-				route_is_cached: bool = bool(await app.state.redis.exists(cache_key))
-
-				print(func.__name__)
-				print('cache_key = ', cache_key)
-				print('route_is_cached = ', route_is_cached)
-
-				if route_is_cached:
-					await app.state.redis.delete(cache_key)
 
-			return await func(*args, **kwargs)
+			response: dict | list[dict] = await func(*args, **kwargs)
+
+			if app.state.cache is not None:
+				invalidated_tags: list[str] = await resolve_tags(tags, kwargs)
+
+				stats: RouteCacheStats = app.state.cache_stats.route(func.__name__)
+				stats.invalidations += 1
+
+				with timed('cache'):
+					stats.invalidated_keys += await app.state.cache.invalidate_tags(invalidated_tags)
+
+					# drop our own local copies straight away, and tell the other workers to drop theirs
+					if app.state.local_cache is not None:
+						app.state.local_cache.invalidate_tags(invalidated_tags)
+						await publish_invalidation(app.state.cache_broker, invalidated_tags)
+
+			return response
 
 		return async_wrapper
 
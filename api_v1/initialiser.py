@@ -10,9 +10,8 @@ from fastapi import (
 	Request,
 	APIRouter
 )
-from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.authentication import (
-	AuthenticationMiddleware
+from starlette.authentication import (
+	AuthenticationError
 )
 from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
@@ -31,6 +30,42 @@ from api_v1.settings import get_settings
 from api_v1.projects.models import User
 from api_v1.projects import middleware as application_middleware
 from api_v1.logging import initialising_logger
+from api_v1.cors import (
+	OriginPolicyCORSMiddleware,
+	create_origin_policy
+)
+from api_v1.cache.local import LocalCache
+from api_v1.cache.broker import (
+	MemoryBroker,
+	listen,
+	listen_for_invalidations
+)
+from api_v1.cache.backends import (
+	create_cache_backend,
+	selected_cache_backend
+)
+from api_v1.cache.stats import CacheStats
+from api_v1.cache.warmup import warm_routes
+from api_v1.metrics import (
+	RequestMetrics,
+	collect_metrics,
+	write_snapshot,
+	write_snapshots
+)
+from api_v1.timing import (
+	instrument_database,
+	instrument_serialisation
+)
+from api_v1.projects.keyring import get_keyring
+from api_v1.projects.token_cache import create_token_cache
+from api_v1.projects.sweeper import TokenSweeper
+from api_v1.projects.throttle import create_rate_limiters
+from api_v1.projects.revocation import (
+	REVOCATION_CHANNEL,
+	RevocationList,
+	load_revocations,
+	on_revocation_message
+)
 
 environment_vars = get_settings()
 
@@ -94,6 +129,10 @@ def init_services(
 
 	from api_v1.projects.auth_service import AuthService
 	from api_v1.projects.project_service import ProjectService
+	from api_v1.internal.internal_service import (
+		InternalService,
+		ReadinessService
+	)
 
 	services: list[Service] = [
 		AuthService(
@@ -105,9 +144,24 @@ def init_services(
 			app = app,
 			router_prefix = "/api/v1/projects",
 			settings = environment_vars
+		),
+		## a load balancer needs /ready/ whether or not the operator endpoints are turned on
+		ReadinessService(
+			app = app,
+			router_prefix = "/api/v1/internal",
+			settings = environment_vars
 		)
 	]
 
+	if environment_vars.INTERNAL_ENDPOINTS_ENABLED:
+		services.append(
+			InternalService(
+				app = app,
+				router_prefix = "/api/v1/internal",
+				settings = environment_vars
+			)
+		)
+
 	initialising_logger.info('Intalling...')
 
 	for idx, service in enumerate(services):
@@ -121,40 +175,64 @@ def init_middleware(
 	app: FastAPI
 ) -> None:
 
-	initialising_logger.info('Installing AuthenticationMiddleware...')
+	initialising_logger.info('Installing LazyAuthenticationMiddleware...')
+
+	## refuses to start without signing keys every worker shares
+	get_keyring()
+
+	## a token revoked on one worker is only revoked on the others through a cache they share, and its broker
+	shared: bool = selected_cache_backend(environment_vars) == 'redis'
+	stateless: bool = environment_vars.AUTH_STATELESS and shared
+
+	if environment_vars.AUTH_STATELESS and not stateless:
+		initialising_logger.warning(
+			'AUTH_STATELESS needs the redis cache backend to share revoked tokens between workers, '
+			'verifying tokens against the database instead'
+		)
+
+	if stateless:
+		## verifying a token statelessly is already cheap, there's nothing for a token cache to save
+		app.state.revocations = RevocationList()
+		app.state.token_cache = None
+	elif shared:
+		app.state.revocations = None
+		app.state.token_cache = create_token_cache(environment_vars)
+	else:
+		if environment_vars.AUTH_TOKEN_CACHE_ENABLED:
+			initialising_logger.warning(
+				'AUTH_TOKEN_CACHE_ENABLED needs the redis cache backend to hear about tokens revoked on other workers, '
+				'verifying every token against the database instead'
+			)
+
+		app.state.revocations = None
+		app.state.token_cache = None
 
 	app.add_middleware(
-		AuthenticationMiddleware,
-		backend=application_middleware.JWTCookieAuthBackend(),
-		on_error=on_auth_error
+		application_middleware.LazyAuthenticationMiddleware,
+		backend=application_middleware.JWTCookieAuthBackend(
+			token_cache=app.state.token_cache,
+			revocations=app.state.revocations
+		),
+		exempt_paths=environment_vars.AUTH_EXEMPT_PATHS
 	)
 
-	initialising_logger.info('Finished installing AuthenticationMiddleware...')
+	## the user is resolved inside the route now, so an invalid token is raised from there
+	app.add_exception_handler(AuthenticationError, on_auth_error)
 
-	CORS_ORIGINS: list[str] = []
-	for port in range(0, 65535):
-		CORS_ORIGINS.extend([
-			f"{environment_vars.FRONTEND_ADDRESS}",
-			f"http://localhost:{port}",
-			f"http://127.0.0.1:{port}"
-		])
-		
-	## be able to specify the environment vars
-	ENV_ORIGINS = environment_vars.ENV_ORIGINS
+	## recorded by TimingMiddleware, which app.py installs last so it times every other middleware
+	app.state.request_metrics = RequestMetrics() if environment_vars.METRICS_ENABLED else None
 
-	if ENV_ORIGINS:
-		ENV_ORIGINS: list[str] = ENV_ORIGINS.split(',')
-		CORS_ORIGINS.extend(ENV_ORIGINS)
+	initialising_logger.info('Finished installing LazyAuthenticationMiddleware...')
 
 	initialising_logger.info('Installing CORSMiddleware...')
 
 	app.add_middleware(
-		CORSMiddleware,
-		allow_origins=CORS_ORIGINS,
+		OriginPolicyCORSMiddleware,
+		policy=create_origin_policy(environment_vars),
 		allow_credentials=True,
 		allow_methods=["*"],
 		allow_headers=["*"],
-		expose_headers=['X-Process-Time', 'X-Route-Name']
+		expose_headers=['X-Process-Time', 'X-Route-Name', 'Server-Timing', 'ETag']
 	)
 
 	initialising_logger.info('Finished installing CORSMiddleware...')
@@ -173,16 +251,142 @@ def init_middleware(
 	@app.on_event("startup")
 	async def startup():
 
-		if environment_vars.REDIS_ENABLED:
-			app.state.redis = aioredis.from_url(REDIS_URL, decode_responses=True)
+		## Tortoise is initialised by now, so its clients are loaded
+		if environment_vars.SERVER_TIMING_ENABLED or environment_vars.SERVER_TIMING_LOG_ENABLED:
+			instrument_database()
+			instrument_serialisation()
+		elif environment_vars.DB_N_PLUS_ONE_THRESHOLD:
+			instrument_database()
+
+		# runs background work owned by the app, such as refreshing stale cached responses
+		app.state.scheduler = await aiojobs.create_scheduler(
+			limit = environment_vars.CACHE_SCHEDULER_LIMIT
+		)
+
+		app.state.cache = create_cache_backend(environment_vars)
+		app.state.cache_stats = CacheStats()
+
+		if app.state.cache is not None:
+			initialising_logger.info('Caching responses in {}...'.format(app.state.cache))
+
+		app.state.rate_limiters = create_rate_limiters(environment_vars, app.state.cache)
+
+		## a local cache only helps in front of a cache shared between workers
+		if app.state.cache is not None and app.state.cache.shared and environment_vars.CACHE_LOCAL_ENABLED:
+			app.state.local_cache = LocalCache(
+				max_bytes = environment_vars.CACHE_LOCAL_MAX_BYTES,
+				ttl_seconds = environment_vars.CACHE_LOCAL_TTL_SECONDS
+			)
+		else:
+			app.state.local_cache = None
+
+		## anything kept in the memory of this worker has to hear about changes made on the others
+		if app.state.cache is not None and app.state.cache.shared and (
+			app.state.local_cache is not None or app.state.token_cache is not None or app.state.revocations is not None
+		):
+			if environment_vars.CACHE_BROKER == 'memory':
+				app.state.cache_broker = MemoryBroker()
+			else:
+				app.state.cache_broker = app.state.cache.create_broker()
+
+			app.state.cache_listener = asyncio.create_task(listen_for_invalidations(
+				broker = app.state.cache_broker,
+				on_invalidate = invalidate_worker_caches,
+				on_reconnect = clear_worker_caches
+			))
+		else:
+			app.state.cache_broker = None
+
+		if app.state.revocations is not None and app.state.cache is not None:
+			await load_revocations(app.state.revocations, app.state.cache)
+
+			if app.state.cache_broker is not None:
+				app.state.revocation_listener = asyncio.create_task(listen(
+					broker = app.state.cache_broker,
+					channel = REVOCATION_CHANNEL,
+					on_message = on_revocation_message(app.state.revocations),
+					on_reconnect = lambda: load_revocations(app.state.revocations, app.state.cache)
+				))
+
+		if environment_vars.AUTH_TOKEN_SWEEPER_ENABLED:
+			app.state.token_sweeper = TokenSweeper(
+				interval_seconds = environment_vars.AUTH_TOKEN_SWEEPER_INTERVAL_SECONDS,
+				batch_size = environment_vars.AUTH_TOKEN_SWEEPER_BATCH_SIZE,
+				max_batches = environment_vars.AUTH_TOKEN_SWEEPER_MAX_BATCHES
+			)
+			app.state.token_sweeper_task = asyncio.create_task(app.state.token_sweeper.run(app.state.cache))
+		else:
+			app.state.token_sweeper = None
+
+		## every worker writes its metrics where the one that's scraped can add them up
+		if environment_vars.METRICS_ENABLED and environment_vars.METRICS_DIRECTORY:
+			app.state.metrics_writer = asyncio.create_task(write_snapshots(
+				app = app,
+				directory = environment_vars.METRICS_DIRECTORY,
+				interval_seconds = environment_vars.METRICS_WRITE_INTERVAL_SECONDS
+			))
 		else:
-			app.state.redis = None
+			app.state.metrics_writer = None
+
+		## the worker reports ready through /api/v1/internal/ready/ once its caches are warm
+		app.state.ready = False
+
+		if app.state.cache is not None and environment_vars.CACHE_WARMUP_ENABLED:
+			app.state.warmup = asyncio.create_task(warmup())
+		else:
+			app.state.warmup = None
+			app.state.ready = True
+
+	def invalidate_worker_caches(
+		tags: list[str]
+	) -> None:
+
+		for cache in (app.state.local_cache, app.state.token_cache):
+			if cache is not None:
+				cache.invalidate_tags(tags)
+
+	def clear_worker_caches() -> None:
+
+		for cache in (app.state.local_cache, app.state.token_cache):
+			if cache is not None:
+				cache.clear()
+
+	async def warmup():
+
+		try:
+			await warm_routes(
+				app = app,
+				paths = environment_vars.CACHE_WARMUP_PATHS,
+				concurrency = environment_vars.CACHE_WARMUP_CONCURRENCY,
+				budget_seconds = environment_vars.CACHE_WARMUP_BUDGET_SECONDS
+			)
+		finally:
+			app.state.ready = True
 
 	@app.on_event("shutdown")
 	async def shutdown():
 
-		if environment_vars.REDIS_ENABLED:
-			await app.state.redis.close()
+		if app.state.warmup is not None:
+			app.state.warmup.cancel()
+
+		if app.state.token_sweeper is not None:
+			app.state.token_sweeper_task.cancel()
+
+		## the counters of a stopped worker still count, its gauges don't
+		if app.state.metrics_writer is not None:
+			app.state.metrics_writer.cancel()
+			write_snapshot(environment_vars.METRICS_DIRECTORY, collect_metrics(app, gauges = False))
+
+		await app.state.scheduler.close()
+
+		if app.state.cache_broker is not None:
+			app.state.cache_listener.cancel()
+
+			if app.state.revocations is not None:
+				app.state.revocation_listener.cancel()
+
+		if app.state.cache is not None:
+			await app.state.cache.close()
 
 
 def init_db(
@@ -0,0 +1,119 @@
+from fastapi import (
+	Depends,
+	HTTPException,
+	Request,
+	Response,
+	status
+)
+from fastapi.responses import PlainTextResponse
+
+import secrets
+import typing
+
+from api_v1.base_service import Service
+from api_v1.metrics import (
+	CONTENT_TYPE,
+	STALE_AFTER_INTERVALS,
+	collect_metrics,
+	merge_snapshots,
+	read_snapshots,
+	render_metrics
+)
+
+
+class ReadinessService(Service):
+
+	'''
+		/ready/, which a load balancer polls before sending a worker traffic. Always installed, and open to anyone
+	'''
+
+	def install(self):
+
+		@self.router.get('/ready/')
+		async def get_ready(
+			request: Request,
+			response: Response
+		) -> dict:
+
+			## not ready until the caches are warm, so a load balancer holds traffic back until then
+			if not self.app.state.ready:
+				response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+
+			return {
+				'ready': self.app.state.ready
+			}
+
+class InternalService(Service):
+
+	'''
+		Endpoints for operating the API, rather than for its clients. They need INTERNAL_ENDPOINTS_TOKEN as a bearer
+		token - and are refused if it isn't set
+	'''
+
+	def install(self):
+
+		async def authorise_operator(
+			request: Request
+		) -> None:
+
+			token: str | None = self.settings.INTERNAL_ENDPOINTS_TOKEN
+
+			if not token:
+				raise HTTPException(
+					status_code = status.HTTP_403_FORBIDDEN,
+					detail = 'INTERNAL_ENDPOINTS_TOKEN is not set'
+				)
+
+			scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+
+			## compared in constant time, so the token can't be guessed a character at a time
+			if scheme.lower() != 'bearer' or not secrets.compare_digest(credentials.encode(), token.encode()):
+				raise HTTPException(
+					status_code = status.HTTP_401_UNAUTHORIZED,
+					headers = {'WWW-Authenticate': 'Bearer'}
+				)
+
+		operator_only: list = [Depends(authorise_operator)]
+
+		@self.router.get('/cache/stats/', dependencies = operator_only)
+		async def get_cache_stats(
+			request: Request
+		) -> dict[str, typing.Any]:
+
+			return {
+				'backend': str(self.app.state.cache) if self.app.state.cache is not None else None,
+				'local_cache': {
+					'entries': len(self.app.state.local_cache),
+					'bytes': self.app.state.local_cache.size
+				} if self.app.state.local_cache is not None else None,
+				'routes': self.app.state.cache_stats.snapshot()
+			}
+
+		@self.router.get('/tokens/sweeper/', dependencies = operator_only)
+		async def get_token_sweeper(
+			request: Request
+		) -> dict[str, typing.Any] | None:
+
+			if self.app.state.token_sweeper is None:
+				return None
+
+			return self.app.state.token_sweeper.to_dict()
+
+		@self.router.get('/metrics/', dependencies = operator_only)
+		async def get_metrics(
+			request: Request
+		) -> PlainTextResponse:
+
+			## this worker's own metrics are always current, the others' are as of their last write
+			snapshots: list[dict] = [collect_metrics(self.app)]
+
+			if self.settings.METRICS_DIRECTORY:
+				snapshots.extend(read_snapshots(
+					self.settings.METRICS_DIRECTORY,
+					stale_after_seconds = STALE_AFTER_INTERVALS * self.settings.METRICS_WRITE_INTERVAL_SECONDS
+				))
+
+			return PlainTextResponse(
+				render_metrics(merge_snapshots(snapshots)),
+				media_type = CONTENT_TYPE
+			)
@@ -1,3 +1,7 @@
 import logging
 
-initialising_logger = logging.getLogger('project.initialising')
\ No newline at end of file
+initialising_logger = logging.getLogger('project.initialising')
+cache_logger = logging.getLogger('project.cache')
+auth_logger = logging.getLogger('project.auth')
+timing_logger = logging.getLogger('project.timing')
+db_logger = logging.getLogger('project.db')
\ No newline at end of file
@@ -0,0 +1,476 @@
+import asyncio
+import contextlib
+import fcntl
+import glob
+import os
+import secrets
+import time
+import typing
+
+import orjson
+from fastapi import FastAPI
+from tortoise import connections
+from tortoise.exceptions import ConfigurationError
+
+from api_v1.cache.stats import (
+	CacheStats,
+	Histogram
+)
+from api_v1.cache.local import LocalCache
+from api_v1.logging import initialising_logger
+
+# upper bounds, in seconds, of the request latency histogram buckets
+REQUEST_BUCKETS: tuple[float, ...] = (
+	0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0
+)
+
+# any other method is counted as OTHER, so clients can't create series of their own
+METHODS: frozenset[str] = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+
+CONTENT_TYPE: str = 'text/plain; version=0.0.4' ## the charset is added by PlainTextResponse
+
+# name -> (type, help) of every metric
+METRICS: dict[str, tuple[str, str]] = {
+	'http_requests_total': ('counter', 'Requests handled, by method, route template and status'),
+	'http_request_duration_seconds': ('histogram', 'Seconds until the response started, by method and route template'),
+	'http_requests_in_flight': ('gauge', 'Requests being handled'),
+	'db_pool_connections': ('gauge', 'Database pool connections, by state: size, idle and max'),
+	'cache_route_events_total': ('counter', 'Cache lookups and changes, by route and event'),
+	'cache_route_bytes_total': ('counter', 'Bytes of cached responses, by route: served and stored'),
+	'cache_local_entries': ('gauge', 'Entries in the local cache'),
+	'cache_local_bytes': ('gauge', 'Bytes in the local cache'),
+}
+
+# the fields of RouteCacheStats counted as cache_route_events_total
+CACHE_EVENTS: tuple[str, ...] = (
+	'local_hits',
+	'hits',
+	'misses',
+	'stale_hits',
+	'fills',
+	'not_modified',
+	'invalidations',
+	'invalidated_keys',
+)
+
+# how many write intervals old the gauges of a snapshot can be - a worker that has stopped writing has crashed
+STALE_AFTER_INTERVALS: int = 3
+
+# in METRICS_DIRECTORY: the counters of every worker that has stopped, added up into one snapshot - outside of the
+# pattern of the workers' own snapshots - and the file locked while they're added to it, or read
+STOPPED_WORKERS_FILE: str = 'stopped-workers.json'
+LOCK_FILE: str = 'metrics.lock'
+
+# a snapshot: counters, gauges and histograms, by metric name then labels, and when it was written.
+# Labels are kept already formatted, so snapshots can be merged and rendered without parsing them
+Snapshot = dict[str, typing.Any]
+
+class RequestMetrics:
+
+	'''
+		Request counts and latencies by route template, for this worker. Recorded by TimingMiddleware,
+		lives on app.state.request_metrics
+	'''
+
+	__slots__ = (
+		'in_flight',
+		'requests',
+		'latency',
+	)
+
+	def __init__(
+		self: 'RequestMetrics'
+	):
+
+		self.in_flight: int = 0
+		self.requests: dict[tuple[str, str, int], int] = {} ## (method, route, status) -> requests
+		self.latency: dict[tuple[str, str], Histogram] = {} ## (method, route) -> latency
+
+	def observe(
+		self: 'RequestMetrics',
+		method: str,
+		route: str,
+		status: int,
+		seconds: float
+	) -> None:
+
+		if method not in METHODS:
+			method = 'OTHER'
+
+		key: tuple[str, str, int] = (method, route, status)
+		self.requests[key] = self.requests.get(key, 0) + 1
+
+		histogram: Histogram | None = self.latency.get((method, route), None)
+
+		if histogram is None:
+			histogram = self.latency[(method, route)] = Histogram(REQUEST_BUCKETS)
+
+		histogram.observe(seconds)
+
+def labels(
+	**values: typing.Any
+) -> str:
+
+	return ','.join(
+		'{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+		for name, value in values.items()
+	)
+
+def collect_metrics(
+	app: FastAPI,
+	gauges: bool = True
+) -> Snapshot:
+	'''
+		Takes a snapshot of the metrics of this worker
+
+		params:
+			app : FastAPI : the application
+			gauges : bool (optional) : whether to include gauges - they mean nothing once the worker has stopped
+
+		returns dict, of counters, gauges and histograms
+	'''
+
+	snapshot: Snapshot = {'counters': {}, 'gauges': {}, 'histograms': {}}
+	counters: dict[str, dict[str, typing.Any]] = snapshot['counters']
+
+	request_metrics: RequestMetrics | None = getattr(app.state, 'request_metrics', None)
+
+	if request_metrics is not None:
+		counters['http_requests_total'] = {
+			labels(method=method, route=route, status=status): requests
+			for (method, route, status), requests in request_metrics.requests.items()
+		}
+		snapshot['histograms']['http_request_duration_seconds'] = {
+			labels(method=method, route=route): {
+				'buckets': histogram.buckets,
+				'counts': histogram.counts,
+				'sum': histogram.sum,
+				'count': histogram.count
+			}
+			for (method, route), histogram in request_metrics.latency.items()
+		}
+
+	counters['cache_route_events_total'] = {}
+	counters['cache_route_bytes_total'] = {}
+
+	cache_stats: CacheStats | None = getattr(app.state, 'cache_stats', None)
+
+	for route, stats in cache_stats.routes.items() if cache_stats is not None else ():
+		for event in CACHE_EVENTS:
+			counters['cache_route_events_total'][labels(route=route, event=event)] = getattr(stats, event)
+
+		counters['cache_route_bytes_total'][labels(route=route, direction='served')] = stats.bytes_served
+		counters['cache_route_bytes_total'][labels(route=route, direction='stored')] = stats.bytes_stored
+
+	if not gauges:
+		return snapshot
+
+	if request_metrics is not None:
+		snapshot['gauges']['http_requests_in_flight'] = {'': request_metrics.in_flight}
+
+	local_cache: LocalCache | None = getattr(app.state, 'local_cache', None)
+
+	if local_cache is not None:
+		snapshot['gauges']['cache_local_entries'] = {'': len(local_cache)}
+		snapshot['gauges']['cache_local_bytes'] = {'': local_cache.size}
+
+	## only pooled clients, such as asyncpg, have a pool to report
+	pools: dict[str, typing.Any] = {}
+
+	try:
+		clients: list[typing.Any] = connections.all()
+	except ConfigurationError: ## Tortoise hasn't been initialised yet
+		clients = []
+
+	for client in clients:
+		pool: typing.Any = getattr(client, '_pool', None)
+
+		if pool is not None and hasattr(pool, 'get_size'):
+			pools[labels(connection=client.connection_name, state='size')] = pool.get_size()
+			pools[labels(connection=client.connection_name, state='idle')] = pool.get_idle_size()
+			pools[labels(connection=client.connection_name, state='max')] = pool.get_max_size()
+
+	if pools:
+		snapshot['gauges']['db_pool_connections'] = pools
+
+	return snapshot
+
+def merge_snapshots(
+	snapshots: typing.Iterable[Snapshot]
+) -> Snapshot:
+	'''
+		Adds up the snapshots of every worker - counters, gauges and the buckets of histograms alike
+	'''
+
+	merged: Snapshot = {'counters': {}, 'gauges': {}, 'histograms': {}}
+
+	for snapshot in snapshots:
+		for kind in ('counters', 'gauges'):
+			for name, series in snapshot.get(kind, {}).items():
+				merged_series: dict[str, typing.Any] = merged[kind].setdefault(name, {})
+
+				for key, value in series.items():
+					merged_series[key] = merged_series.get(key, 0) + value
+
+		for name, series in snapshot.get('histograms', {}).items():
+			merged_series = merged['histograms'].setdefault(name, {})
+
+			for key, histogram in series.items():
+				total: dict[str, typing.Any] | None = merged_series.get(key, None)
+
+				if total is None:
+					merged_series[key] = {**histogram, 'counts': list(histogram['counts'])}
+					continue
+
+				total['counts'] = [a + b for a, b in zip(total['counts'], histogram['counts'])]
+				total['sum'] += histogram['sum']
+				total['count'] += histogram['count']
+
+	return merged
+
+def render_metrics(
+	snapshot: Snapshot
+) -> str:
+	'''
+		Renders a snapshot in the Prometheus text exposition format
+	'''
+
+	lines: list[str] = []
+
+	for kind in ('counters', 'gauges', 'histograms'):
+		for name, series in snapshot[kind].items():
+			if not series:
+				continue
+
+			metric_type, description = METRICS[name]
+			lines.append(f'# HELP {name} {description}')
+			lines.append(f'# TYPE {name} {metric_type}')
+
+			for key, value in series.items():
+				if kind != 'histograms':
+					lines.append(f'{name}{{{key}}} {value}' if key else f'{name} {value}')
+					continue
+
+				## Prometheus buckets count everything up to their bound, not just what's since the last bound
+				cumulative: int = 0
+				separator: str = ',' if key else ''
+
+				for bound, count in zip([*value['buckets'], '+Inf'], value['counts']):
+					cumulative += count
+					lines.append(f'{name}_bucket{{{key}{separator}le="{bound}"}} {cumulative}')
+
+				lines.append(f'{name}_sum{{{key}}} {value["sum"]}' if key else f'{name}_sum {value["sum"]}')
+				lines.append(f'{name}_count{{{key}}} {value["count"]}' if key else f'{name}_count {value["count"]}')
+
+	return '\n'.join(lines) + '\n'
+
+# (pid, the id of the worker with that pid) - see worker_id
+current_worker: tuple[int, str] | None = None
+
+def worker_id() -> str:
+	'''
+		An id for this worker, that a worker started later with a recycled pid won't have: its pid and a random token.
+		Made again after a fork, so the workers of a server that imports the application first each have their own
+	'''
+
+	global current_worker
+
+	if current_worker is None or current_worker[0] != os.getpid():
+		current_worker = (os.getpid(), f'{os.getpid()}-{secrets.token_hex(4)}')
+
+	return current_worker[1]
+
+def snapshot_path(
+	directory: str,
+	worker: str
+) -> str:
+	return os.path.join(directory, f'metrics-{worker}.json')
+
+def snapshot_worker(
+	path: str
+) -> str:
+	## the inverse of snapshot_path
+	return os.path.basename(path)[len('metrics-'):-len('.json')]
+
+def is_running(
+	pid: int
+) -> bool:
+
+	try:
+		os.kill(pid, 0)
+	except ProcessLookupError:
+		return False
+	except PermissionError: ## running, as another user
+		return True
+
+	return True
+
+@contextlib.contextmanager
+def locked(
+	directory: str,
+	operation: int
+) -> typing.Iterator[bool]:
+	'''
+		Locks the metrics in directory, shared (fcntl.LOCK_SH) to read them, or exclusive (fcntl.LOCK_EX) to change them.
+		With fcntl.LOCK_NB, yields whether the lock was taken instead of waiting for it
+	'''
+
+	with open(os.path.join(directory, LOCK_FILE), 'a') as file:
+		try:
+			fcntl.flock(file, operation)
+		except BlockingIOError:
+			yield False
+			return
+
+		try:
+			yield True
+		finally:
+			fcntl.flock(file, fcntl.LOCK_UN)
+
+def read_snapshot(
+	path: str
+) -> Snapshot | None:
+
+	try:
+		with open(path, 'rb') as file:
+			return orjson.loads(file.read())
+	except (OSError, orjson.JSONDecodeError):
+		return None
+
+def write_snapshot(
+	directory: str,
+	snapshot: Snapshot,
+	path: str | None = None
+) -> None:
+	'''
+		Writes the snapshot of this worker to directory, for the other workers to read.
+		Written whole and then renamed, so a reader never sees half of one
+	'''
+
+	path = path or snapshot_path(directory, worker_id())
+
+	with open(f'{path}.tmp', 'wb') as file:
+		file.write(orjson.dumps({**snapshot, 'written_at': time.time()}))
+
+	os.replace(f'{path}.tmp', path)
+
+def read_snapshots(
+	directory: str,
+	stale_after_seconds: float
+) -> list[Snapshot]:
+	'''
+		Reads the snapshots every other worker has written to directory, and the counters of the workers that have
+		stopped - so they carry on counting towards the total. The gauges of a snapshot older than stale_after_seconds
+		are dropped: a worker that crashed never wrote the snapshot without them that it would have on shutdown
+
+		params:
+			directory : str : where every worker writes its snapshot
+			stale_after_seconds : float : how old a snapshot can be before its gauges are dropped
+
+		returns list, of snapshots
+	'''
+
+	snapshots: list[Snapshot] = []
+	own_path: str = snapshot_path(directory, worker_id())
+	stale_before: float = time.time() - stale_after_seconds
+
+	if not os.path.isdir(directory): ## no worker has written to it yet
+		return snapshots
+
+	## not while the snapshots of stopped workers are being moved into STOPPED_WORKERS_FILE, or they'd count twice
+	with locked(directory, fcntl.LOCK_SH):
+		stopped: Snapshot | None = read_snapshot(os.path.join(directory, STOPPED_WORKERS_FILE))
+		folded: set[str] = set(stopped.get('workers', ())) if stopped is not None else set()
+
+		if stopped is not None:
+			snapshots.append(stopped)
+
+		for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+			if path == own_path or snapshot_worker(path) in folded:
+				continue
+
+			snapshot: Snapshot | None = read_snapshot(path)
+
+			if snapshot is None:
+				continue
+
+			if snapshot.get('written_at', 0.0) < stale_before:
+				snapshot['gauges'] = {}
+
+			snapshots.append(snapshot)
+
+	return snapshots
+
+def fold_stopped_workers(
+	directory: str,
+	stale_after_seconds: float
+) -> int:
+	'''
+		Adds the counters of the workers that have stopped into STOPPED_WORKERS_FILE, and deletes their snapshots -
+		so the directory, and the series it's rendered to, stay as large as the workers running, however many have been
+		restarted. A worker has stopped once its snapshot is older than stale_after_seconds and its process has exited.
+		Skipped if another worker is already doing it
+
+		params:
+			directory : str : where every worker writes its snapshot
+			stale_after_seconds : float : how old a snapshot has to be before its worker is checked for
+
+		returns the number of snapshots folded
+	'''
+
+	stopped_path: str = os.path.join(directory, STOPPED_WORKERS_FILE)
+	stale_before: float = time.time() - stale_after_seconds
+
+	with locked(directory, fcntl.LOCK_EX | fcntl.LOCK_NB) as acquired:
+		if not acquired:
+			return 0
+
+		stopped: Snapshot = read_snapshot(stopped_path) or {}
+
+		## the snapshots folded last time, in case they weren't all deleted
+		for worker in stopped.get('workers', ()):
+			with contextlib.suppress(FileNotFoundError):
+				os.remove(snapshot_path(directory, worker))
+
+		paths: list[str] = [
+			path for path in glob.glob(os.path.join(directory, 'metrics-*.json'))
+			if os.path.getmtime(path) < stale_before and not is_running(int(snapshot_worker(path).partition('-')[0]))
+		]
+
+		if not paths:
+			return 0
+
+		snapshots: list[Snapshot] = [snapshot for snapshot in map(read_snapshot, paths) if snapshot is not None]
+
+		merged: Snapshot = merge_snapshots([stopped, *({**snapshot, 'gauges': {}} for snapshot in snapshots)])
+		merged['workers'] = [snapshot_worker(path) for path in paths]
+
+		## counted once it's written, and skipped by read_snapshots from then on - so the order doesn't matter
+		write_snapshot(directory, merged, path = stopped_path)
+
+		for path in paths:
+			with contextlib.suppress(FileNotFoundError):
+				os.remove(path)
+
+		return len(paths)
+
+async def write_snapshots(
+	app: FastAPI,
+	directory: str,
+	interval_seconds: float
+) -> None:
+	'''
+		Writes the snapshot of this worker every interval_seconds, and folds the snapshots of stopped workers,
+		until cancelled
+	'''
+
+	os.makedirs(directory, exist_ok = True)
+
+	while True:
+		try:
+			write_snapshot(directory, collect_metrics(app))
+			fold_stopped_workers(directory, stale_after_seconds = STALE_AFTER_INTERVALS * interval_seconds)
+		except OSError:
+			initialising_logger.exception(f'Failed to write metrics to {directory}')
+
+		await asyncio.sleep(interval_seconds)
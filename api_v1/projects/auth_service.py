@@ -1,4 +1,5 @@
 from fastapi import (
+	FastAPI,
 	APIRouter,
 	Request,
 	Depends,
@@ -12,7 +13,8 @@ from fastapi import (
 	Query
 )
 from fastapi.responses import (
-	RedirectResponse
+	RedirectResponse,
+	JSONResponse
 )
 from fastapi.websockets import WebSocketDisconnect
 from starlette.authentication import (
@@ -23,7 +25,8 @@ from starlette.authentication import (
 from tortoise.timezone import now
 from sse_starlette.sse import EventSourceResponse
 
-from datetime import timedelta
+from datetime import datetime, timedelta
+from secrets import token_hex
 import re
 import typing
 import json
@@ -40,18 +43,30 @@ from api_v1.projects.models import (
 	User,
 )
 from api_v1.projects.settings import (
-	AUTH_SECRET_KEY,
 	AUTH_ALGORITHM
 )
 from api_v1.settings import get_settings
+from api_v1.logging import auth_logger
 from api_v1.base_service import Service
 from api_v1.pydantic.models import (
 	User_Pydantic,
 	UserListing_Pydantic
 )
+from api_v1.projects.token_cache import (
+	invalidate_tokens
+)
+from api_v1.projects.revocation import (
+	revoke_token
+)
+from api_v1.projects.middleware import (
+	resolve_user
+)
 from api_v1.decorators import (
 	requires_login,
-	cache_route
+	throttle,
+	cache_route,
+	conditional_route,
+	delete_cached_route
 )
 from typing import (
 	List,
@@ -60,14 +75,201 @@ from typing import (
 
 password_regex = re.compile('^(?=.*?[A-Z])(?=.*?[a-z])(?=.*?[0-9])(?=.*?[#?!@$%^&*-]).{8,}$')
 
+# the longest username, JSON escaped, an access token carries as its name claim. A longer one is left out, and
+# the token is verified against the database even in stateless mode, so every token fits in token.token
+NAME_CLAIM_MAX_LENGTH: int = 64
+
+def client_ip(
+	request: Request,
+	**kwargs
+) -> str:
+	return request.client.host if request.client else 'unknown'
+
+## only an attempt with credentials costs a password hash, so only those are limited
+
+def login_client_ip(
+	request: Request,
+	form_data: RouteLogin | None = None,
+	**kwargs
+) -> str | None:
+	return client_ip(request) if isinstance(form_data, RouteLogin) else None
+
+def login_username(
+	form_data: RouteLogin | None = None,
+	**kwargs
+) -> str | None:
+	## without a username there's no account to guess the password of, and the route rejects it
+	if not isinstance(form_data, RouteLogin) or not form_data.username:
+		return None
+
+	return form_data.username.lower()
+
+async def issue_tokens(
+	response: Response,
+	user: User,
+	refresh_cookie_path: str,
+	family: str | None = None
+) -> None:
+	'''
+		Creates an access token and a refresh token for a user, and sets them as cookies.
+		Every refresh token rotated from the same login belongs to the same family, with the access tokens it issued
+
+		params:
+			response : Response : the response to set the cookies on
+			user : User : the user
+			refresh_cookie_path : str : the path the refresh token cookie is sent to
+			family : str (optional) : the family of the refresh token being rotated, a new family on login
+	'''
+
+	family = family or token_hex(16)
+
+	access_token_expires = timedelta(
+		minutes=auth_settings.AUTH_ACCESS_TOKEN_EXPIRE_MINUTES
+	)
+	refresh_token_expires = timedelta(
+		days=auth_settings.AUTH_REFRESH_TOKEN_EXPIRE_DAYS
+	)
+
+	claims: dict[str, str] = {"sub": str(user.pk)}
+
+	if len(json.dumps(user.username)) <= NAME_CLAIM_MAX_LENGTH:
+		claims["name"] = user.username
+
+	access_token, access_expiry = create_access_token(
+		data=claims, expires_delta=access_token_expires
+	)
+	refresh_token, refresh_expiry = create_access_token(
+		data={"sub": claims["sub"], "typ": "refresh", "fam": family}, expires_delta=refresh_token_expires
+	)
+
+	await Token.bulk_create([
+		Token(
+			token=access_token,
+			expires=access_expiry,
+			user_id=user.pk,
+			family=family
+		),
+		Token(
+			token=refresh_token,
+			expires=refresh_expiry,
+			user_id=user.pk,
+			family=family,
+			is_refresh=True
+		)
+	])
+
+	total_seconds: int = access_token_expires.total_seconds()
+
+	response.set_cookie(
+		key="token",
+		value=access_token,
+		max_age=total_seconds,
+		expires=total_seconds
+	)
+
+	total_seconds = refresh_token_expires.total_seconds()
+
+	## only sent to the auth endpoints, and never readable from javascript
+	response.set_cookie(
+		key="refresh_token",
+		value=refresh_token,
+		max_age=total_seconds,
+		expires=total_seconds,
+		path=refresh_cookie_path,
+		httponly=True
+	)
+
+async def rotated_recently(
+	token_id: int
+) -> bool:
+	'''
+		Whether a refresh token was rotated in the last AUTH_REFRESH_REUSE_GRACE_SECONDS - rotating it
+		has it expire at the end of that grace period, while revoking it leaves it to expire as it would have
+	'''
+
+	current_time: datetime = now()
+
+	return await Token.filter(
+		id=token_id,
+		force_expiration=True,
+		expires__gt=current_time,
+		expires__lte=current_time + timedelta(seconds=auth_settings.AUTH_REFRESH_REUSE_GRACE_SECONDS)
+	).exists()
+
+def clear_tokens(
+	response: Response,
+	refresh_cookie_path: str
+) -> None:
+
+	response.set_cookie(
+		key="token",
+		value=None,
+		max_age=0,
+		expires=0
+	)
+
+	response.set_cookie(
+		key="refresh_token",
+		value=None,
+		max_age=0,
+		expires=0,
+		path=refresh_cookie_path,
+		httponly=True
+	)
+
+async def revoke_tokens(
+	app: FastAPI,
+	tokens: list[str]
+) -> None:
+	'''
+		Revokes tokens everywhere they may be trusted: the database, the token cache of every worker,
+		and in stateless mode the revocation list of every worker
+
+		params:
+			app : FastAPI : the application
+			tokens : list[str] : the tokens to revoke
+	'''
+
+	if not tokens:
+		return
+
+	await Token.filter(
+		token__in=tokens
+	).update(
+		force_expiration=True
+	)
+
+	await invalidate_tokens(app, tokens)
+
+	## a stateless token stays valid until it expires, unless it's revoked
+	for token in tokens if app.state.revocations is not None else ():
+		claims: dict | None = decode_token_claims(token, verify_expiry=False)
+
+		if claims is not None and "jti" in claims:
+			await revoke_token(
+				revocations=app.state.revocations,
+				jti=claims["jti"],
+				expires_at=claims["exp"],
+				cache=app.state.cache,
+				broker=app.state.cache_broker
+			)
+
 
 class AuthService(Service):
 
 	def install(self):
 
 		@self.router.get('/users/')
+		@conditional_route(
+			app = self.app,
+			tags = ('users', ),
+			vary = ()
+		)
 		@cache_route(
-			app = self.app
+			app = self.app,
+			soft_ttl_seconds = self.settings.CACHE_SOFT_TTL_SECONDS,
+			tags = ('users', ),
+			vary = ()
 		)
 		async def get_users(
 			request: Request
@@ -79,13 +281,23 @@ class AuthService(Service):
 
 
 		@self.router.post("/login/")
+		@throttle(
+			app = self.app,
+			limiter = 'ip',
+			key = login_client_ip
+		)
+		@throttle(
+			app = self.app,
+			limiter = 'username',
+			key = login_username
+		)
 		async def login(
 			request: Request,
 			response: Response,
 			form_data: Optional[RouteLogin] = Optional[None]
 		):
 
-			if hasattr(request.user, 'pk'):
+			if hasattr(await resolve_user(request), 'pk'):
 
 				user: User = request.user
 
@@ -98,31 +310,12 @@ class AuthService(Service):
 						'message': 'Not Authenticated'
 					}
 
-				access_token_expires = timedelta(
-					minutes=auth_settings.AUTH_ACCESS_TOKEN_EXPIRE_MINUTES
-				)
-
 				user: User = await User._authenticate_user(form_data.username, form_data.password)
 
-				access_token, expiry = create_access_token(
-					data={"sub": str(user.pk)}, expires_delta=access_token_expires
-				)
-
-				await Token.create(
-					token=access_token,
-					expires=expiry,
-					user_id=user.pk,
-					secret=AUTH_SECRET_KEY,
-					algorithm=AUTH_ALGORITHM
-				)
-
-				total_seconds: int = access_token_expires.total_seconds()
-
-				response.set_cookie(
-					key="token",
-					value=access_token,
-					max_age=total_seconds,
-					expires=total_seconds
+				await issue_tokens(
+					response=response,
+					user=user,
+					refresh_cookie_path=f'{self.router_prefix}/'
 				)
 
 			return await User_Pydantic.from_tortoise_orm(user)
@@ -133,40 +326,127 @@ class AuthService(Service):
 			response: Response,
 		):
 
-			token = request.cookies.get('token')
+			tokens: list[str] = [
+				token for token in (request.cookies.get('token'), request.cookies.get('refresh_token'))
+				if token is not None
+			]
 
-			tokens: list[str] = []
+			await revoke_tokens(self.app, tokens)
 
-			if token is not None:
-				tokens.append(token)
+			clear_tokens(
+				response=response,
+				refresh_cookie_path=f'{self.router_prefix}/'
+			)
+				
+			return {}
 
-			token_in_db = await Token.filter(
-				token__in=tokens
-			).update(
-				force_expiration=True
+		@self.router.post("/refresh/")
+		@throttle(
+			app = self.app,
+			limiter = 'refresh',
+			key = client_ip
+		)
+		async def refresh(
+			request: Request,
+			response: Response
+		):
+			'''
+				Rotates the refresh token for a new pair of tokens, without the password. A refresh token can only be used once:
+				one used again has been stolen, or the thief used it first - either way its whole family is revoked.
+				Except within AUTH_REFRESH_REUSE_GRACE_SECONDS of rotating it, as two tabs refreshing at once both send it
+			'''
+
+			exception = HTTPException(
+				status_code=status.HTTP_401_UNAUTHORIZED,
+				detail="Token expired."
+			)
+
+			refresh_token: str | None = request.cookies.get('refresh_token')
+			claims: dict | None = decode_token_claims(refresh_token) if refresh_token else None
+
+			if claims is None or claims.get("typ") != "refresh" or "fam" not in claims:
+				raise exception
+
+			token_in_db: dict | None = await Token.filter(
+				token=refresh_token,
+				is_refresh=True
+			).first().values(
+				"id",
+				"force_expiration",
+				"user_id"
 			)
 
-			for key, value in {'token': None}.items():
-				response.set_cookie(
-					key=key,
-					value=value,
-					max_age=0,
-					expires=0
+			## the row is only marked as used if no other request got to it first. It expires once the grace period is over
+			rotated: bool = token_in_db is not None and not token_in_db["force_expiration"] and await Token.filter(
+				id=token_in_db["id"],
+				force_expiration=False
+			).update(
+				force_expiration=True,
+				expires=now() + timedelta(seconds=auth_settings.AUTH_REFRESH_REUSE_GRACE_SECONDS)
+			) == 1
+
+			if not rotated and token_in_db is not None and await rotated_recently(token_in_db["id"]):
+				## the browser already has the tokens it was rotated for, so they're neither rotated again nor revoked
+				return await User_Pydantic.from_tortoise_orm(await User.get(id=token_in_db["user_id"]))
+
+			if not rotated:
+				auth_logger.warning(f'Refresh token reused, revoking token family {claims["fam"]}')
+
+				await revoke_tokens(
+					self.app,
+					await Token.filter(
+						family=claims["fam"],
+						force_expiration=False
+					).values_list('token', flat=True)
 				)
-				
-			return {}
+
+				response = JSONResponse(
+					status_code=status.HTTP_401_UNAUTHORIZED,
+					content={"detail": "Token expired."}
+				)
+
+				clear_tokens(
+					response=response,
+					refresh_cookie_path=f'{self.router_prefix}/'
+				)
+
+				return response
+
+			user: User = await User.get(
+				id=token_in_db["user_id"]
+			)
+
+			## the access token the refresh token was used alongside is replaced too
+			await revoke_tokens(
+				self.app,
+				[token for token in (request.cookies.get('token'), ) if token is not None]
+			)
+
+			await issue_tokens(
+				response=response,
+				user=user,
+				refresh_cookie_path=f'{self.router_prefix}/',
+				family=claims["fam"]
+			)
+
+			return await User_Pydantic.from_tortoise_orm(user)
 
 		@self.router.post("/register/")
+		@throttle(
+			app = self.app,
+			limiter = 'ip',
+			key = client_ip
+		)
+		@delete_cached_route(
+			app = self.app,
+			tags = ('users', )
+		)
 		async def register(
 			request: Request,
 			response: Response,
 			form_data: RouteLogin
 		):
 
-			access_token_expires = timedelta(
-				minutes=auth_settings.AUTH_ACCESS_TOKEN_EXPIRE_MINUTES
-			)
-
 			user_with_username_exists: bool = await check_if_user_exists(
 				username=form_data.username
 			)
@@ -187,25 +467,10 @@ class AuthService(Service):
 				password=form_data.password
 			)
 			
-			access_token, expiry = create_access_token(
-				data={"sub": str(user.pk)}, expires_delta=access_token_expires
-			)
-
-			await Token.create(
-				token=access_token,
-				expires=expiry,
-				user_id=user.pk,
-				secret=AUTH_SECRET_KEY,
-				algorithm=AUTH_ALGORITHM
-			)
-
-			total_seconds: int = access_token_expires.total_seconds()
-
-			response.set_cookie(
-				key="token",
-				value=access_token,
-				max_age=total_seconds,
-				expires=total_seconds
+			await issue_tokens(
+				response=response,
+				user=user,
+				refresh_cookie_path=f'{self.router_prefix}/'
 			)
 
 			return await User_Pydantic.from_tortoise_orm(user)
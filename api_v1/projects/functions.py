@@ -34,7 +34,6 @@ from jose.exceptions import (
 	JWTClaimsError
 )
 from api_v1.projects.settings import (
-	AUTH_SECRET_KEY,
 	AUTH_ALGORITHM,
 	AUTH_EMAIL_VERIFICATION_EMAIL_BODY
 )
@@ -42,11 +41,14 @@ from api_v1.projects.models import (
 	User,
 	Token
 )
+from api_v1.projects.revocation import RevocationList
+from api_v1.projects.keyring import get_keyring
 import api_v1.projects.settings as auth_settings
 import api_v1.settings as api_v1_settings
 from api_v1.settings import get_settings
 
 import os
+from secrets import token_hex
 
 environment_vars = get_settings()
 
@@ -98,21 +100,22 @@ def create_access_token(
 	else:
 		expire = now() + timedelta(minutes=15)
 
-	to_encode.update({"exp": expire})
-	encoded_jwt = jwt.encode(to_encode, AUTH_SECRET_KEY, algorithm=AUTH_ALGORITHM)
+	## every token gets a unique id, by which it can be revoked
+	to_encode.update({"exp": expire, "jti": token_hex(16)})
+	encoded_jwt = get_keyring().sign(to_encode)
 
 	return encoded_jwt, expire
 
-async def get_current_user(
+async def get_current_token_user(
 	token
-) -> HTTPException | User:
+) -> tuple[User, datetime]:
 	'''
 		Attempts to retrieve the JWT, and extract details - then retrieve a User
 
 		params:
 			token : str :the JWT extracted from the Authorization header
 
-		returns User else raises HTTPException
+		returns tuple(User, datetime the token expires) else raises HTTPException
 	'''
 
 	exception = HTTPException(
@@ -121,28 +124,111 @@ async def get_current_user(
 	)
 
 	try:
-		token_in_db = await Token.get_or_none(
+		## the signature is checked first, so a forged token costs no query at all
+		payload = get_keyring().verify(token)
+		pk = payload.get("sub")
+
+		## the token and its user, in one joined query of only the columns needed
+		token_in_db: dict | None = await Token.filter(
 			token=token
-		).only("algorithm", "token", "secret", "force_expiration", "expires")
+		).first().values(
+			"force_expiration",
+			"expires",
+			"user_id",
+			user_username="user__username"
+		)
 
 		if token_in_db is None:
 			raise exception
 
-		payload = jwt.decode(token, token_in_db.secret, algorithms=[token_in_db.algorithm])
-		pk = payload.get("sub")
-
-		if pk is None or token_in_db.is_expired():
+		## a refresh token only ever buys a new access token, at the refresh endpoint
+		if pk is None or payload.get("typ") == "refresh" or token_in_db["force_expiration"] or token_in_db["expires"] < now():
 			raise exception
 		
 	except Exception as e:
 		raise exception
 
-	user = await User.get_by_id(id=pk)
-
-	if user is None:
+	if token_in_db["user_username"] is None or str(token_in_db["user_id"]) != str(pk):
 		raise HTTPException(
 			status_code=status.HTTP_404_NOT_FOUND,
 			detail="User does not exist."
 		)
 
-	return user
\ No newline at end of file
+	user: User = User.from_identity(
+		id=token_in_db["user_id"],
+		username=token_in_db["user_username"]
+	)
+
+	return user, token_in_db["expires"]
+
+async def get_current_user(
+	token
+) -> HTTPException | User:
+	'''
+		Attempts to retrieve the JWT, and extract details - then retrieve a User
+
+		params:
+			token : str :the JWT extracted from the Authorization header
+
+		returns User else raises HTTPException
+	'''
+
+	user, expires = await get_current_token_user(token)
+
+	return user
+
+def decode_token_claims(
+	token: str,
+	verify_expiry: bool = True
+) -> dict | None:
+	'''
+		Verifies the signature of a JWT with the keyring, and returns its claims
+
+		params:
+			token : str : the JWT
+			verify_expiry : bool (optional) : whether an expired JWT is rejected
+
+		returns dict, or None if the JWT isn't valid
+	'''
+
+	try:
+		return get_keyring().verify(token, verify_expiry=verify_expiry)
+	except JWTError:
+		return None
+
+def get_stateless_token_user(
+	token: str,
+	revocations: RevocationList
+) -> tuple[User, datetime] | None:
+	'''
+		Verifies a JWT without the database: its signature with the keyring, and that it
+		hasn't been revoked. The user comes from the claims of the JWT
+
+		params:
+			token : str : the JWT extracted from the cookies
+			revocations : RevocationList : the tokens revoked so far
+
+		returns tuple(User, datetime the token expires), None if the token is too long a username to carry
+		and has to be verified against the database, else raises HTTPException
+	'''
+
+	claims: dict | None = decode_token_claims(token)
+
+	if (
+		claims is None or "jti" not in claims
+		or claims.get("typ") == "refresh" or revocations.is_revoked(claims["jti"])
+	):
+		raise HTTPException(
+			status_code=status.HTTP_401_UNAUTHORIZED,
+			detail="Token expired."
+		)
+
+	if "name" not in claims:
+		return None
+
+	user: User = User.from_identity(
+		id=int(claims["sub"]),
+		username=claims["name"]
+	)
+
+	return user, datetime.fromtimestamp(claims["exp"], tz=timezone.utc)
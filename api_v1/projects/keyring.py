@@ -0,0 +1,102 @@
+from functools import lru_cache
+
+from jose import (
+	JWTError,
+	jwt
+)
+
+from api_v1.settings import get_settings
+from api_v1.projects.settings import AUTH_ALGORITHM
+
+class Keyring:
+
+	'''
+		The keys JWTs are signed with, by key id. Every JWT names the key that signed it in its "kid" header,
+		so keys can be rotated: sign with a new active key, and keep the old one until the JWTs it signed expire
+	'''
+
+	__slots__ = (
+		'keys',
+		'active_key_id',
+		'algorithm',
+	)
+
+	def __init__(
+		self: 'Keyring',
+		keys: dict[str, str],
+		active_key_id: str,
+		algorithm: str = AUTH_ALGORITHM
+	):
+
+		if active_key_id not in keys:
+			raise ValueError(f"The active signing key '{active_key_id}' isn't in the keyring")
+
+		self.keys: dict[str, str] = keys
+		self.active_key_id: str = active_key_id
+		self.algorithm: str = algorithm
+
+	def sign(
+		self: 'Keyring',
+		claims: dict
+	) -> str:
+		return jwt.encode(
+			claims,
+			self.keys[self.active_key_id],
+			algorithm=self.algorithm,
+			headers={"kid": self.active_key_id}
+		)
+
+	def verify(
+		self: 'Keyring',
+		token: str,
+		verify_expiry: bool = True
+	) -> dict:
+		'''
+			Verifies the signature of a JWT with the key it names, and returns its claims
+
+			params:
+				token : str : the JWT
+				verify_expiry : bool (optional) : whether an expired JWT is rejected
+
+			returns dict else raises JWTError
+		'''
+
+		key: str | None = self.keys.get(jwt.get_unverified_header(token).get("kid"), None)
+
+		if key is None:
+			raise JWTError("The JWT was signed with an unknown key.")
+
+		return jwt.decode(
+			token,
+			key,
+			algorithms=[self.algorithm],
+			options={"verify_exp": verify_expiry}
+		)
+
+@lru_cache()
+def get_keyring() -> Keyring:
+	'''
+		The keyring from AUTH_SIGNING_KEYS and AUTH_ACTIVE_KEY_ID, or else AUTH_SECRET_KEY as its only key.
+		Every worker has to sign with the same keys to verify each other's tokens, so one of them has to be set
+
+		returns Keyring else raises RuntimeError
+	'''
+
+	settings = get_settings()
+
+	if not settings.AUTH_SIGNING_KEYS:
+		if not settings.AUTH_SECRET_KEY:
+			raise RuntimeError(
+				'Neither AUTH_SIGNING_KEYS nor AUTH_SECRET_KEY is set - a key made up by each worker would log every user '
+				'out on every restart, and reject the tokens of the other workers'
+			)
+
+		return Keyring(
+			keys={"local": settings.AUTH_SECRET_KEY},
+			active_key_id="local"
+		)
+
+	return Keyring(
+		keys=settings.AUTH_SIGNING_KEYS,
+		active_key_id=settings.AUTH_ACTIVE_KEY_ID or next(iter(settings.AUTH_SIGNING_KEYS))
+	)
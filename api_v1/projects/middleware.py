@@ -5,13 +5,30 @@ from starlette.authentication import (
 	AuthenticationError
 )
 from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import HTTPConnection
+from starlette.types import (
+	ASGIApp,
+	Receive,
+	Scope,
+	Send
+)
 from tortoise.query_utils import Prefetch
 from fastapi import Request
+import typing
+from datetime import datetime
 
 from api_v1.projects.functions import (
-	get_current_user
+	get_current_token_user,
+	get_stateless_token_user
 )
+from api_v1.projects.revocation import RevocationList
 from api_v1.projects.models import Token, User
+from api_v1.projects.token_cache import (
+	get_cached_user,
+	cache_user
+)
+from api_v1.cache.local import LocalCache
+from api_v1.timing import timed
 
 class UnauthenticatedUser(UnauthenticatedUserBase):
 
@@ -20,7 +37,29 @@ class UnauthenticatedUser(UnauthenticatedUserBase):
 	) -> bool:
 		return False
 
+class UnresolvedUser(UnauthenticatedUser):
+
+	'''
+		Stands in for the user of a request until resolve_user is awaited, and is anonymous until then
+	'''
+
 class JWTCookieAuthBackend(AuthenticationBackend):
+
+	__slots__ = (
+		'token_cache',
+		'revocations',
+	)
+
+	def __init__(
+		self: 'JWTCookieAuthBackend',
+		token_cache: LocalCache | None = None,
+		revocations: RevocationList | None = None
+	):
+
+		# verified tokens, so that an authenticated request costs no queries at all
+		self.token_cache: LocalCache | None = token_cache
+		# if set, tokens are verified statelessly - by their signature, and against this list instead of the database
+		self.revocations: RevocationList | None = revocations
 	
 	async def authenticate(
 		self: 'JWTCookieAuthBackend',
@@ -38,15 +77,105 @@ class JWTCookieAuthBackend(AuthenticationBackend):
 		if token_in_cookies:
 			auth: str = request.cookies['token']
 			
-			try:
-				user: User = await get_current_user(auth) ## try get the user using the token
-			except Exception as e:
-				if 'logout' in request.url.path:
-					pass
+			if self.token_cache is not None:
+				user = get_cached_user(self.token_cache, auth) ## no queries if the token was verified before
+
+			if user is None:
+				generation: int | None = self.token_cache.generation if self.token_cache is not None else None
+
+				try:
+					verified: tuple[User, datetime] | None = get_stateless_token_user(
+						auth, self.revocations
+					) if self.revocations is not None else None
+
+					if verified is None:
+						verified = await get_current_token_user(auth) ## try get the user using the token
+
+					user, expires = verified
+				except Exception as e:
+					if 'logout' in request.url.path:
+						pass
+					else:
+						raise AuthenticationError from e
 				else:
-					raise AuthenticationError from e
+					if self.token_cache is not None:
+						cache_user(self.token_cache, auth, user, expires, generation)
 		
 		if user is None: ## JWT's invalid
 			return unauthenticated ## the user isn't authenticated. return a blank AuthCredentials and empty object
 
-		return AuthCredentials(['authenticated']), user # return the users permissions and the user object
\ No newline at end of file
+		return AuthCredentials(['authenticated']), user # return the users permissions and the user object
+
+class LazyAuthenticationMiddleware:
+
+	'''
+		Authenticates a request only when something needs its user - requires_login, or a call to resolve_user.
+		A request that never looks at the user, such as an anonymous listing or a static file, costs nothing.
+		Requests for exempt_paths, or anything under them, are never authenticated
+	'''
+
+	__slots__ = (
+		'app',
+		'backend',
+		'exempt_paths',
+		'exempt_prefixes',
+	)
+
+	def __init__(
+		self: 'LazyAuthenticationMiddleware',
+		app: ASGIApp,
+		backend: AuthenticationBackend,
+		exempt_paths: typing.Iterable[str] = ()
+	):
+
+		self.app: ASGIApp = app
+		self.backend: AuthenticationBackend = backend
+		self.exempt_paths: frozenset[str] = frozenset(path.rstrip('/') for path in exempt_paths)
+		## ending in a slash, so /public doesn't exempt /publications
+		self.exempt_prefixes: tuple[str, ...] = tuple(f'{path}/' for path in self.exempt_paths)
+
+	async def __call__(
+		self: 'LazyAuthenticationMiddleware',
+		scope: Scope,
+		receive: Receive,
+		send: Send
+	) -> None:
+
+		if scope["type"] in ("http", "websocket"):
+			scope["auth"] = AuthCredentials()
+
+			if self.exempt_paths and (scope["path"] in self.exempt_paths or scope["path"].startswith(self.exempt_prefixes)):
+				scope["user"] = UnauthenticatedUser()
+				scope["auth_backend"] = None
+			else:
+				scope["user"] = UnresolvedUser()
+				scope["auth_backend"] = self.backend
+
+		await self.app(scope, receive, send)
+
+async def resolve_user(
+	request: HTTPConnection
+) -> User | UnauthenticatedUser:
+	'''
+		Authenticates the request, once, and returns its user - which is request.user from then on
+
+		params:
+			request : Request : the request
+
+		returns User, or UnauthenticatedUser if the request isn't authenticated. Raises AuthenticationError for an invalid token
+	'''
+
+	backend: AuthenticationBackend | None = request.scope.get("auth_backend", None)
+
+	if backend is not None:
+		request.scope["auth_backend"] = None ## resolved at most once, even if it fails
+
+		with timed('auth'):
+			result: tuple[AuthCredentials, User | UnauthenticatedUser] | None = await backend.authenticate(request)
+
+		if result is not None:
+			request.scope["auth"], request.scope["user"] = result
+		else:
+			request.scope["user"] = UnauthenticatedUser()
+
+	return request.user
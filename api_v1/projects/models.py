@@ -8,11 +8,13 @@ from tortoise.expressions import F
 from fastapi import status, HTTPException, UploadFile
 
 import asyncio
+import typing
 import orjson
 import aiofiles
 import os
 import uuid
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
@@ -25,7 +27,36 @@ from api_v1.projects.enums import (
 
 from api_v1.settings import get_settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+environment_vars = get_settings()
+
+pwd_context = CryptContext(
+	schemes=["bcrypt"],
+	deprecated="auto",
+	bcrypt__rounds=environment_vars.AUTH_BCRYPT_ROUNDS
+)
+
+# bcrypt takes a few hundred milliseconds, and releases the GIL while it runs - so it runs on these threads,
+# never on the event loop. The number of threads bounds how many hashes run at once
+password_executor = ThreadPoolExecutor(
+	max_workers=environment_vars.AUTH_PASSWORD_HASHING_WORKERS,
+	thread_name_prefix='password-hashing'
+)
+
+async def run_password_hashing(
+	func: typing.Callable[..., typing.Any],
+	*args: typing.Any
+) -> typing.Any:
+	'''
+		Runs a passlib call on the password hashing threads
+
+		params:
+			func : callable : for example pwd_context.verify
+			args : the arguments of func
+
+		returns what func returns
+	'''
+
+	return await asyncio.get_running_loop().run_in_executor(password_executor, func, *args)
 
 class AbstractDateCreatedAndUpdated(models.Model):
 
@@ -73,14 +104,14 @@ class User(models.Model):
 		return pwd_context
 
 	@classmethod
-	def _create_password(cls: 'User', password: str	) -> str:
-		return pwd_context.hash(password)
+	async def _create_password(cls: 'User', password: str	) -> str:
+		return await run_password_hashing(pwd_context.hash, password)
 
 	create_password = _create_password
 
 	@classmethod
-	def _verify_password(cls: 'User', plain_password: str, hashed_password: str) -> bool:
-		return pwd_context.verify(plain_password, hashed_password)
+	async def _verify_password(cls: 'User', plain_password: str, hashed_password: str) -> bool:
+		return await run_password_hashing(pwd_context.verify, plain_password, hashed_password)
 
 	verify_password = _verify_password
 
@@ -96,9 +127,35 @@ class User(models.Model):
 
 	get_by_id = _get_by_id
 
+	@classmethod
+	def _from_identity(cls: 'User', id: int, username: str) -> "User":
+		'''
+			A user known by its id and username alone, such as from a verified token, without querying for it.
+			Marked as saved, so it can be related to other rows. It can't be saved itself - it has no password,
+			and saving it would blank the one in its row
+		'''
+
+		user: User = cls(id=id, username=username)
+		user._saved_in_db = True
+		user._identity_only = True
+
+		return user
+
+	from_identity = _from_identity
+
+	async def save(self: 'User', *args, **kwargs) -> None:
+
+		if getattr(self, '_identity_only', False):
+			raise RuntimeError(
+				f"User {self.pk} was built from a token, and only has an id and username - "
+				"fetch it with User.get_by_id to save it"
+			)
+
+		await super().save(*args, **kwargs)
+
 	@classmethod
 	async def _create_user(cls: 'User', **kwargs) -> "User":
-		kwargs['password']: str = cls.create_password(kwargs['password'])
+		kwargs['password']: str = await cls.create_password(kwargs['password'])
 		return await cls.create(**kwargs)
 
 	create_user = _create_user
@@ -125,14 +182,14 @@ class User(models.Model):
 		)
 
 		if user is None:
-			User._get_password_context().dummy_verify()  # Prevent Timing Attacks
+			await run_password_hashing(User._get_password_context().dummy_verify)  # Prevent Timing Attacks
 			raise HTTPException(
 				status_code=status.HTTP_401_UNAUTHORIZED,
 				detail=f"User with username '{username}' does not exist.",
 				headers={"WWW-Authenticate": "Bearer"}
 			)
 
-		if not User.verify_password(
+		if not await User.verify_password(
 			plain_password=password,
 			hashed_password=user.password
 		):
@@ -165,26 +222,36 @@ class Token(models.Model):
 	'''
 
 	token: str= fields.CharField(
-		max_length=225
+		max_length=512,
+		index=True
 	)
-	user_id: str = fields.CharField(
-		max_length=225
+	## no reverse relation, so a user's tokens never end up in the pydantic models of a user
+	user: fields.ForeignKeyRelation[User] = fields.ForeignKeyField(
+		'models.User',
+		related_name=False,
+		on_delete=fields.CASCADE
+	)
+	expires: datetime = fields.DatetimeField(
+		index=True
 	)
-	algorithm: str = fields.TextField()
-	secret: str = fields.TextField()
-	expires: datetime = fields.DatetimeField()
 	force_expiration: bool = fields.BooleanField(
 		default=False
 	)
 	is_refresh: bool = fields.BooleanField(
 		default=False
 	)
+	## the refresh token a token was issued with, and every token rotated from it, share a family
+	family: str = fields.CharField(
+		max_length=32,
+		null=True,
+		index=True
+	)
 
 	def __str__(self: 'Token') -> str:
 		return "{} ({})".format(self.id, self.token)
 
 	def is_expired(self: 'Token') -> bool:
-		return self.expires < now()
+		return self.force_expiration or self.expires < now()
 
 class Project(AbstractDateCreatedAndUpdated):
 
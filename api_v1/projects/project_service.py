@@ -53,12 +53,12 @@ from api_v1.projects.models import (
 	Document
 )
 from api_v1.projects.settings import (
-	AUTH_SECRET_KEY,
 	AUTH_ALGORITHM
 )
 from api_v1.decorators import (
 	requires_login,
 	cache_route,
+	conditional_route,
 	delete_cached_route
 )
 from api_v1.settings import get_settings
@@ -84,6 +84,147 @@ from typing import (
 	Optional
 )
 
+# every project listing shows the client, badges, and counts of bugs and comments of each project
+PROJECT_LISTING_TAGS: tuple[str, ...] = (
+	'project:*',
+	'bug:*',
+	'comment:*',
+	'client:*',
+	'badge:*'
+)
+
+def project_tags(
+	project_id: int | None = None,
+	client_id: int | None = None,
+	**kwargs
+) -> list[str]:
+
+	if project_id:
+		return [f'project:{project_id}', 'client:*']
+
+	if client_id:
+		return [f'client:{client_id}', *PROJECT_LISTING_TAGS]
+
+	return list(PROJECT_LISTING_TAGS)
+
+async def project_fingerprint(
+	project_id: int | None = None,
+	client_id: int | None = None,
+	**kwargs
+) -> str:
+	'''
+		A cheap fingerprint of the projects a listing is built from: how many there are, and when one last changed
+	'''
+
+	if project_id:
+		queryset = Project.filter(id = project_id)
+	elif client_id:
+		queryset = Project.filter(client_id = client_id)
+	else:
+		queryset = Project.all()
+
+	count, last_updated = await asyncio.gather(
+		queryset.count(),
+		queryset.order_by('-date_updated').first().values_list('date_updated', flat = True)
+	)
+
+	return f'{count}:{last_updated}'
+
+def deleted_project_tags(
+	in_ids: InIDS,
+	**kwargs
+) -> list[str]:
+	return ['project:*', *[f'project:{pk}' for pk in in_ids.ids]]
+
+def project_data_tags(
+	project_data: RouteProject,
+	**kwargs
+) -> list[str]:
+
+	if project_data.id:
+		return ['project:*', f'project:{project_data.id}']
+
+	return ['project:*']
+
+async def badge_data_tags(
+	badge_data: RouteBadge,
+	**kwargs
+) -> list[str]:
+
+	if badge_data.object_type is ObjectEnum.PROJECT:
+		return ['badge:*', f'project:{badge_data.object_id}']
+
+	return ['badge:*', f'bug:{badge_data.object_id}', *await bug_project_tags([badge_data.object_id])]
+
+def client_data_tags(
+	client_data: RouteClient,
+	**kwargs
+) -> list[str]:
+
+	if client_data.id:
+		return ['client:*', f'client:{client_data.id}']
+
+	return ['client:*']
+
+def deleted_client_tags(
+	in_ids: InIDS,
+	**kwargs
+) -> list[str]:
+	## deleting a client cascades to its projects
+	return ['client:*', 'project:*', *[f'client:{pk}' for pk in in_ids.ids]]
+
+async def bug_project_tags(
+	bug_ids: list[int]
+) -> list[str]:
+	'''
+		Returns the tags of the projects the bugs belong to - a full project includes its bugs
+	'''
+
+	project_ids: list[int] = await Bug.filter(
+		id__in = bug_ids
+	).distinct().values_list('project_id', flat = True)
+
+	return [f'project:{pk}' for pk in project_ids]
+
+async def closed_bug_tags(
+	in_ids: InIDS,
+	**kwargs
+) -> list[str]:
+	return ['bug:*', *[f'bug:{pk}' for pk in in_ids.ids], *await bug_project_tags(in_ids.ids)]
+
+async def bug_data_tags(
+	bug_data: RouteBug,
+	**kwargs
+) -> list[str]:
+
+	if bug_data.id:
+		## the project the bug is in, as well as the one the request names - they needn't be the same
+		return ['bug:*', f'bug:{bug_data.id}', f'project:{bug_data.project_id}', *await bug_project_tags([bug_data.id])]
+
+	return ['bug:*', f'project:{bug_data.project_id}']
+
+def comment_data_tags(
+	**kwargs
+) -> list[str]:
+
+	data: RouteComment = kwargs.get('comment_data', None) or kwargs.get('thread_data', None)
+
+	if data.project_id:
+		return ['comment:*', f'project:{data.project_id}']
+
+	return ['comment:*']
+
+async def document_tags(
+	category: DocumentCategoryEnum = DocumentCategoryEnum.PROJECT,
+	category_id: int = 0,
+	**kwargs
+) -> list[str]:
+
+	if category is DocumentCategoryEnum.PROJECT:
+		return [f'project:{category_id}']
+
+	return [f'bug:{category_id}', *await bug_project_tags([category_id])]
+
 class ProjectService(Service):
 
 	def install(self):
@@ -96,8 +237,17 @@ class ProjectService(Service):
 		# project related endpoints
 		##################################### 
 		@self.router.get('/')
+		@conditional_route(
+			app = self.app,
+			tags = project_tags,
+			fingerprint = project_fingerprint,
+			vary = ('project_id', 'client_id')
+		)
 		@cache_route(
-			app = self.app
+			app = self.app,
+			soft_ttl_seconds = self.settings.CACHE_SOFT_TTL_SECONDS,
+			tags = project_tags,
+			vary = ('project_id', 'client_id')
 		)
 		async def get_projects(
 			request: Request,
@@ -128,7 +278,8 @@ class ProjectService(Service):
 
 		@self.router.delete('/')
 		@delete_cached_route(
-			app = self.app
+			app = self.app,
+			tags = deleted_project_tags
 		)
 		async def delete_projects(
 			request: Request,
@@ -142,7 +293,7 @@ class ProjectService(Service):
 		@requires_login(status_code = 403)
 		@delete_cached_route(
 			app = self.app,
-			object_path = 'project_data.id.?project_id='
+			tags = project_data_tags
 		)
 		async def create_or_update_project(
 			request: Request,
@@ -321,6 +472,17 @@ class ProjectService(Service):
 		# badge related endpoints
 		##################################### 
 		@self.router.get('/badges/')
+		@conditional_route(
+			app = self.app,
+			tags = ('badge:*', ),
+			vary = ()
+		)
+		@cache_route(
+			app = self.app,
+			soft_ttl_seconds = self.settings.CACHE_SOFT_TTL_SECONDS,
+			tags = ('badge:*', ),
+			vary = ()
+		)
 		async def get_badges(
 			request: Request
 		) -> Badge_Pydantic:
@@ -333,7 +495,8 @@ class ProjectService(Service):
 		@self.router.post('/badges/')
 		@requires_login(status_code = 403)
 		@delete_cached_route(
-			app = self.app
+			app = self.app,
+			tags = badge_data_tags
 		)
 		async def create_or_update_badge(
 			request: Request,
@@ -367,6 +530,17 @@ class ProjectService(Service):
 		# bug related endpoints
 		##################################### 
 		@self.router.get('/client/')
+		@conditional_route(
+			app = self.app,
+			tags = ('client:*', ),
+			vary = ('client_id', )
+		)
+		@cache_route(
+			app = self.app,
+			soft_ttl_seconds = self.settings.CACHE_SOFT_TTL_SECONDS,
+			tags = ('client:*', ),
+			vary = ('client_id', )
+		)
 		async def get_clients(
 			request: Request,
 			client_id: Optional[int] = None
@@ -383,7 +557,8 @@ class ProjectService(Service):
 
 		@self.router.delete('/clients/')
 		@delete_cached_route(
-			app = self.app
+			app = self.app,
+			tags = deleted_client_tags
 		)
 		async def delete_organisations(
 			request: Request,
@@ -395,6 +570,10 @@ class ProjectService(Service):
 
 		@self.router.post('/client/')
 		@requires_login(status_code = 403)
+		@delete_cached_route(
+			app = self.app,
+			tags = client_data_tags
+		)
 		async def create_or_update_client(
 			request: Request,
 			client_data: RouteClient
@@ -497,7 +676,8 @@ class ProjectService(Service):
 		##################################### 
 		@self.router.delete('/bug/')
 		@delete_cached_route(
-			app = self.app
+			app = self.app,
+			tags = closed_bug_tags
 		)
 		async def bulk_close_bugs(
 			request: Request,
@@ -530,8 +710,7 @@ class ProjectService(Service):
 		@requires_login(status_code = 403)
 		@delete_cached_route(
 			app = self.app,
-			object_path = 'bug_data.project_id.?project_id=',
-			related_request_url='/api/v1/projects/'
+			tags = bug_data_tags
 		)
 		async def create_or_update_bug(
 			request: Request,
@@ -798,6 +977,10 @@ class ProjectService(Service):
 		#####################################  
 		@self.router.post('/comments/')
 		@requires_login(status_code = 403)
+		@delete_cached_route(
+			app = self.app,
+			tags = comment_data_tags
+		)
 		async def create_comment(
 			request: Request,
 			comment_data: RouteComment
@@ -854,6 +1037,10 @@ class ProjectService(Service):
 
 		@self.router.post('/threads/')
 		@requires_login(status_code = 403)
+		@delete_cached_route(
+			app = self.app,
+			tags = comment_data_tags
+		)
 		async def create_thread(
 			request: Request,
 			thread_data: RouteComment
@@ -883,6 +1070,10 @@ class ProjectService(Service):
 		#####################################
 		@self.router.post('/documents/upload/')
 		@requires_login(status_code = 403)
+		@delete_cached_route(
+			app = self.app,
+			tags = document_tags
+		)
 		async def upload_documents(
 			request: Request,
 			document_to_upload: UploadFile = File(...),
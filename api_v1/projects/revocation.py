@@ -0,0 +1,128 @@
+import time
+import typing
+
+import orjson
+
+from api_v1.cache.backends import CacheBackend
+from api_v1.cache.broker import Broker
+
+# the channel revocations are broadcast on, and the set they are kept in by the cache backend
+REVOCATION_CHANNEL: str = 'auth:revoke'
+REVOCATION_KEY: str = 'auth:revoked'
+
+class RevocationList:
+
+	'''
+		The ids (jti) of revoked tokens that haven't expired yet, in the memory of this worker.
+		A revoked token only needs to stay on the list until it expires - after that it fails verification anyway,
+		so the list stays as small as the number of tokens revoked in the last token lifetime
+	'''
+
+	__slots__ = (
+		'_revoked',
+		'_next_purge',
+	)
+
+	def __init__(
+		self: 'RevocationList'
+	):
+
+		self._revoked: dict[str, float] = {} ## jti -> when the token expires, as a unix timestamp
+		self._next_purge: float = 0.0
+
+	def revoke(
+		self: 'RevocationList',
+		jti: str,
+		expires_at: float
+	) -> None:
+
+		if expires_at > time.time():
+			self._revoked[jti] = expires_at
+
+	def update(
+		self: 'RevocationList',
+		revoked: dict[str, float]
+	) -> None:
+
+		for jti, expires_at in revoked.items():
+			self.revoke(jti, expires_at)
+
+	def is_revoked(
+		self: 'RevocationList',
+		jti: str
+	) -> bool:
+
+		now: float = time.time()
+
+		if now >= self._next_purge:
+			self.purge(now)
+
+		return jti in self._revoked
+
+	def purge(
+		self: 'RevocationList',
+		now: float | None = None
+	) -> None:
+		'''
+			Drops the tokens that have expired since they were revoked
+		'''
+
+		now = now or time.time()
+
+		self._revoked = {jti: expires_at for jti, expires_at in self._revoked.items() if expires_at > now}
+		self._next_purge = now + 60
+
+	def __len__(
+		self: 'RevocationList'
+	) -> int:
+		return len(self._revoked)
+
+async def revoke_token(
+	revocations: RevocationList,
+	jti: str,
+	expires_at: float,
+	cache: CacheBackend | None = None,
+	broker: Broker | None = None
+) -> None:
+	'''
+		Revokes a token in this worker, records the revocation in the cache backend for workers that start later,
+		and broadcasts it to the workers already running
+
+		params:
+			revocations : RevocationList : the revocation list of this worker
+			jti : str : the id of the token
+			expires_at : float : when the token expires, as a unix timestamp
+			cache : CacheBackend (optional) : where revocations are kept
+			broker : Broker (optional) : what revocations are broadcast on
+	'''
+
+	revocations.revoke(jti, expires_at)
+
+	if cache is not None:
+		await cache.add_expiring(REVOCATION_KEY, jti, expires_at)
+
+	if broker is not None:
+		await broker.publish(REVOCATION_CHANNEL, orjson.dumps([jti, expires_at]))
+
+async def load_revocations(
+	revocations: RevocationList,
+	cache: CacheBackend
+) -> None:
+	'''
+		Loads the revocations made by every worker so far, for example on startup, or after missing broadcasts
+	'''
+
+	revocations.update(await cache.expiring_members(REVOCATION_KEY))
+
+def on_revocation_message(
+	revocations: RevocationList
+) -> typing.Callable[[bytes], None]:
+
+	def on_message(
+		message: bytes
+	) -> None:
+
+		jti, expires_at = orjson.loads(message)
+		revocations.revoke(jti, expires_at)
+
+	return on_message
@@ -1,10 +1,10 @@
-from secrets import token_hex
 from datetime import datetime
 
-AUTH_SECRET_KEY: str = token_hex(2048)
 AUTH_ALGORITHM: str = "HS256"
 AUTH_ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
-AUTH_REFRESH_TOKEN_EXPIRE_DAYS: int = AUTH_ACCESS_TOKEN_EXPIRE_MINUTES
+AUTH_REFRESH_TOKEN_EXPIRE_DAYS: int = 14
+## how long a refresh token just rotated can be used again, by a request sent alongside the one that rotated it
+AUTH_REFRESH_REUSE_GRACE_SECONDS: int = 10
 
 AUTH_EMAIL_VERIFICATION_EMAIL_BODY: str= """
 Hi {username},
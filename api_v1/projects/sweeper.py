@@ -0,0 +1,135 @@
+import asyncio
+import time
+import typing
+
+from datetime import timedelta
+
+from tortoise.expressions import Q
+from tortoise.timezone import now
+
+from api_v1.cache.backends import CacheBackend
+from api_v1.cache.coalesce import CacheLock
+from api_v1.logging import auth_logger
+from api_v1.projects.models import Token
+import api_v1.projects.settings as auth_settings
+
+SWEEPER_LOCK_KEY: str = 'auth:token-sweeper:lock'
+
+class TokenSweeper:
+
+	'''
+		Deletes expired and force-expired tokens in batches, so the Token table only holds the tokens still in use.
+		Lives on app.state.token_sweeper
+	'''
+
+	__slots__ = (
+		'interval_seconds',
+		'batch_size',
+		'max_batches',
+		'runs',
+		'total_purged',
+		'last_purged',
+		'last_run_at',
+		'last_run_seconds',
+	)
+
+	def __init__(
+		self: 'TokenSweeper',
+		interval_seconds: float,
+		batch_size: int,
+		max_batches: int
+	):
+
+		self.interval_seconds: float = interval_seconds
+		self.batch_size: int = batch_size
+		self.max_batches: int = max_batches ## bounds a single run, whatever is left is swept by the next one
+		self.runs: int = 0
+		self.total_purged: int = 0
+		self.last_purged: int | None = None
+		self.last_run_at: float | None = None
+		self.last_run_seconds: float | None = None
+
+	async def sweep(
+		self: 'TokenSweeper'
+	) -> int:
+		'''
+			Runs once, deleting at most max_batches batches of batch_size tokens
+
+			returns the number of tokens deleted
+		'''
+
+		started: float = time.perf_counter()
+		purged: int = 0
+		batches: int = 0
+
+		## one condition at a time, as an OR of the two can't use either index - expires,
+		## and the partial index of the force-expired tokens (migrations/0005).
+		## A rotated refresh token is force-expired too, but kept until its reuse grace period is over
+		for condition in (
+			Q(expires__lt = now()),
+			Q(force_expiration = True, expires__gt = now() + timedelta(seconds = auth_settings.AUTH_REFRESH_REUSE_GRACE_SECONDS))
+		):
+			while batches < self.max_batches:
+				batches += 1
+
+				ids: list[int] = await Token.filter(
+					condition
+				).limit(self.batch_size).values_list('id', flat = True)
+
+				if not ids:
+					break
+
+				purged += await Token.filter(id__in = ids).delete()
+
+				if len(ids) < self.batch_size:
+					break
+
+		self.runs += 1
+		self.total_purged += purged
+		self.last_purged = purged
+		self.last_run_at = time.time()
+		self.last_run_seconds = time.perf_counter() - started
+
+		auth_logger.info(f'Purged {purged} expired tokens in {self.last_run_seconds:.3f}s')
+
+		return purged
+
+	async def run(
+		self: 'TokenSweeper',
+		cache: CacheBackend | None = None
+	) -> None:
+		'''
+			Sweeps every interval_seconds, until cancelled. With a cache backend, only one worker sweeps per interval
+		'''
+
+		while True:
+			try:
+				## the lock is left to expire, so no other worker sweeps again until the next interval
+				lock: CacheLock | None = CacheLock(
+					backend = cache,
+					key = SWEEPER_LOCK_KEY,
+					timeout = self.interval_seconds * 0.9
+				) if cache is not None else None
+
+				if lock is None or await lock.acquire():
+					await self.sweep()
+
+			except asyncio.CancelledError:
+				raise
+			except Exception:
+				auth_logger.exception('Failed to sweep expired tokens')
+
+			await asyncio.sleep(self.interval_seconds)
+
+	def to_dict(
+		self: 'TokenSweeper'
+	) -> dict[str, typing.Any]:
+
+		return {
+			'interval_seconds': self.interval_seconds,
+			'runs': self.runs,
+			'total_purged': self.total_purged,
+			'last_purged': self.last_purged,
+			'last_run_at': self.last_run_at,
+			'last_run_seconds': self.last_run_seconds
+		}
@@ -0,0 +1,200 @@
+import math
+import time
+import typing
+from abc import (
+	ABC,
+	abstractmethod
+)
+from collections import OrderedDict
+
+import aioredis
+
+from api_v1.settings import Settings
+from api_v1.cache.backends import CacheBackend
+
+# refills the bucket for the time since it was last used, then takes from it - atomically, on Redis' clock.
+# Returns how many seconds to wait before retrying, 0 if the tokens were taken
+TAKE_TOKENS_SCRIPT: str = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= cost then
+	tokens = tokens - cost
+else
+	wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return tostring(wait)
+""".strip()
+
+class RateLimiter(ABC):
+
+	'''
+		A token bucket per key: each key may make capacity requests at once, after which it gets
+		refill_per_second more every second
+	'''
+
+	__slots__ = (
+		'capacity',
+		'refill_per_second',
+	)
+
+	def __init__(
+		self: 'RateLimiter',
+		capacity: int,
+		refill_per_second: float
+	):
+
+		self.capacity: int = capacity
+		self.refill_per_second: float = refill_per_second
+
+	@abstractmethod
+	async def take(
+		self: 'RateLimiter',
+		key: str,
+		cost: int = 1
+	) -> float:
+		'''
+			Takes tokens from the bucket of a key
+
+			returns 0 if they were taken, else how many seconds until there are enough
+		'''
+		...
+
+class MemoryRateLimiter(RateLimiter):
+
+	'''
+		Token buckets in the memory of this worker. The least recently used buckets are dropped past max_keys -
+		a dropped bucket is full again, so this errs on the side of letting requests through
+	'''
+
+	__slots__ = (
+		'max_keys',
+		'_buckets',
+	)
+
+	def __init__(
+		self: 'MemoryRateLimiter',
+		capacity: int,
+		refill_per_second: float,
+		max_keys: int = 100000
+	):
+
+		super().__init__(capacity, refill_per_second)
+
+		self.max_keys: int = max_keys
+		self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict() ## key -> (tokens, when they were counted)
+
+	async def take(
+		self: 'MemoryRateLimiter',
+		key: str,
+		cost: int = 1
+	) -> float:
+
+		now: float = time.monotonic()
+		tokens, updated = self._buckets.pop(key, (self.capacity, now))
+		tokens = min(self.capacity, tokens + (now - updated) * self.refill_per_second)
+		wait: float = 0.0
+
+		if tokens >= cost:
+			tokens -= cost
+		else:
+			wait = (cost - tokens) / self.refill_per_second
+
+		self._buckets[key] = (tokens, now)
+
+		if len(self._buckets) > self.max_keys:
+			self._buckets.popitem(last = False)
+
+		return wait
+
+class RedisRateLimiter(RateLimiter):
+
+	'''
+		Token buckets in Redis, shared by every worker
+	'''
+
+	__slots__ = (
+		'redis',
+		'prefix',
+	)
+
+	def __init__(
+		self: 'RedisRateLimiter',
+		redis: aioredis.Redis,
+		prefix: str,
+		capacity: int,
+		refill_per_second: float
+	):
+
+		super().__init__(capacity, refill_per_second)
+
+		self.redis: aioredis.Redis = redis
+		self.prefix: str = prefix
+
+	async def take(
+		self: 'RedisRateLimiter',
+		key: str,
+		cost: int = 1
+	) -> float:
+
+		return float(await self.redis.eval(
+			TAKE_TOKENS_SCRIPT,
+			1,
+			f'{self.prefix}:{key}',
+			self.capacity,
+			self.refill_per_second,
+			cost
+		))
+
+def retry_after(
+	wait: float
+) -> str:
+	## Retry-After is in whole seconds
+	return str(max(1, math.ceil(wait)))
+
+def create_rate_limiters(
+	settings: Settings,
+	cache: CacheBackend | None = None
+) -> dict[str, RateLimiter]:
+	'''
+		Creates the rate limiters for logging in and registering: by client IP, and by username - and for refreshing
+		tokens, by client IP, so refreshes never use up the logins of clients behind the same address.
+		In this worker's memory, or in Redis if AUTH_RATE_LIMIT_BACKEND is 'redis'
+
+		params:
+			settings : Settings : the application settings
+			cache : CacheBackend (optional) : the cache backend, whose Redis connection is reused if it has one
+
+		returns dict, from the name of each limiter to the limiter - empty if rate limiting is turned off
+	'''
+
+	if not settings.AUTH_RATE_LIMIT_ENABLED:
+		return {}
+
+	limits: dict[str, tuple[int, float]] = {
+		'ip': (settings.AUTH_RATE_LIMIT_IP_BURST, settings.AUTH_RATE_LIMIT_IP_PER_MINUTE / 60),
+		'username': (settings.AUTH_RATE_LIMIT_USERNAME_BURST, settings.AUTH_RATE_LIMIT_USERNAME_PER_MINUTE / 60),
+		'refresh': (settings.AUTH_RATE_LIMIT_REFRESH_BURST, settings.AUTH_RATE_LIMIT_REFRESH_PER_MINUTE / 60)
+	}
+
+	if settings.AUTH_RATE_LIMIT_BACKEND == 'redis':
+		redis: aioredis.Redis = getattr(cache, 'redis', None) or aioredis.from_url(settings.REDIS_URL)
+
+		return {
+			name: RedisRateLimiter(redis, f'throttle:{name}', capacity, refill_per_second)
+			for name, (capacity, refill_per_second) in limits.items()
+		}
+
+	return {
+		name: MemoryRateLimiter(capacity, refill_per_second)
+		for name, (capacity, refill_per_second) in limits.items()
+	}
@@ -0,0 +1,102 @@
+import hashlib
+import time
+import typing
+from datetime import datetime
+
+from fastapi import FastAPI
+
+from api_v1.settings import Settings
+from api_v1.cache.local import LocalCache
+from api_v1.cache.broker import publish_invalidation
+from api_v1.projects.models import User
+
+def token_digest(
+	token: str
+) -> str:
+	## the cache is keyed by a digest, so the tokens themselves are never kept around
+	return hashlib.sha256(token.encode()).hexdigest()
+
+def token_tag(
+	token: str
+) -> str:
+	return f'token:{token_digest(token)}'
+
+def create_token_cache(
+	settings: Settings
+) -> LocalCache | None:
+	'''
+		Creates the cache of verified tokens, from a token to the identity of its user.
+		Every entry has a size of 1, so the cache is bounded by AUTH_TOKEN_CACHE_MAX_ENTRIES
+
+		returns LocalCache, or None if the token cache is turned off
+	'''
+
+	if not settings.AUTH_TOKEN_CACHE_ENABLED:
+		return None
+
+	return LocalCache(
+		max_bytes = settings.AUTH_TOKEN_CACHE_MAX_ENTRIES,
+		ttl_seconds = settings.AUTH_TOKEN_CACHE_TTL_SECONDS
+	)
+
+def get_cached_user(
+	token_cache: LocalCache,
+	token: str
+) -> User | None:
+
+	identity: tuple[int, str] | None = token_cache.get(token_digest(token))
+
+	if identity is None:
+		return None
+
+	pk, username = identity
+
+	return User.from_identity(
+		id = pk,
+		username = username
+	)
+
+def cache_user(
+	token_cache: LocalCache,
+	token: str,
+	user: User,
+	expires: datetime,
+	generation: int
+) -> None:
+	'''
+		Caches the user a verified token belongs to, for no longer than the token is valid.
+		generation is the token cache's generation from before the token was verified - if a token has
+		been invalidated since, the user isn't cached
+	'''
+
+	ttl_seconds: float = expires.timestamp() - time.time()
+
+	if ttl_seconds <= 0:
+		return
+
+	token_cache.set(
+		key = token_digest(token),
+		value = (user.pk, user.username),
+		size = 1,
+		ttl_seconds = ttl_seconds,
+		tags = (token_tag(token), ),
+		generation = generation
+	)
+
+async def invalidate_tokens(
+	app: FastAPI,
+	tokens: typing.Iterable[str]
+) -> None:
+	'''
+		Drops tokens from the token cache of this worker, and of every other worker
+	'''
+
+	tags: list[str] = [token_tag(token) for token in tokens]
+
+	if not tags or app.state.token_cache is None:
+		return
+
+	app.state.token_cache.invalidate_tags(tags)
+
+	if getattr(app.state, 'cache_broker', None) is not None:
+		await publish_invalidation(app.state.cache_broker, tags)
@@ -0,0 +1,123 @@
+import contextlib
+import re
+import typing
+from contextvars import ContextVar
+from functools import lru_cache
+
+# the literals of a statement, replaced so statements that only differ in their values have the same shape
+STRING_REGEX: re.Pattern = re.compile(r"'(?:[^']|'')*'")
+NUMBER_REGEX: re.Pattern = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER_REGEX: re.Pattern = re.compile(r'\$\d+|%s|\?')
+LIST_REGEX: re.Pattern = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+WHITESPACE_REGEX: re.Pattern = re.compile(r'\s+')
+
+@lru_cache(maxsize=2048)
+def statement_shape(
+	statement: str
+) -> str:
+	'''
+		The shape of a statement: with its strings, numbers and placeholders replaced by ?, and lists of them by (...).
+		The same query made for every row of a listing - an N+1 - has the same shape every time
+
+		params:
+			statement : str : the SQL statement
+
+		returns str
+	'''
+
+	shape: str = STRING_REGEX.sub('?', statement)
+	shape = PLACEHOLDER_REGEX.sub('?', shape)
+	shape = NUMBER_REGEX.sub('?', shape)
+	shape = LIST_REGEX.sub('(...)', shape)
+
+	return WHITESPACE_REGEX.sub(' ', shape).strip()
+
+class QueryLog:
+
+	'''
+		The queries made while it's being captured: how many, how long they took, and how many of each shape.
+		Queries are recorded in every capture they are made inside of, so a test can capture the queries of a request
+		the middleware is capturing as well
+	'''
+
+	__slots__ = (
+		'parent',
+		'count',
+		'seconds',
+		'shapes',
+	)
+
+	def __init__(
+		self: 'QueryLog',
+		parent: 'QueryLog | None' = None
+	):
+
+		self.parent: QueryLog | None = parent
+		self.count: int = 0
+		self.seconds: float = 0.0
+		self.shapes: dict[str, int] = {} ## shape -> how many times it was queried
+
+	def record(
+		self: 'QueryLog',
+		statement: str,
+		seconds: float
+	) -> None:
+
+		shape: str = statement_shape(statement)
+		log: QueryLog | None = self
+
+		while log is not None:
+			log.count += 1
+			log.seconds += seconds
+			log.shapes[shape] = log.shapes.get(shape, 0) + 1
+			log = log.parent
+
+	def suspects(
+		self: 'QueryLog',
+		threshold: int
+	) -> dict[str, int]:
+		'''
+			The shapes queried at least threshold times - most likely a query made once per row, rather than once
+
+			returns dict, from each shape to how many times it was queried
+		'''
+
+		return {shape: count for shape, count in self.shapes.items() if count >= threshold}
+
+	def to_dict(
+		self: 'QueryLog'
+	) -> dict[str, typing.Any]:
+
+		return {
+			'count': self.count,
+			'ms': round(self.seconds * 1000, 2),
+			'shapes': dict(sorted(self.shapes.items(), key=lambda item: item[1], reverse=True))
+		}
+
+# the queries of the request being handled, None outside of a capture
+current_queries: ContextVar[QueryLog | None] = ContextVar('current_queries', default=None)
+
+@contextlib.contextmanager
+def capture_queries() -> typing.Iterator[QueryLog]:
+	'''
+		Captures the queries made inside of it, for example to assert how many queries a route makes:
+
+			with capture_queries() as queries:
+				await client.get('/api/v1/projects/')
+
+			assert queries.count <= 5
+			assert not queries.suspects(threshold=5)
+	'''
+
+	## only once Tortoise has been initialised are all of its clients loaded
+	from api_v1.timing import instrument_database
+
+	instrument_database()
+
+	queries: QueryLog = QueryLog(parent=current_queries.get())
+	token = current_queries.set(queries)
+
+	try:
+		yield queries
+	finally:
+		current_queries.reset(token)
@@ -15,8 +15,63 @@ class Settings(BaseSettings):
     DATABASE_URL: str | None = None
     FRONTEND_ADDRESS: str | None = '127.0.0.1'
     ENV_ORIGINS: str | None = "127.0.0.1"
+    CORS_ALLOW_LOCALHOST: bool = True ## http://localhost and http://127.0.0.1, on any port
+    CORS_ORIGIN_REGEXES: list[str] = []
     REDIS_URL: str | None = 'redis://localhost'
     REDIS_ENABLED: bool = False
+    CACHE_BACKEND: typing.Literal['redis', 'memory', 'none'] | None = None
+    CACHE_MEMORY_MAX_BYTES: int = 64 * 1024 * 1024
+    CACHE_TTL_SECONDS: int = 300
+    CACHE_SOFT_TTL_SECONDS: int = 30
+    CACHE_SCHEDULER_LIMIT: int = 10
+    CACHE_TAG_TTL_SECONDS: int = 86400
+    CACHE_LOCAL_ENABLED: bool = False
+    CACHE_LOCAL_MAX_BYTES: int = 32 * 1024 * 1024
+    CACHE_LOCAL_TTL_SECONDS: int = 10
+    CACHE_BROKER: typing.Literal['redis', 'memory'] | None = None
+    CACHE_LOCK_TIMEOUT: float = 5.0
+    CACHE_LOCK_POLL_INTERVAL: float = 0.05
+    CACHE_COMPRESSION_THRESHOLD: int = 16 * 1024 ## 0 to never compress cached responses
+    CACHE_COMPRESSION_LEVEL: int = 6
+    CACHE_WARMUP_ENABLED: bool = True
+    CACHE_WARMUP_PATHS: list[str] = [
+        '/api/v1/projects/',
+        '/api/v1/auth/users/',
+        '/api/v1/projects/badges/',
+        '/api/v1/projects/client/'
+    ]
+    CACHE_WARMUP_CONCURRENCY: int = 4
+    CACHE_WARMUP_BUDGET_SECONDS: float = 10.0
+    AUTH_SIGNING_KEYS: dict[str, str] = {} ## key id -> key, as JSON
+    AUTH_ACTIVE_KEY_ID: str | None = None
+    AUTH_SECRET_KEY: str | None = None ## the only signing key, if AUTH_SIGNING_KEYS isn't set
+    AUTH_EXEMPT_PATHS: list[str] = ['/public']
+    AUTH_STATELESS: bool = False ## only with the redis cache backend, which shares revoked tokens between workers
+    AUTH_BCRYPT_ROUNDS: int = 12
+    AUTH_PASSWORD_HASHING_WORKERS: int = 4
+    AUTH_RATE_LIMIT_ENABLED: bool = True
+    AUTH_RATE_LIMIT_BACKEND: typing.Literal['memory', 'redis'] = 'memory'
+    AUTH_RATE_LIMIT_IP_BURST: int = 20
+    AUTH_RATE_LIMIT_IP_PER_MINUTE: float = 10
+    AUTH_RATE_LIMIT_USERNAME_BURST: int = 5
+    AUTH_RATE_LIMIT_USERNAME_PER_MINUTE: float = 2
+    AUTH_RATE_LIMIT_REFRESH_BURST: int = 60 ## refreshing costs no password hash, so it has a bucket of its own
+    AUTH_RATE_LIMIT_REFRESH_PER_MINUTE: float = 30
+    AUTH_TOKEN_CACHE_ENABLED: bool = True ## only with the redis cache backend, which tells every worker about revoked tokens
+    AUTH_TOKEN_CACHE_MAX_ENTRIES: int = 10000
+    AUTH_TOKEN_CACHE_TTL_SECONDS: int = 60
+    AUTH_TOKEN_SWEEPER_ENABLED: bool = True
+    AUTH_TOKEN_SWEEPER_INTERVAL_SECONDS: float = 300.0
+    AUTH_TOKEN_SWEEPER_BATCH_SIZE: int = 1000
+    AUTH_TOKEN_SWEEPER_MAX_BATCHES: int = 50
+    SERVER_TIMING_ENABLED: bool = False ## tells every client how long each stage of a request took, so only for development
+    SERVER_TIMING_LOG_ENABLED: bool = False
+    DB_N_PLUS_ONE_THRESHOLD: int = 5 ## a statement queried this many times in one request is logged, 0 to not look
+    METRICS_ENABLED: bool = True
+    METRICS_DIRECTORY: str | None = None ## shared by every worker on the host - the snapshots of stopped workers are folded into one file
+    METRICS_WRITE_INTERVAL_SECONDS: float = 5.0
+    INTERNAL_ENDPOINTS_ENABLED: bool = False
+    INTERNAL_ENDPOINTS_TOKEN: str | None = None ## sent as a bearer token, every internal endpoint needs it - /ready/ isn't one of them
     STORAGE_ENABLED: bool = True
     DOCUMENT_DIRECTORY: Path = Path('documents')
 
@@ -0,0 +1,407 @@
+import contextlib
+import functools
+import time
+import typing
+from contextvars import ContextVar
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.contrib.pydantic import PydanticModel
+from starlette.routing import (
+	BaseRoute,
+	Mount
+)
+from starlette.datastructures import MutableHeaders
+from starlette.types import (
+	ASGIApp,
+	Message,
+	Receive,
+	Scope,
+	Send
+)
+
+from api_v1.logging import (
+	timing_logger,
+	db_logger
+)
+from api_v1.queries import (
+	QueryLog,
+	current_queries
+)
+from api_v1.metrics import RequestMetrics
+
+# the methods every Tortoise client sends its queries through
+QUERY_METHODS: tuple[str, ...] = (
+	'execute_insert',
+	'execute_query',
+	'execute_many',
+	'execute_script',
+	'execute_query_dict',
+)
+
+class RequestTimings:
+
+	'''
+		The time a request spent in each stage - auth, db, cache, serialise and encode - and how many times it
+		entered each. A stage inside another is only counted once: a query made while serialising counts as db.
+		Queries made concurrently, such as Tortoise's prefetches, each count in full
+	'''
+
+	__slots__ = (
+		'started',
+		'durations',
+		'counts',
+	)
+
+	def __init__(
+		self: 'RequestTimings'
+	):
+
+		self.started: float = time.perf_counter()
+		self.durations: dict[str, float] = {}
+		self.counts: dict[str, int] = {}
+
+	def add(
+		self: 'RequestTimings',
+		stage: str,
+		seconds: float
+	) -> None:
+
+		self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+		self.counts[stage] = self.counts.get(stage, 0) + 1
+
+	def to_header(
+		self: 'RequestTimings'
+	) -> str:
+		'''
+			The timings as a Server-Timing header, in milliseconds
+		'''
+
+		metrics: list[str] = [
+			f'{stage};dur={seconds * 1000:.2f};desc="{self.counts[stage]}"'
+			for stage, seconds in self.durations.items()
+		]
+		metrics.append(f'total;dur={(time.perf_counter() - self.started) * 1000:.2f}')
+
+		return ', '.join(metrics)
+
+	def to_dict(
+		self: 'RequestTimings'
+	) -> dict[str, typing.Any]:
+
+		return {
+			'total_ms': round((time.perf_counter() - self.started) * 1000, 2),
+			**{
+				stage: {'ms': round(seconds * 1000, 2), 'count': self.counts[stage]}
+				for stage, seconds in self.durations.items()
+			}
+		}
+
+# the timings of the request being handled, None outside of a request or with timing turned off
+current_timings: ContextVar[RequestTimings | None] = ContextVar('current_timings', default=None)
+in_query: ContextVar[bool] = ContextVar('in_query', default=False)
+# the stages inside the current stage, as [seconds covered by them, how many are running, since when].
+# Concurrent stages, such as Tortoise's prefetches, overlap - only the time covered by any of them is taken off
+nested_stages: ContextVar[list[float] | None] = ContextVar('nested_stages', default=None)
+
+@contextlib.contextmanager
+def timed(
+	stage: str
+) -> typing.Iterator[None]:
+	'''
+		Times a stage of the current request, if it's being timed
+	'''
+
+	timings: RequestTimings | None = current_timings.get()
+
+	if timings is None:
+		yield
+		return
+
+	outer: list[float] | None = nested_stages.get()
+	inner: list[float] = [0.0, 0, 0.0]
+	token = nested_stages.set(inner)
+	started: float = time.perf_counter()
+
+	if outer is not None:
+		if not outer[1]:
+			outer[2] = started
+
+		outer[1] += 1
+
+	try:
+		yield
+	finally:
+		ended: float = time.perf_counter()
+		nested_stages.reset(token)
+		timings.add(stage, ended - started - inner[0])
+
+		if outer is not None:
+			outer[1] -= 1
+
+			if not outer[1]:
+				outer[0] += ended - outer[2]
+
+def timed_query(
+	method: typing.Callable
+) -> typing.Callable:
+
+	@functools.wraps(method)
+	async def wrapper(
+		self: BaseDBAsyncClient,
+		*args: typing.Any,
+		**kwargs: typing.Any
+	) -> typing.Any:
+
+		queries: QueryLog | None = current_queries.get()
+
+		## a client method calling another is still a single query
+		if (current_timings.get() is None and queries is None) or in_query.get():
+			return await method(self, *args, **kwargs)
+
+		token = in_query.set(True)
+		started: float = time.perf_counter()
+
+		try:
+			with timed('db'):
+				return await method(self, *args, **kwargs)
+		finally:
+			in_query.reset(token)
+
+			if queries is not None:
+				queries.record(args[0] if args else kwargs.get('query', ''), time.perf_counter() - started)
+
+	wrapper.__timed__ = True
+
+	return wrapper
+
+def instrument_database() -> None:
+	'''
+		Times, and captures, the queries of every Tortoise client loaded so far - so once Tortoise has been initialised
+	'''
+
+	clients: list[type] = [BaseDBAsyncClient]
+
+	while clients:
+		client: type = clients.pop()
+		clients.extend(client.__subclasses__())
+
+		for name in QUERY_METHODS:
+			method: typing.Callable | None = client.__dict__.get(name, None)
+
+			if method is not None and not getattr(method, '__timed__', False):
+				setattr(client, name, timed_query(method))
+
+def instrument_serialisation() -> None:
+	'''
+		Times turning models into pydantic models, through from_queryset and from_tortoise_orm
+	'''
+
+	for name in ('from_queryset', 'from_tortoise_orm'):
+		method: typing.Callable = PydanticModel.__dict__[name].__func__
+
+		if getattr(method, '__timed__', False):
+			continue
+
+		@functools.wraps(method)
+		async def wrapper(
+			cls: type[PydanticModel],
+			*args: typing.Any,
+			method: typing.Callable = method,
+			**kwargs: typing.Any
+		) -> typing.Any:
+
+			with timed('serialise'):
+				return await method(cls, *args, **kwargs)
+
+		wrapper.__timed__ = True
+
+		setattr(PydanticModel, name, classmethod(wrapper))
+
+class TimedORJSONResponse(ORJSONResponse):
+
+	'''
+		ORJSONResponse, with encoding the body timed
+	'''
+
+	def render(
+		self: 'TimedORJSONResponse',
+		content: typing.Any
+	) -> bytes:
+
+		with timed('encode'):
+			return super().render(content)
+
+def route_index(
+	routes: typing.Iterable[BaseRoute],
+	prefix: str = ''
+) -> dict[typing.Any, tuple[str, str]]:
+	'''
+		Indexes every route by its endpoint - what the router leaves in the scope of a request it matched
+
+		params:
+			routes : list[BaseRoute] : the routes of the application
+			prefix : str (optional) : the path the routes are mounted under
+
+		returns dict, from the endpoint of each route to its name and path template
+	'''
+
+	index: dict[typing.Any, tuple[str, str]] = {}
+
+	for route in routes:
+		if isinstance(route, Mount) and route.routes:
+			index.update(route_index(route.routes, prefix + route.path))
+		elif isinstance(route, Mount):
+			index[route.app] = (route.name or '', prefix + route.path)
+		elif hasattr(route, 'endpoint'):
+			index[route.endpoint] = (route.name or '', prefix + route.path)
+
+	return index
+
+# what a request the router didn't match is named, and counted as in the metrics
+UNMATCHED_ROUTE: tuple[str, str] = ('', 'unmatched')
+
+class TimingMiddleware:
+
+	'''
+		Adds X-Process-Time, the seconds until the response started, and X-Route-Name, the name of the route the
+		router matched, to every response. The routes are indexed once the application starts, so naming a route
+		is a single lookup.
+		With server_timing, a Server-Timing header breaks the time down by stage, and with log_timings the same
+		breakdown is logged once the response has been sent. With metrics, every request is counted by its route template.
+		With n_plus_one_threshold, the queries of every request are captured, and a statement queried that many times
+		is logged as a likely N+1
+	'''
+
+	__slots__ = (
+		'app',
+		'routes',
+		'server_timing',
+		'log_timings',
+		'metrics',
+		'n_plus_one_threshold',
+	)
+
+	def __init__(
+		self: 'TimingMiddleware',
+		app: ASGIApp,
+		server_timing: bool = False,
+		log_timings: bool = False,
+		metrics: RequestMetrics | None = None,
+		n_plus_one_threshold: int = 0
+	):
+
+		self.app: ASGIApp = app
+		self.routes: dict[typing.Any, tuple[str, str]] = {}
+		self.server_timing: bool = server_timing
+		self.log_timings: bool = log_timings
+		self.metrics: RequestMetrics | None = metrics
+		self.n_plus_one_threshold: int = n_plus_one_threshold
+
+	async def __call__(
+		self: 'TimingMiddleware',
+		scope: Scope,
+		receive: Receive,
+		send: Send
+	) -> None:
+
+		if scope["type"] == "lifespan":
+			await self.app(scope, self.index_on_startup(scope, receive), send)
+			return
+
+		if scope["type"] != "http":
+			await self.app(scope, receive, send)
+			return
+
+		started: float = time.perf_counter()
+		path: str = scope["path"] ## a mount replaces the path in the scope
+		status_code: int = 500 ## unless a response is started
+		elapsed: float | None = None
+		timings: RequestTimings | None = RequestTimings() if self.server_timing or self.log_timings else None
+
+		async def send_with_timing(
+			message: Message
+		) -> None:
+
+			nonlocal status_code, elapsed
+
+			if message["type"] == "http.response.start":
+				status_code = message["status"]
+				elapsed = time.perf_counter() - started
+
+				## the router has matched by now, and left the endpoint in the scope
+				headers: MutableHeaders = MutableHeaders(scope=message)
+				headers["X-Route-Name"] = self.routes.get(scope.get("endpoint"), UNMATCHED_ROUTE)[0]
+				headers["X-Process-Time"] = str(elapsed)
+
+				if self.server_timing:
+					headers["Server-Timing"] = timings.to_header()
+
+			await send(message)
+
+		queries: QueryLog | None = QueryLog(parent=current_queries.get()) if self.n_plus_one_threshold else None
+
+		token = current_timings.set(timings) if timings is not None else None
+		queries_token = current_queries.set(queries) if queries is not None else None
+
+		if self.metrics is not None:
+			self.metrics.in_flight += 1
+
+		try:
+			await self.app(scope, receive, send_with_timing)
+		finally:
+			if token is not None:
+				current_timings.reset(token)
+
+			if queries_token is not None:
+				current_queries.reset(queries_token)
+
+				suspects: dict[str, int] = queries.suspects(self.n_plus_one_threshold)
+
+				if suspects:
+					db_logger.warning(
+						'Likely N+1 queries in {} {}: {} queries in {:.2f}ms, {}'.format(
+							scope["method"],
+							path,
+							queries.count,
+							queries.seconds * 1000,
+							'; '.join(f'{count} x {shape}' for shape, count in suspects.items())
+						)
+					)
+
+			if self.metrics is not None:
+				self.metrics.in_flight -= 1
+				self.metrics.observe(
+					scope["method"],
+					self.routes.get(scope.get("endpoint"), UNMATCHED_ROUTE)[1],
+					status_code,
+					elapsed if elapsed is not None else time.perf_counter() - started
+				)
+
+			if self.log_timings:
+				timing_logger.info(orjson.dumps({
+					'method': scope["method"],
+					'path': path,
+					'route': self.routes.get(scope.get("endpoint"), UNMATCHED_ROUTE)[0],
+					'status': status_code,
+					**timings.to_dict(),
+					**({'queries': queries.to_dict()} if queries is not None else {})
+				}).decode())
+
+	def index_on_startup(
+		self: 'TimingMiddleware',
+		scope: Scope,
+		receive: Receive
+	) -> Receive:
+
+		async def receive_and_index() -> Message:
+
+			message: Message = await receive()
+
+			if message["type"] == "lifespan.startup":
+				self.routes = route_index(scope["app"].routes)
+
+			return message
+
+		return receive_and_index
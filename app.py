@@ -3,7 +3,6 @@ import sys
 import os
 import logging
 from uvicorn import run, logging as uvicorn_logging
-import time
 
 from fastapi import (
 	FastAPI,
@@ -11,10 +10,13 @@ from fastapi import (
 	BackgroundTasks,
 	APIRouter
 )
-from fastapi.responses import ORJSONResponse
 
 from api_v1.initialiser import init, format_loggers
 from api_v1.settings import get_settings
+from api_v1.timing import (
+	TimingMiddleware,
+	TimedORJSONResponse
+)
 
 console_formatter = uvicorn_logging.ColourizedFormatter(
 	fmt="%(levelprefix)s %(asctime)s - %(name)s:%(funcName)s:%(lineno)d - %(message)s",
@@ -28,7 +30,7 @@ app: FastAPI = FastAPI(
 	docs_url=None,
 	redoc_url=None,
 	debug=False,
-	default_response_class=ORJSONResponse
+	default_response_class=TimedORJSONResponse
 )
 environment_vars = get_settings()
 
@@ -46,12 +48,11 @@ if __name__ == "__main__":
 else:
 	init(app)
 
-@app.middleware("http")
-async def add_process_time_header(request, call_next):
-	request_path = request.scope['path']
-	start_time = time.perf_counter()
-	response = await call_next(request)
-	response.headers["X-Route-Name"] = next((x.name for x in request.app.router.routes if x.path.startswith(request_path)), '')
-	response.headers["X-Process-Time"] = str(time.perf_counter() - start_time)
-
-	return response
\ No newline at end of file
+## added last, so it's the outermost middleware and times everything else
+app.add_middleware(
+	TimingMiddleware,
+	server_timing=environment_vars.SERVER_TIMING_ENABLED,
+	log_timings=environment_vars.SERVER_TIMING_LOG_ENABLED,
+	metrics=getattr(app.state, 'request_metrics', None),
+	n_plus_one_threshold=environment_vars.DB_N_PLUS_ONE_THRESHOLD
+)
@@ -0,0 +1,156 @@
+'''
+	Compares the Redis memory used by cached responses, and the latency of a cache hit, with and without compression.
+
+	The payload is shaped like a full project from Project_Pydantic: the project, its bugs, their comments,
+	threads and badges. Run it against a Redis you don't mind writing to:
+
+		python -m benchmarks.cache_compression --url redis://localhost --bugs 200
+'''
+
+import argparse
+import asyncio
+import random
+import statistics
+import string
+import time
+import typing
+
+import aioredis
+
+from api_v1.cache.entry import (
+	CacheEntry,
+	encode_response
+)
+
+def words(
+	count: int
+) -> str:
+	return ' '.join(
+		''.join(random.choices(string.ascii_lowercase, k = random.randint(3, 10)))
+		for _ in range(count)
+	)
+
+def user(
+	pk: int
+) -> dict[str, typing.Any]:
+	return {
+		'id': pk,
+		'username': f'user{pk}',
+		'date_joined': '2022-05-01T10:00:00+00:00'
+	}
+
+def project_payload(
+	bugs: int
+) -> list[dict[str, typing.Any]]:
+	'''
+		A full project with the given number of bugs, each with a few comments, badges and a thread
+	'''
+
+	badges: list[dict[str, typing.Any]] = [
+		{'id': pk, 'label': words(1), 'color': '#%06x' % random.randrange(0xffffff)}
+		for pk in range(10)
+	]
+
+	return [{
+		'id': 1,
+		'name': words(3),
+		'description': words(60),
+		'date_created': '2022-05-01T10:00:00+00:00',
+		'date_updated': '2022-05-02T10:00:00+00:00',
+		'author': user(1),
+		'client': {'id': 1, 'name': words(2)},
+		'badges': random.sample(badges, 3),
+		'bugs': [{
+			'id': pk,
+			'content': words(40),
+			'status': random.choice(['OPEN', 'CLOSED', 'IN_PROGRESS']),
+			'priority': random.choice(['LOW', 'MEDIUM', 'HIGH']),
+			'owner': user(random.randint(1, 20)),
+			'badges': random.sample(badges, 2),
+			'date_created': '2022-05-01T10:00:00+00:00',
+			'comments': [{
+				'id': pk * 10 + comment,
+				'content': words(25),
+				'author': user(random.randint(1, 20)),
+				'date_created': '2022-05-01T10:00:00+00:00'
+			} for comment in range(4)],
+			'threads': [{
+				'id': pk,
+				'content': words(15),
+				'replies': [{'id': reply, 'content': words(10), 'author': user(reply)} for reply in range(2)]
+			}]
+		} for pk in range(bugs)]
+	}]
+
+async def measure(
+	redis: aioredis.Redis,
+	entry: CacheEntry,
+	compression_threshold: int,
+	keys: int,
+	hits: int
+) -> dict[str, float]:
+
+	value: bytes = entry.dumps(compression_threshold = compression_threshold)
+	prefix: str = f'benchmark:compression:{compression_threshold}'
+
+	await redis.delete(*[f'{prefix}:{pk}' for pk in range(keys)])
+
+	async with redis.pipeline(transaction = False) as pipe:
+		for pk in range(keys):
+			pipe.set(f'{prefix}:{pk}', value)
+		await pipe.execute()
+
+	memory: int = sum([
+		await redis.memory_usage(f'{prefix}:{pk}') for pk in range(keys)
+	])
+
+	latencies: list[float] = []
+
+	for hit in range(hits):
+		started: float = time.perf_counter()
+		CacheEntry.loads(await redis.get(f'{prefix}:{hit % keys}')).to_response()
+		latencies.append(time.perf_counter() - started)
+
+	await redis.delete(*[f'{prefix}:{pk}' for pk in range(keys)])
+
+	latencies.sort()
+
+	return {
+		'value_bytes': len(value),
+		'memory_bytes': memory / keys,
+		'p50_ms': statistics.median(latencies) * 1000,
+		'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000
+	}
+
+async def main(
+	arguments: argparse.Namespace
+) -> None:
+
+	random.seed(0)
+
+	redis: aioredis.Redis = aioredis.from_url(arguments.url)
+	entry: CacheEntry = CacheEntry(
+		body = encode_response(project_payload(arguments.bugs))
+	)
+
+	print(f'payload: {len(entry)} bytes, {arguments.keys} keys, {arguments.hits} hits\n')
+	print(f"{'mode':<12}{'value bytes':>14}{'redis bytes':>14}{'hit p50 ms':>12}{'hit p99 ms':>12}")
+
+	try:
+		for mode, threshold in (('identity', 0), ('zlib', 1)):
+			result: dict[str, float] = await measure(redis, entry, threshold, arguments.keys, arguments.hits)
+			print(
+				f"{mode:<12}{result['value_bytes']:>14}{result['memory_bytes']:>14.0f}"
+				f"{result['p50_ms']:>12.3f}{result['p99_ms']:>12.3f}"
+			)
+	finally:
+		await redis.close()
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--url', default = 'redis://localhost')
+	parser.add_argument('--bugs', type = int, default = 200, help = 'bugs in the project, which sets the payload size')
+	parser.add_argument('--keys', type = int, default = 50)
+	parser.add_argument('--hits', type = int, default = 2000)
+
+	asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,98 @@
+'''
+	Measures how much a storm of logins delays everything else on the event loop, with bcrypt running on the
+	event loop (as it used to) and on the password hashing threads.
+
+	While the logins run, a probe standing in for every other route sleeps for 1ms at a time, and records how
+	late it wakes up - the time any other request would have spent waiting for the loop.
+
+		python -m benchmarks.login_storm --logins 50
+'''
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+## the models read the settings on import - these are never connected to
+for name in ('DATABASE_NAME', 'DATABASE_HOST', 'DATABASE_PASSWORD', 'DATABASE_USER'):
+	os.environ.setdefault(name, 'benchmark')
+os.environ.setdefault('DATABASE_TORTOISE_BACKEND', 'tortoise.backends.sqlite')
+
+from api_v1.projects.models import (
+	User,
+	pwd_context
+)
+
+async def probe(
+	stop: asyncio.Event,
+	lags: list[float]
+) -> None:
+
+	while not stop.is_set():
+		started: float = time.perf_counter()
+		await asyncio.sleep(0.001)
+		lags.append(time.perf_counter() - started - 0.001)
+
+async def blocking_login(
+	hashed: str
+) -> bool:
+	return pwd_context.verify('Passw0rd!', hashed)
+
+async def threaded_login(
+	hashed: str
+) -> bool:
+	return await User.verify_password(
+		plain_password = 'Passw0rd!',
+		hashed_password = hashed
+	)
+
+async def storm(
+	login,
+	hashed: str,
+	logins: int
+) -> dict[str, float]:
+
+	stop: asyncio.Event = asyncio.Event()
+	lags: list[float] = []
+	prober: asyncio.Task = asyncio.create_task(probe(stop, lags))
+
+	await asyncio.sleep(0.01)
+
+	started: float = time.perf_counter()
+	await asyncio.gather(*[login(hashed) for _ in range(logins)])
+	elapsed: float = time.perf_counter() - started
+
+	stop.set()
+	await prober
+
+	lags.sort()
+
+	return {
+		'elapsed_s': elapsed,
+		'p50_ms': statistics.median(lags) * 1000,
+		'p99_ms': lags[int(len(lags) * 0.99)] * 1000,
+		'max_ms': lags[-1] * 1000
+	}
+
+async def main(
+	arguments: argparse.Namespace
+) -> None:
+
+	hashed: str = await User.create_password('Passw0rd!')
+
+	print(f'{arguments.logins} concurrent logins, bcrypt rounds {pwd_context.to_dict()["bcrypt__rounds"]}\n')
+	print(f"{'mode':<12}{'storm s':>10}{'lag p50 ms':>12}{'lag p99 ms':>12}{'lag max ms':>12}")
+
+	for mode, login in (('event loop', blocking_login), ('threads', threaded_login)):
+		result: dict[str, float] = await storm(login, hashed, arguments.logins)
+		print(
+			f"{mode:<12}{result['elapsed_s']:>10.2f}{result['p50_ms']:>12.2f}"
+			f"{result['p99_ms']:>12.2f}{result['max_ms']:>12.2f}"
+		)
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--logins', type = int, default = 50)
+
+	asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,118 @@
+'''
+	Measures what TimingMiddleware adds to every request: naming the route alone, with the request metrics,
+	and with Server-Timing as well - and how long rendering /metrics takes for a number of routes.
+
+	The requests go straight to the middleware, in front of an application that only sends an empty response,
+	so nothing else is measured:
+
+		python -m benchmarks.metrics_overhead --requests 100000 --routes 50
+'''
+
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI
+from starlette.types import (
+	Receive,
+	Scope,
+	Send
+)
+
+from api_v1.metrics import (
+	RequestMetrics,
+	collect_metrics,
+	merge_snapshots,
+	render_metrics
+)
+from api_v1.timing import TimingMiddleware
+
+async def endpoint(
+	scope: Scope,
+	receive: Receive,
+	send: Send
+) -> None:
+
+	scope["endpoint"] = endpoint ## as the router leaves it
+
+	await send({"type": "http.response.start", "status": 200, "headers": []})
+	await send({"type": "http.response.body", "body": b""})
+
+async def receive() -> dict:
+	return {"type": "http.request", "body": b""}
+
+async def send(
+	message: dict
+) -> None:
+	pass
+
+async def run(
+	app,
+	requests: int
+) -> float:
+
+	started: float = time.perf_counter()
+
+	for _ in range(requests):
+		await app({"type": "http", "method": "GET", "path": "/api/v1/projects/", "headers": []}, receive, send)
+
+	return (time.perf_counter() - started) / requests
+
+def middleware(
+	**kwargs
+) -> TimingMiddleware:
+
+	timing: TimingMiddleware = TimingMiddleware(endpoint, **kwargs)
+	timing.routes = {endpoint: ('get_projects', '/api/v1/projects/')}
+
+	return timing
+
+def render(
+	routes: int
+) -> tuple[float, int]:
+
+	metrics: RequestMetrics = RequestMetrics()
+
+	for route in range(routes):
+		for status in (200, 304, 404):
+			metrics.observe('GET', f'/api/v1/route{route}/', status, 0.01)
+
+	app: FastAPI = FastAPI()
+	app.state.request_metrics = metrics
+	snapshot: dict = collect_metrics(app)
+
+	started: float = time.perf_counter()
+	text: str = render_metrics(merge_snapshots([snapshot] * 4)) ## as if scraped with four workers
+	return time.perf_counter() - started, len(text)
+
+async def main(
+	arguments: argparse.Namespace
+) -> None:
+
+	apps: dict[str, object] = {
+		'no middleware': endpoint,
+		'route name': middleware(),
+		'+ metrics': middleware(metrics = RequestMetrics()),
+		'+ server timing': middleware(metrics = RequestMetrics(), server_timing = True)
+	}
+
+	baseline: float | None = None
+
+	print(f"{'mode':<18}{'us/request':>12}{'added us':>10}")
+
+	for mode, app in apps.items():
+		await run(app, arguments.requests // 10) ## warm up
+		per_request: float = await run(app, arguments.requests)
+		baseline = per_request if baseline is None else baseline
+
+		print(f'{mode:<18}{per_request * 1e6:>12.2f}{(per_request - baseline) * 1e6:>10.2f}')
+
+	elapsed, size = render(arguments.routes)
+	print(f'\nrendering /metrics for {arguments.routes} routes from 4 workers: {elapsed * 1000:.2f}ms, {size / 1024:.0f}KiB')
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--requests', type = int, default = 100000)
+	parser.add_argument('--routes', type = int, default = 50)
+
+	asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,21 @@
+-- Token.user_id was a free-text column holding the id of the user, it becomes a foreign key to "user",
+-- and token.token, which every authenticated request looks up, gets an index.
+-- For PostgreSQL. New databases get this schema from Tortoise's generate_schemas, and don't need it.
+
+BEGIN;
+
+-- tokens of users that no longer exist, or that never held a valid id, can't be migrated
+DELETE FROM "token"
+WHERE NOT EXISTS (
+	SELECT 1 FROM "user" WHERE "user"."id"::text = "token"."user_id"
+);
+
+ALTER TABLE "token"
+	ALTER COLUMN "user_id" TYPE INT USING "user_id"::INT;
+
+ALTER TABLE "token"
+	ADD CONSTRAINT "fk_token_user_id" FOREIGN KEY ("user_id") REFERENCES "user" ("id") ON DELETE CASCADE;
+
+CREATE INDEX IF NOT EXISTS "idx_token_token" ON "token" ("token");
+
+COMMIT;
@@ -0,0 +1,5 @@
+-- The token sweeper deletes tokens by their expiry, which needs an index on token.expires.
+-- For PostgreSQL. New databases get this index from Tortoise's generate_schemas, and don't need it.
+-- CONCURRENTLY, so logins carry on while a large table is indexed - run it outside of a transaction.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_token_expires" ON "token" ("expires");
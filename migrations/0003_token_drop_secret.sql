@@ -0,0 +1,12 @@
+-- Tokens are verified with the signing keyring (AUTH_SIGNING_KEYS), by the key id in their header,
+-- so the key and algorithm no longer need to be stored with every token.
+-- For PostgreSQL. Tokens issued before the keyring can't be verified, and are deleted.
+
+BEGIN;
+
+DELETE FROM "token";
+
+ALTER TABLE "token" DROP COLUMN "secret";
+ALTER TABLE "token" DROP COLUMN "algorithm";
+
+COMMIT;
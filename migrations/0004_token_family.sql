@@ -0,0 +1,10 @@
+-- Refresh tokens are rotated on every use, and every token rotated from the same login shares a family,
+-- so a refresh token that is used twice revokes the whole family. Refresh tokens carry more claims than
+-- access tokens, so token.token is widened for them.
+-- For PostgreSQL. Tokens issued before this have no family, and can't be refreshed.
+-- CONCURRENTLY, so logins carry on while a large table is indexed - run it outside of a transaction.
+
+ALTER TABLE "token" ALTER COLUMN "token" TYPE VARCHAR(512);
+ALTER TABLE "token" ADD COLUMN IF NOT EXISTS "family" VARCHAR(32) NULL;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_token_family" ON "token" ("family");
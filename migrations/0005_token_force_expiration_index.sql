@@ -0,0 +1,6 @@
+-- The token sweeper deletes expired tokens and force-expired tokens in separate queries, so each can use an index.
+-- Only a few tokens are ever force-expired at once, so they're indexed by a partial index rather than the whole column.
+-- For PostgreSQL. Tortoise's generate_schemas can't create partial indexes, so new databases need this as well.
+-- CONCURRENTLY, so logins carry on while a large table is indexed - run it outside of a transaction.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_token_force_expiration" ON "token" ("id") WHERE "force_expiration";
@@ -0,0 +1,207 @@
+'''
+	Runs the application in this process: against an in-memory SQLite database, with requests sent through
+	httpx's ASGI transport, and Redis replaced by fakeredis for the tests that ask for it.
+
+		python -m pytest tests
+'''
+
+import asyncio
+import contextlib
+import os
+import re
+import sys
+import typing
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+## the settings are read on import - the database they describe is replaced below, and never connected to
+for name in ('DATABASE_NAME', 'DATABASE_HOST', 'DATABASE_PASSWORD', 'DATABASE_USER'):
+	os.environ.setdefault(name, 'test')
+os.environ.setdefault('DATABASE_TORTOISE_BACKEND', 'tortoise.backends.sqlite')
+os.environ.setdefault('AUTH_BCRYPT_ROUNDS', '4')
+os.environ.setdefault('AUTH_SECRET_KEY', 'test')
+os.environ['CACHE_WARMUP_ENABLED'] = 'false'
+os.environ['AUTH_TOKEN_SWEEPER_ENABLED'] = 'false'
+## installed when the application is built - without INTERNAL_ENDPOINTS_TOKEN they still refuse every request
+os.environ['INTERNAL_ENDPOINTS_ENABLED'] = 'true'
+
+import aioredis
+import httpx
+from fastapi import FastAPI
+
+from api_v1 import initialiser
+from api_v1.cache.backends import (
+	CacheBackend,
+	MemoryCacheBackend,
+	RedisCacheBackend
+)
+from api_v1.timing import TimedORJSONResponse
+
+## a new, empty database every time the application starts
+initialiser.TORTOISE_ORM_CONFIG['connections']['default'] = 'sqlite://:memory:'
+
+from app import app
+
+PASSWORD: str = 'Passw0rd!'
+
+Test = typing.Callable[[httpx.AsyncClient], typing.Awaitable[None]]
+
+@contextlib.asynccontextmanager
+async def lifespan(
+	app: FastAPI
+) -> typing.AsyncIterator[None]:
+	'''
+		Starts and stops the application through the ASGI lifespan protocol, as a server does - so the middleware
+		sees it start, not just the router
+	'''
+
+	received: asyncio.Queue = asyncio.Queue()
+	sent: asyncio.Queue = asyncio.Queue()
+	task: asyncio.Task = asyncio.create_task(app({'type': 'lifespan'}, received.get, sent.put))
+
+	await received.put({'type': 'lifespan.startup'})
+
+	if (await sent.get())['type'] != 'lifespan.startup.complete':
+		await task ## raises what startup raised
+
+	try:
+		yield
+	finally:
+		await received.put({'type': 'lifespan.shutdown'})
+		await sent.get()
+		await task
+
+async def run(
+	test: Test
+) -> None:
+
+	async with lifespan(app):
+		async with httpx.AsyncClient(transport = httpx.ASGITransport(app = app), base_url = 'http://test') as client:
+			await test(client)
+
+@contextlib.asynccontextmanager
+async def workers(
+	count: int
+) -> typing.AsyncIterator[list[httpx.AsyncClient]]:
+	'''
+		Starts count instances of the application, as separate workers would run it - sharing the database, and
+		whatever cache backend is configured, but nothing kept in memory
+	'''
+
+	apps: list[FastAPI] = []
+
+	for _ in range(count):
+		app: FastAPI = FastAPI(default_response_class = TimedORJSONResponse)
+		initialiser.init(app)
+		apps.append(app)
+
+	async with contextlib.AsyncExitStack() as stack:
+		## every instance initialises Tortoise, which is global - the database is made by the last one
+		for app in apps:
+			await stack.enter_async_context(lifespan(app))
+
+		yield [
+			await stack.enter_async_context(httpx.AsyncClient(
+				transport = httpx.ASGITransport(app = app),
+				base_url = 'http://test'
+			))
+			for app in apps
+		]
+
+@pytest.fixture
+def serve(
+	monkeypatch: pytest.MonkeyPatch
+) -> typing.Callable[..., None]:
+	'''
+		Starts the application with the settings given, runs a test against it, and stops it:
+
+			def test_listing(serve):
+				async def test(client):
+					assert (await client.get('/api/v1/projects/')).status_code == 200
+
+				serve(test, CACHE_BACKEND = 'memory')
+	'''
+
+	def serve(
+		test: Test,
+		**settings: typing.Any
+	) -> None:
+
+		for name, value in settings.items():
+			monkeypatch.setattr(initialiser.environment_vars, name, value)
+
+		asyncio.run(run(test))
+
+	return serve
+
+@pytest.fixture
+def redis(
+	monkeypatch: pytest.MonkeyPatch
+) -> typing.Any:
+	'''
+		Every Redis client the application creates talks to the same fakeredis server
+	'''
+
+	fakeredis = pytest.importorskip('fakeredis')
+	pytest.importorskip('fakeredis.aioredis')
+	server = fakeredis.FakeServer()
+
+	monkeypatch.setattr(aioredis, 'from_url', lambda url, **kwargs: fakeredis.aioredis.FakeRedis(
+		server = server,
+		decode_responses = kwargs.get('decode_responses', False)
+	))
+
+	return server
+
+@pytest.fixture(params = ['memory', 'redis'])
+def backend(
+	request: pytest.FixtureRequest
+) -> typing.Callable[[], CacheBackend]:
+	'''
+		Creates a cache backend of each kind, with fakeredis standing in for Redis
+	'''
+
+	if request.param == 'memory':
+		return lambda: MemoryCacheBackend(max_bytes = 1024 * 1024)
+
+	fakeredis = pytest.importorskip('fakeredis.aioredis')
+
+	return lambda: RedisCacheBackend(redis = fakeredis.FakeRedis(), tag_ttl_seconds = 60)
+
+def cookies(
+	response: httpx.Response
+) -> dict[str, str]:
+	'''
+		The cookies a response sets. Read from the headers, as the cookie jar drops cookies with a numeric expires
+	'''
+
+	return {
+		match.group(1): match.group(2)
+		for match in (re.match(r'([^=]+)="?([^";]*)', header) for header in response.headers.get_list('set-cookie'))
+		if match is not None
+	}
+
+def cookie_header(
+	**values: str
+) -> dict[str, str]:
+	return {'Cookie': '; '.join(f'{name}={value}' for name, value in values.items())}
+
+async def register(
+	client: httpx.AsyncClient,
+	username: str
+) -> dict[str, str]:
+	'''
+		Registers a user, and returns the cookies they were logged in with
+	'''
+
+	response: httpx.Response = await client.post('/api/v1/auth/register/', json = {
+		'username': username,
+		'password': PASSWORD,
+		'confirm_password': PASSWORD
+	})
+
+	assert response.status_code == 200, response.text
+
+	return cookies(response)
@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+import pytest
+
+from api_v1.cache.backends import (
+	CacheBackend,
+	selected_cache_backend
+)
+from api_v1.settings import Settings
+
+@pytest.mark.parametrize('redis_enabled, cache_backend, selected', [
+	(False, None, 'none'),
+	(True, None, 'redis'),
+	(False, 'memory', 'memory'),
+	(True, 'none', 'none'),
+])
+def test_selected_cache_backend(redis_enabled, cache_backend, selected):
+
+	assert selected_cache_backend(Settings(REDIS_ENABLED = redis_enabled, CACHE_BACKEND = cache_backend)) == selected
+
+def test_get_and_set(backend):
+
+	async def test() -> None:
+		cache: CacheBackend = backend()
+
+		assert await cache.get('key') is None
+
+		await cache.set('key', b'value', ttl_seconds = 60)
+
+		assert await cache.get('key') == b'value'
+
+		await cache.close()
+
+	asyncio.run(test())
+
+def test_lock_is_only_released_by_its_holder(backend):
+
+	async def test() -> None:
+		cache: CacheBackend = backend()
+
+		assert await cache.acquire_lock('key:lock', token = 'first', timeout = 10)
+		assert not await cache.acquire_lock('key:lock', token = 'second', timeout = 10)
+
+		await cache.release_lock('key:lock', token = 'second')
+
+		assert not await cache.acquire_lock('key:lock', token = 'second', timeout = 10)
+
+		await cache.release_lock('key:lock', token = 'first')
+
+		assert await cache.acquire_lock('key:lock', token = 'second', timeout = 10)
+
+		await cache.close()
+
+	asyncio.run(test())
+
+def test_expiring_members(backend):
+
+	async def test() -> None:
+		cache: CacheBackend = backend()
+		now: float = time.time()
+
+		await cache.add_expiring('revoked', 'live', now + 60)
+		await cache.add_expiring('revoked', 'expired', now - 1)
+
+		assert list(await cache.expiring_members('revoked')) == ['live']
+
+		await cache.close()
+
+	asyncio.run(test())
@@ -0,0 +1,53 @@
+import asyncio
+
+import aiojobs
+import httpx
+from fastapi import (
+	FastAPI,
+	Request
+)
+
+from api_v1.cache.backends import MemoryCacheBackend
+from api_v1.cache.stats import CacheStats
+from api_v1.decorators import cache_route
+
+def test_stale_response_is_served_while_it_refreshes():
+
+	async def test() -> None:
+		app: FastAPI = FastAPI()
+		app.state.cache = MemoryCacheBackend(max_bytes = 1024 * 1024)
+		app.state.cache_stats = CacheStats()
+		app.state.local_cache = None
+		app.state.scheduler = await aiojobs.create_scheduler()
+		calls: list[int] = []
+
+		@app.get('/items/')
+		@cache_route(app, ttl_seconds = 60, soft_ttl_seconds = 0.05)
+		async def get_items(
+			request: Request
+		) -> list[int]:
+
+			calls.append(1)
+
+			return [len(calls)]
+
+		async with httpx.AsyncClient(transport = httpx.ASGITransport(app = app), base_url = 'http://test') as client:
+			assert (await client.get('/items/')).json() == [1]
+
+			await asyncio.sleep(0.1)
+
+			## stale, so it's served as it is and refreshed in the background
+			assert (await client.get('/items/')).json() == [1]
+
+			while app.state.scheduler.active_count:
+				await asyncio.sleep(0.01)
+
+			assert (await client.get('/items/')).json() == [2]
+
+		assert len(calls) == 2
+		assert app.state.cache_stats.route('get_items').stale_hits == 1
+
+		await app.state.scheduler.close()
+		await app.state.cache.close()
+
+	asyncio.run(test())
@@ -0,0 +1,53 @@
+import httpx
+import pytest
+
+from api_v1.cache.stats import Histogram
+
+def test_histogram_buckets():
+
+	histogram: Histogram = Histogram(buckets = (0.1, 1.0))
+
+	for value in (0.05, 0.1, 0.5, 2.0):
+		histogram.observe(value)
+
+	assert histogram.to_dict() == {
+		'count': 4,
+		'sum': 2.65,
+		'buckets': {'0.1': 2, '1.0': 1, '+Inf': 1}
+	}
+
+def test_cache_stats_count_hits_and_misses(serve):
+
+	async def test(client: httpx.AsyncClient) -> None:
+		for _ in range(3):
+			assert (await client.get('/api/v1/projects/')).status_code == 200
+
+		response: httpx.Response = await client.get('/api/v1/internal/cache/stats/', headers = {
+			'Authorization': 'Bearer operator'
+		})
+
+		assert response.status_code == 200
+
+		stats: dict = response.json()['routes']['get_projects']
+
+		assert (stats['misses'], stats['hits'], stats['fills']) == (1, 2, 1)
+		assert stats['hit_ratio'] == pytest.approx(2 / 3)
+		assert stats['latency']['hit']['count'] == 2
+
+	serve(test, CACHE_BACKEND = 'memory', INTERNAL_ENDPOINTS_TOKEN = 'operator')
+
+@pytest.mark.parametrize('token, authorization, status_code', [
+	(None, 'Bearer operator', 403),
+	('operator', None, 401),
+	('operator', 'Bearer guess', 401),
+])
+def test_cache_stats_need_the_operator_token(serve, token, authorization, status_code):
+
+	async def test(client: httpx.AsyncClient) -> None:
+		response: httpx.Response = await client.get('/api/v1/internal/cache/stats/', headers = {
+			'Authorization': authorization
+		} if authorization else {})
+
+		assert response.status_code == status_code
+
+	serve(test, INTERNAL_ENDPOINTS_TOKEN = token)
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from api_v1.cache.coalesce import SingleFlight
+
+def test_concurrent_callers_share_one_computation():
+
+	async def test() -> None:
+		flight: SingleFlight = SingleFlight()
+		calls: list[int] = []
+
+		async def compute() -> str:
+			calls.append(1)
+			await asyncio.sleep(0.01)
+
+			return 'value'
+
+		assert await asyncio.gather(*(flight.run('key', compute) for _ in range(5))) == ['value'] * 5
+		assert len(calls) == 1
+		assert len(flight) == 0
+
+		## once it's done, the next caller computes again
+		assert await flight.run('key', compute) == 'value'
+		assert len(calls) == 2
+
+	asyncio.run(test())
+
+def test_every_caller_sees_the_error():
+
+	async def test() -> None:
+		flight: SingleFlight = SingleFlight()
+
+		async def compute() -> None:
+			await asyncio.sleep(0.01)
+
+			raise ValueError('failed')
+
+		results: list = await asyncio.gather(*(flight.run('key', compute) for _ in range(3)), return_exceptions = True)
+
+		assert all(isinstance(result, ValueError) for result in results)
+		assert len(flight) == 0
+
+	asyncio.run(test())
+
+def test_waiter_takes_over_from_a_cancelled_caller():
+
+	async def test() -> None:
+		flight: SingleFlight = SingleFlight()
+		calls: list[int] = []
+
+		async def compute() -> str:
+			calls.append(1)
+			await asyncio.sleep(0.01)
+
+			return 'value'
+
+		first: asyncio.Task = asyncio.create_task(flight.run('key', compute))
+		await asyncio.sleep(0)
+		second: asyncio.Task = asyncio.create_task(flight.run('key', compute))
+		await asyncio.sleep(0)
+
+		first.cancel()
+
+		with pytest.raises(asyncio.CancelledError):
+			await first
+
+		assert await second == 'value'
+		assert len(calls) == 2
+
+	asyncio.run(test())
@@ -0,0 +1,62 @@
+import httpx
+import pytest
+
+from api_v1.projects.models import Organisation
+
+from conftest import (
+	cookie_header,
+	register
+)
+
+@pytest.mark.parametrize('cache_backend', ['none', 'memory'])
+def test_etag_changes_after_write_without_shared_cache(serve, cache_backend):
+
+	async def test(client: httpx.AsyncClient) -> None:
+		await register(client, 'alice')
+
+		response: httpx.Response = await client.get('/api/v1/auth/users/')
+		etag: str = response.headers['ETag']
+
+		response = await client.get('/api/v1/auth/users/', headers = {'If-None-Match': etag})
+		assert response.status_code == 304
+
+		## nothing can invalidate an ETag made from tag versions kept in one worker, or none at all -
+		## the ETag has to follow the body
+		await register(client, 'bob')
+
+		response = await client.get('/api/v1/auth/users/', headers = {'If-None-Match': etag})
+		assert response.status_code == 200
+		assert response.headers['ETag'] != etag
+		assert len(response.json()) == 2
+
+	serve(test, CACHE_BACKEND = cache_backend)
+
+@pytest.mark.parametrize('cache_backend', ['none', 'memory', 'redis'])
+def test_project_etag_changes_after_bug_is_written(serve, redis, cache_backend):
+
+	async def test(client: httpx.AsyncClient) -> None:
+		tokens: dict[str, str] = await register(client, 'alice')
+		organisation: Organisation = await Organisation.create(name = 'Acme')
+
+		response: httpx.Response = await client.post('/api/v1/projects/', headers = cookie_header(
+			token = tokens['token']
+		), json = {'name': 'First', 'client_id': organisation.id})
+		project_id: int = response.json()[0]['id']
+
+		response = await client.get('/api/v1/projects/')
+		etag: str = response.headers['ETag']
+		assert response.json()[0]['bug_count'] == 0
+
+		## a bug changes neither how many projects there are nor when one was last updated - the fingerprint -
+		## but it does change the listing
+		response = await client.post('/api/v1/projects/bug/', headers = cookie_header(
+			token = tokens['token']
+		), json = {'content': 'Broken', 'project_id': project_id, 'allocated_to_ids': []})
+		assert response.status_code == 200
+
+		response = await client.get('/api/v1/projects/', headers = {'If-None-Match': etag})
+		assert response.status_code == 200
+		assert response.headers['ETag'] != etag
+		assert response.json()[0]['bug_count'] == 1
+
+	serve(test, CACHE_BACKEND = cache_backend)
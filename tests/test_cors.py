@@ -0,0 +1,57 @@
+import httpx
+import pytest
+
+from api_v1.cors import (
+	OriginPolicy,
+	create_origin_policy
+)
+from api_v1.settings import Settings
+
+@pytest.mark.parametrize('origin, allowed', [
+	('https://app.example.com', True),
+	('https://pr-12.preview.example.com', True),
+	('http://localhost:3000', True),
+	('http://127.0.0.1:8080', True),
+	('https://app.example.com.evil.com', False),
+	('https://preview.example.com', False),
+	('http://localhost.evil.com:3000', False),
+	('https://localhost:3000', False),
+])
+def test_origin_policy(origin, allowed):
+
+	policy: OriginPolicy = create_origin_policy(Settings(
+		FRONTEND_ADDRESS = 'https://app.example.com',
+		ENV_ORIGINS = 'https://admin.example.com, https://staff.example.com',
+		CORS_ORIGIN_REGEXES = [r'https://pr-\d+\.preview\.example\.com'],
+		CORS_ALLOW_LOCALHOST = True
+	))
+
+	assert policy.allows(origin) is allowed
+
+def test_origins_from_env_origins():
+
+	policy: OriginPolicy = create_origin_policy(Settings(
+		FRONTEND_ADDRESS = None,
+		ENV_ORIGINS = 'https://admin.example.com, https://staff.example.com',
+		CORS_ALLOW_LOCALHOST = False
+	))
+
+	assert policy.origins == {'https://admin.example.com', 'https://staff.example.com'}
+	assert policy.pattern is None
+
+@pytest.mark.parametrize('origin, allowed', [
+	('http://localhost:3000', True),
+	('https://evil.com', False),
+])
+def test_preflight(serve, origin, allowed):
+
+	async def test(client: httpx.AsyncClient) -> None:
+		response: httpx.Response = await client.options('/api/v1/projects/', headers = {
+			'Origin': origin,
+			'Access-Control-Request-Method': 'GET'
+		})
+
+		assert (response.status_code == 200) is allowed
+		assert (response.headers.get('Access-Control-Allow-Origin') == origin) is allowed
+
+	serve(test)
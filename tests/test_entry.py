@@ -0,0 +1,50 @@
+import orjson
+from pydantic import BaseModel
+from starlette.responses import Response
+
+from api_v1.cache.entry import CacheEntry
+
+class Item(BaseModel):
+	id: int
+	name: str
+
+def test_entry_keeps_the_encoded_body():
+
+	entry: CacheEntry = CacheEntry.from_response([Item(id = 1, name = 'First')])
+
+	assert orjson.loads(entry.body) == [{'id': 1, 'name': 'First'}]
+
+	loaded: CacheEntry = CacheEntry.loads(entry.dumps())
+	response: Response = loaded.to_response()
+
+	assert response.body == entry.body
+	assert response.media_type == 'application/json'
+
+def test_entry_keeps_a_response_as_sent():
+
+	entry: CacheEntry = CacheEntry.from_response(Response(content = b'a;b', media_type = 'text/plain; charset=utf-8'))
+	loaded: CacheEntry = CacheEntry.loads(entry.dumps())
+
+	assert loaded.body == b'a;b'
+	assert loaded.media_type == 'text/plain; charset=utf-8'
+
+def test_large_bodies_are_compressed():
+
+	entry: CacheEntry = CacheEntry(body = orjson.dumps([{'id': i, 'name': 'Project'} for i in range(100)]))
+
+	compressed: bytes = entry.dumps(compression_threshold = 1024)
+	small: bytes = CacheEntry(body = b'[]').dumps(compression_threshold = 1024)
+
+	assert b';zlib;' in compressed.partition(b'\n')[0]
+	assert len(compressed) < len(entry.body)
+	assert CacheEntry.loads(compressed).body == entry.body
+
+	assert b';identity;' in small.partition(b'\n')[0]
+	assert CacheEntry.loads(small).body == b'[]'
+
+def test_entries_written_before_the_codec_still_load():
+
+	entry: CacheEntry = CacheEntry.loads(b'0.000;application/json\n[]')
+
+	assert entry.body == b'[]'
+	assert entry.media_type == 'application/json'
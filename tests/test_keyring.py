@@ -0,0 +1,45 @@
+import pytest
+from jose import JWTError
+
+from api_v1.projects.keyring import (
+	Keyring,
+	get_keyring
+)
+from api_v1.settings import get_settings
+
+def test_tokens_are_verified_with_the_key_they_name():
+
+	old: Keyring = Keyring(keys = {'2025': 'old key'}, active_key_id = '2025')
+	rotated: Keyring = Keyring(keys = {'2025': 'old key', '2026': 'new key'}, active_key_id = '2026')
+
+	## a token signed before the rotation still verifies, until its key is removed
+	assert rotated.verify(old.sign({'sub': '1'}))['sub'] == '1'
+
+	## and one signed with a key that isn't in the keyring never does
+	with pytest.raises(JWTError):
+		old.verify(rotated.sign({'sub': '2'}))
+
+@pytest.fixture
+def keyring_settings(monkeypatch: pytest.MonkeyPatch):
+
+	get_keyring.cache_clear()
+	yield get_settings()
+	get_keyring.cache_clear()
+
+def test_refuses_to_start_without_a_shared_key(keyring_settings, monkeypatch):
+
+	monkeypatch.setattr(keyring_settings, 'AUTH_SIGNING_KEYS', {})
+	monkeypatch.setattr(keyring_settings, 'AUTH_SECRET_KEY', None)
+
+	with pytest.raises(RuntimeError):
+		get_keyring()
+
+def test_secret_key_is_the_only_key_without_signing_keys(keyring_settings, monkeypatch):
+
+	monkeypatch.setattr(keyring_settings, 'AUTH_SIGNING_KEYS', {})
+	monkeypatch.setattr(keyring_settings, 'AUTH_SECRET_KEY', 'shared by every worker')
+
+	## what another worker, configured the same way, signed
+	token: str = Keyring(keys = {'local': 'shared by every worker'}, active_key_id = 'local').sign({'sub': '1'})
+
+	assert get_keyring().verify(token)['sub'] == '1'
@@ -0,0 +1,65 @@
+import enum
+import types
+import typing
+
+from starlette.requests import Request
+
+from api_v1.cache.keys import (
+	build_cache_key,
+	canonical_request
+)
+
+class Status(enum.Enum):
+	open = 'open'
+
+def request(
+	url: str,
+	user: typing.Any = None
+) -> Request:
+
+	scheme, _, rest = url.partition('://')
+	host, _, path = rest.partition('/')
+	path, _, query = path.partition('?')
+
+	return Request({
+		'type': 'http',
+		'scheme': scheme,
+		'server': (host, 80),
+		'path': f'/{path}',
+		'query_string': query.encode(),
+		'headers': [(b'host', host.encode())],
+		'user': user
+	})
+
+def test_key_ignores_host_and_argument_order():
+
+	first: Request = request('http://a.example/api/v1/bugs/?b=2&a=1')
+	second: Request = request('https://b.example/api/v1/bugs?a=1&b=2')
+
+	assert build_cache_key(first, {'a': 1, 'b': 2, 'request': first}) == build_cache_key(second, {'b': 2, 'a': 1})
+
+def test_canonical_request():
+
+	assert canonical_request(
+		request('http://test/api/v1/bugs/'),
+		{'status': Status.open, 'ids': [3, 1, 2], 'search': None}
+	) == '/api/v1/bugs?ids=1%2C2%2C3&status=open'
+
+def test_key_varies_by_the_arguments_given():
+
+	key: typing.Callable[[dict], str] = lambda kwargs: build_cache_key(
+		request('http://test/api/v1/bugs/'),
+		kwargs,
+		vary = ('project_id', )
+	)
+
+	assert key({'project_id': 1, 'page': 1}) == key({'project_id': 1, 'page': 2})
+	assert key({'project_id': 1}) != key({'project_id': 2})
+
+def test_key_varies_by_user():
+
+	alice: Request = request('http://test/api/v1/auth/me/', user = types.SimpleNamespace(pk = 1))
+	bob: Request = request('http://test/api/v1/auth/me/', user = types.SimpleNamespace(pk = 2))
+
+	assert build_cache_key(alice, {}, vary_by_user = True) != build_cache_key(bob, {}, vary_by_user = True)
+	assert build_cache_key(alice, {}) == build_cache_key(bob, {})
@@ -0,0 +1,76 @@
+import asyncio
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.authentication import (
+	AuthCredentials,
+	AuthenticationBackend,
+	SimpleUser
+)
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from api_v1.projects.middleware import (
+	LazyAuthenticationMiddleware,
+	resolve_user
+)
+
+class CountingBackend(AuthenticationBackend):
+
+	def __init__(self):
+		self.calls: int = 0
+
+	async def authenticate(self, request):
+		self.calls += 1
+
+		return AuthCredentials(['authenticated']), SimpleUser('alice')
+
+async def anonymous(request: Request) -> PlainTextResponse:
+	return PlainTextResponse('')
+
+async def authenticated(request: Request) -> PlainTextResponse:
+	await resolve_user(request)
+	await resolve_user(request)
+
+	return PlainTextResponse(request.user.display_name)
+
+def get(
+	path: str
+) -> tuple[str, int]:
+	'''
+		Requests path, and returns the body and how many times the request was authenticated
+	'''
+
+	backend: CountingBackend = CountingBackend()
+	app: LazyAuthenticationMiddleware = LazyAuthenticationMiddleware(
+		Starlette(routes = [
+			Route('/listing/', anonymous),
+			Route('/me/', authenticated),
+			Route('/public/me/', authenticated),
+			Route('/publications/me/', authenticated)
+		]),
+		backend = backend,
+		exempt_paths = ['/public']
+	)
+
+	async def test() -> str:
+		async with httpx.AsyncClient(transport = httpx.ASGITransport(app = app), base_url = 'http://test') as client:
+			return (await client.get(path)).text
+
+	return asyncio.run(test()), backend.calls
+
+def test_user_is_only_resolved_when_needed():
+
+	assert get('/listing/') == ('', 0)
+	## and only once
+	assert get('/me/') == ('alice', 1)
+
+@pytest.mark.parametrize('path, authenticated', [
+	('/public/me/', False),
+	('/publications/me/', True),
+])
+def test_exempt_paths_end_at_a_segment(path, authenticated):
+
+	assert get(path) == (('alice', 1) if authenticated else ('', 0))
@@ -0,0 +1,53 @@
+from api_v1.cache.local import LocalCache
+
+def test_evicts_least_recently_used_to_stay_within_max_bytes():
+
+	cache: LocalCache = LocalCache(max_bytes = 10)
+
+	assert cache.set('a', 'a', size = 4, ttl_seconds = 60)
+	assert cache.set('b', 'b', size = 4, ttl_seconds = 60)
+	assert cache.get('a') == 'a'
+
+	assert cache.set('c', 'c', size = 4, ttl_seconds = 60)
+
+	assert cache.get('b') is None
+	assert cache.get('a') == 'a'
+	assert cache.get('c') == 'c'
+	assert cache.size == 8
+
+	## too large to ever fit
+	assert not cache.set('d', 'd', size = 11, ttl_seconds = 60)
+
+def test_expired_entries_are_not_served():
+
+	cache: LocalCache = LocalCache(max_bytes = 10, ttl_seconds = 0)
+
+	cache.set('a', 'a', size = 1, ttl_seconds = 60)
+
+	assert cache.get('a') is None
+	assert len(cache) == 0
+
+def test_invalidate_tags():
+
+	cache: LocalCache = LocalCache(max_bytes = 100)
+
+	cache.set('projects', '[1]', size = 3, ttl_seconds = 60, tags = ('project:*', ))
+	cache.set('project:1', '{}', size = 2, ttl_seconds = 60, tags = ('project:1', 'project:*'))
+	cache.set('badges', '[]', size = 2, ttl_seconds = 60, tags = ('badge:*', ))
+
+	assert cache.invalidate_tags(['project:*']) == 2
+
+	assert cache.get('projects') is None
+	assert cache.get('project:1') is None
+	assert cache.get('badges') == '[]'
+	assert cache.size == 2
+
+def test_value_computed_before_an_invalidation_is_not_stored():
+
+	cache: LocalCache = LocalCache(max_bytes = 100)
+	generation: int = cache.generation
+
+	cache.invalidate_tags(['project:*'])
+
+	assert not cache.set('projects', '[1]', size = 3, ttl_seconds = 60, generation = generation)
+	assert cache.get('projects') is None
@@ -0,0 +1,133 @@
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from api_v1.cache.stats import Histogram
+from api_v1.metrics import (
+	STOPPED_WORKERS_FILE,
+	Snapshot,
+	fold_stopped_workers,
+	labels,
+	merge_snapshots,
+	read_snapshots,
+	render_metrics,
+	snapshot_path,
+	write_snapshot
+)
+from app import app
+
+def snapshot(
+	requests: int
+) -> Snapshot:
+
+	histogram: Histogram = Histogram((0.1, 1.0))
+	histogram.observe(0.05)
+
+	return {
+		'counters': {'http_requests_total': {labels(method = 'GET', route = '/items/', status = 200): requests}},
+		'gauges': {'http_requests_in_flight': {'': 1}},
+		'histograms': {'http_request_duration_seconds': {labels(method = 'GET', route = '/items/'): {
+			'buckets': histogram.buckets,
+			'counts': histogram.counts,
+			'sum': histogram.sum,
+			'count': histogram.count
+		}}}
+	}
+
+def exited_pid() -> int:
+
+	process: subprocess.Popen = subprocess.Popen([sys.executable, '-c', ''])
+	process.wait()
+
+	return process.pid
+
+def test_render_metrics():
+
+	assert render_metrics(merge_snapshots([snapshot(2), snapshot(3)])).splitlines() == [
+		'# HELP http_requests_total Requests handled, by method, route template and status',
+		'# TYPE http_requests_total counter',
+		'http_requests_total{method="GET",route="/items/",status="200"} 5',
+		'# HELP http_requests_in_flight Requests being handled',
+		'# TYPE http_requests_in_flight gauge',
+		'http_requests_in_flight 2',
+		'# HELP http_request_duration_seconds Seconds until the response started, by method and route template',
+		'# TYPE http_request_duration_seconds histogram',
+		'http_request_duration_seconds_bucket{method="GET",route="/items/",le="0.1"} 2',
+		'http_request_duration_seconds_bucket{method="GET",route="/items/",le="1.0"} 2',
+		'http_request_duration_seconds_bucket{method="GET",route="/items/",le="+Inf"} 2',
+		'http_request_duration_seconds_sum{method="GET",route="/items/"} 0.1',
+		'http_request_duration_seconds_count{method="GET",route="/items/"} 2',
+	]
+
+def test_stopped_workers_are_folded_into_one_file(tmp_path):
+
+	directory: str = str(tmp_path)
+	stopped: int = exited_pid()
+	long_ago: float = time.time() - 60
+
+	for worker, requests in ((f'{stopped}-aaaa', 2), (f'{stopped}-bbbb', 3), (f'{os.getppid()}-cccc', 4)):
+		write_snapshot(directory, snapshot(requests), path = snapshot_path(directory, worker))
+		os.utime(snapshot_path(directory, worker), (long_ago, long_ago))
+
+	def total() -> Snapshot:
+		return merge_snapshots(read_snapshots(directory, stale_after_seconds = 30))
+
+	before: Snapshot = total()
+
+	## the worker whose process is still running is kept, however old its snapshot
+	assert fold_stopped_workers(directory, stale_after_seconds = 30) == 2
+	assert sorted(os.listdir(directory)) == sorted([
+		f'metrics-{os.getppid()}-cccc.json', STOPPED_WORKERS_FILE, 'metrics.lock'
+	])
+
+	after: Snapshot = total()
+
+	assert after['counters'] == before['counters']
+	assert after['histograms'] == before['histograms']
+	assert after['counters']['http_requests_total'][labels(method = 'GET', route = '/items/', status = 200)] == 9
+
+	## and folding again adds nothing
+	assert fold_stopped_workers(directory, stale_after_seconds = 30) == 0
+	assert total()['counters'] == before['counters']
+
+def test_metrics_endpoint(serve, monkeypatch):
+
+	## counted from here on, without the requests of other tests
+	monkeypatch.setattr(app.state.request_metrics, 'requests', {})
+	monkeypatch.setattr(app.state.request_metrics, 'latency', {})
+
+	async def test(client: httpx.AsyncClient) -> None:
+		for path in ('/api/v1/projects/', '/api/v1/projects/', '/api/v1/unknown/1/', '/api/v1/unknown/2/'):
+			await client.get(path)
+
+		response: httpx.Response = await client.get('/api/v1/internal/metrics/', headers = {
+			'Authorization': 'Bearer operator'
+		})
+
+		assert response.status_code == 200
+		assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+
+		lines: list[str] = response.text.splitlines()
+
+		## by route template, so paths that match no route share one series
+		assert 'http_requests_total{method="GET",route="/api/v1/projects/",status="200"} 2' in lines
+		assert 'http_requests_total{method="GET",route="unmatched",status="404"} 2' in lines
+		assert 'cache_route_events_total{route="get_projects",event="hits"} 1' in lines
+		## the request for the metrics
+		assert 'http_requests_in_flight 1' in lines
+
+	serve(test, CACHE_BACKEND = 'memory', INTERNAL_ENDPOINTS_TOKEN = 'operator')
+
+def test_cache_stats_cant_be_reset(serve):
+
+	async def test(client: httpx.AsyncClient) -> None:
+		response: httpx.Response = await client.delete('/api/v1/internal/cache/stats/', headers = {
+			'Authorization': 'Bearer operator'
+		})
+
+		assert response.status_code == 405
+
+	serve(test, INTERNAL_ENDPOINTS_TOKEN = 'operator')
@@ -0,0 +1,31 @@
+import asyncio
+import threading
+
+from api_v1.projects.models import (
+	User,
+	run_password_hashing
+)
+
+from conftest import PASSWORD
+
+def test_passwords_are_hashed_off_the_event_loop():
+
+	async def test() -> None:
+		thread: str = await run_password_hashing(lambda: threading.current_thread().name)
+
+		assert thread.startswith('password-hashing')
+		assert thread != threading.current_thread().name
+
+	asyncio.run(test())
+
+def test_hash_and_verify():
+
+	async def test() -> None:
+		hashed: str = await User.create_password(PASSWORD)
+
+		## AUTH_BCRYPT_ROUNDS, set to 4 for the tests
+		assert hashed.startswith('$2b$04$')
+		assert await User.verify_password(PASSWORD, hashed)
+		assert not await User.verify_password('wrong', hashed)
+
+	asyncio.run(test())
@@ -0,0 +1,102 @@
+import httpx
+
+from api_v1.projects.models import (
+	Bug,
+	Comment,
+	Organisation,
+	Project,
+	User
+)
+from api_v1.queries import (
+	QueryLog,
+	capture_queries,
+	statement_shape
+)
+
+def test_statement_shape():
+
+	assert statement_shape(
+		'SELECT "id" FROM "bug" WHERE "project_id"=5 AND "content"=\'it\'\'s\' AND "id" IN (1, 2,3)'
+	) == 'SELECT "id" FROM "bug" WHERE "project_id"=? AND "content"=? AND "id" IN (...)'
+
+	assert statement_shape(
+		'SELECT "id"\n  FROM "user" WHERE "id"=$1 AND "id" IN ($2,$3)'
+	) == 'SELECT "id" FROM "user" WHERE "id"=? AND "id" IN (...)'
+
+def test_nested_captures_record_every_query():
+
+	outer: QueryLog = QueryLog()
+	inner: QueryLog = QueryLog(parent = outer)
+
+	for project_id in range(3):
+		inner.record(f'SELECT "id" FROM "bug" WHERE "project_id"={project_id}', 0.001)
+
+	assert outer.count == inner.count == 3
+	assert inner.suspects(threshold = 3) == {'SELECT "id" FROM "bug" WHERE "project_id"=?': 3}
+	assert not inner.suspects(threshold = 4)
+
+async def seed_projects(
+	count: int
+) -> Bug:
+	'''
+		Creates count projects, each by a different user, with a bug and a comment - and a comment by each user on the
+		first bug. Returns that bug
+	'''
+
+	organisation, _ = await Organisation.get_or_create(name = 'Acme')
+	first: Bug | None = await Bug.first()
+
+	for _ in range(count):
+		user: User = await User.create(username = f'user{await User.all().count()}', password = 'unused')
+		project: Project = await Project.create(name = f'Project of {user.username}', author = user, client = organisation)
+		bug: Bug = await Bug.create(content = 'Broken', owner = user, project = project)
+		first = first or bug
+
+		await Comment.create(content = 'Seen it', author = user, project = project)
+		await Comment.create(content = 'Me too', author = user, bug = first)
+
+	return first
+
+async def listing_queries(
+	client: httpx.AsyncClient,
+	path: str,
+	rows: int
+) -> QueryLog:
+
+	with capture_queries() as queries:
+		response: httpx.Response = await client.get(path)
+
+	assert response.status_code == 200
+	assert len(response.json()) == rows
+
+	return queries
+
+def test_project_listing_queries(serve):
+
+	async def test(client: httpx.AsyncClient) -> None:
+		await seed_projects(2)
+		few: QueryLog = await listing_queries(client, '/api/v1/projects/', rows = 2)
+
+		await seed_projects(6)
+		many: QueryLog = await listing_queries(client, '/api/v1/projects/', rows = 8)
+
+		## the fingerprint, the listing, and a prefetch per relation - however many projects there are
+		assert many.count == few.count <= 8
+		assert not many.suspects(threshold = 5)
+
+	serve(test)
+
+def test_bug_comment_queries(serve):
+
+	async def test(client: httpx.AsyncClient) -> None:
+		bug: Bug = await seed_projects(2)
+		few: QueryLog = await listing_queries(client, f'/api/v1/projects/bug/comments/?bug_id={bug.id}', rows = 2)
+
+		await seed_projects(6)
+		many: QueryLog = await listing_queries(client, f'/api/v1/projects/bug/comments/?bug_id={bug.id}', rows = 8)
+
+		## the comments, and their authors in one prefetch
+		assert many.count == few.count == 2
+		assert not many.suspects(threshold = 5)
+
+	serve(test)
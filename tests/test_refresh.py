@@ -0,0 +1,152 @@
+import asyncio
+
+import httpx
+import pytest
+
+import api_v1.projects.settings as auth_settings
+from api_v1.projects.sweeper import TokenSweeper
+
+from conftest import (
+	PASSWORD,
+	cookie_header,
+	cookies,
+	register
+)
+
+def test_login_sets_both_tokens(serve):
+
+	async def test(client: httpx.AsyncClient) -> None:
+		await register(client, 'alice')
+
+		response: httpx.Response = await client.post('/api/v1/auth/login/', json = {
+			'username': 'alice',
+			'password': PASSWORD
+		})
+
+		assert response.status_code == 200
+		assert response.json()['username'] == 'alice'
+		assert {'token', 'refresh_token'} <= cookies(response).keys()
+
+	serve(test)
+
+def test_refresh_rotates_tokens(serve):
+
+	async def test(client: httpx.AsyncClient) -> None:
+		issued: dict[str, str] = await register(client, 'alice')
+
+		response: httpx.Response = await client.post('/api/v1/auth/refresh/', headers = cookie_header(**issued))
+		rotated: dict[str, str] = cookies(response)
+
+		assert response.status_code == 200
+		assert rotated['refresh_token'] != issued['refresh_token']
+
+		## the new access token works, the one the refresh token was used alongside doesn't
+		response = await client.post('/api/v1/auth/login/', headers = cookie_header(token = rotated['token']))
+		assert response.json()['username'] == 'alice'
+
+		response = await client.post('/api/v1/auth/login/', headers = cookie_header(token = issued['token']))
+		assert response.status_code == 401
+
+	serve(test)
+
+def test_reused_refresh_token_revokes_its_family(serve, monkeypatch):
+
+	## as if the refresh token was used again long after it was rotated
+	monkeypatch.setattr(auth_settings, 'AUTH_REFRESH_REUSE_GRACE_SECONDS', 0)
+
+	async def test(client: httpx.AsyncClient) -> None:
+		issued: dict[str, str] = await register(client, 'alice')
+
+		rotated: dict[str, str] = cookies(
+			await client.post('/api/v1/auth/refresh/', headers = cookie_header(**issued))
+		)
+
+		## the first refresh token, used again - by whoever stole it, or by its owner after the thief
+		response: httpx.Response = await client.post('/api/v1/auth/refresh/', headers = cookie_header(
+			refresh_token = issued['refresh_token']
+		))
+		assert response.status_code == 401
+
+		## every token of the family is revoked, including the ones it was rotated for
+		response = await client.post('/api/v1/auth/refresh/', headers = cookie_header(
+			refresh_token = rotated['refresh_token']
+		))
+		assert response.status_code == 401
+
+		response = await client.post('/api/v1/auth/login/', headers = cookie_header(token = rotated['token']))
+		assert response.status_code == 401
+
+	serve(test)
+
+def test_refresh_token_is_not_an_access_token(serve):
+
+	async def test(client: httpx.AsyncClient) -> None:
+		issued: dict[str, str] = await register(client, 'alice')
+
+		response: httpx.Response = await client.post('/api/v1/auth/login/', headers = cookie_header(
+			token = issued['refresh_token']
+		))
+
+		assert response.status_code == 401
+
+	serve(test)
+
+def test_concurrent_refreshes_keep_the_family(serve):
+
+	async def test(client: httpx.AsyncClient) -> None:
+		issued: dict[str, str] = await register(client, 'alice')
+
+		## two tabs, refreshing with the same token at once
+		responses: list[httpx.Response] = await asyncio.gather(*[
+			client.post('/api/v1/auth/refresh/', headers = cookie_header(**issued))
+			for _ in range(2)
+		])
+
+		assert [response.status_code for response in responses] == [200, 200]
+
+		## only one of them was rotated, and the tokens it was rotated for still work
+		rotated: list[dict[str, str]] = [cookies(response) for response in responses if 'refresh_token' in cookies(response)]
+		assert len(rotated) == 1
+
+		response: httpx.Response = await client.post('/api/v1/auth/refresh/', headers = cookie_header(
+			refresh_token = rotated[0]['refresh_token']
+		))
+		assert response.status_code == 200
+
+	serve(test)
+
+def test_refreshes_dont_use_up_logins(serve):
+
+	async def test(client: httpx.AsyncClient) -> None:
+		issued: dict[str, str] = await register(client, 'alice')
+
+		for _ in range(2):
+			issued = cookies(await client.post('/api/v1/auth/refresh/', headers = cookie_header(**issued)))
+
+		response: httpx.Response = await client.post('/api/v1/auth/refresh/', headers = cookie_header(**issued))
+		assert response.status_code == 429
+
+		response = await client.post('/api/v1/auth/login/', json = {'username': 'alice', 'password': PASSWORD})
+		assert response.status_code == 200
+
+	serve(test, AUTH_RATE_LIMIT_REFRESH_BURST = 2, AUTH_RATE_LIMIT_REFRESH_PER_MINUTE = 0.01, AUTH_RATE_LIMIT_IP_BURST = 2)
+
+def test_sweeper_keeps_a_rotated_token_until_its_grace_period_is_over(serve):
+
+	async def test(client: httpx.AsyncClient) -> None:
+		issued: dict[str, str] = await register(client, 'alice')
+
+		response: httpx.Response = await client.post('/api/v1/auth/refresh/', headers = cookie_header(**issued))
+		rotated: dict[str, str] = cookies(response)
+
+		await TokenSweeper(interval_seconds = 60, batch_size = 100, max_batches = 10).sweep()
+
+		## another tab, refreshing with the token the first one just rotated
+		response = await client.post('/api/v1/auth/refresh/', headers = cookie_header(**issued))
+		assert response.status_code == 200
+
+		## and the family is still there
+		response = await client.post('/api/v1/auth/refresh/', headers = cookie_header(**rotated))
+		assert response.status_code == 200
+
+	serve(test)
@@ -0,0 +1,39 @@
+import httpx
+import pytest
+from starlette.routing import (
+	Mount,
+	Route
+)
+
+from api_v1.timing import route_index
+
+async def health(request):
+	...
+
+async def get_item(request):
+	...
+
+def test_route_index_follows_mounts():
+
+	assert route_index([
+		Route('/health/', health),
+		Mount('/api', routes = [Route('/items/{item_id}/', get_item)])
+	]) == {
+		health: ('health', '/health/'),
+		get_item: ('get_item', '/api/items/{item_id}/')
+	}
+
+@pytest.mark.parametrize('path, name', [
+	('/api/v1/projects/', 'get_projects'),
+	('/api/v1/projects/bug/comments/?bug_id=1', 'get_bug_comments'),
+	('/api/v1/unknown/', ''),
+])
+def test_responses_are_named_by_their_route(serve, path, name):
+
+	async def test(client: httpx.AsyncClient) -> None:
+		response: httpx.Response = await client.get(path)
+
+		assert response.headers['X-Route-Name'] == name
+		assert float(response.headers['X-Process-Time']) > 0
+
+	serve(test)
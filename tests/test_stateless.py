@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+import httpx
+
+from api_v1 import initialiser
+from api_v1.projects.revocation import RevocationList
+
+from conftest import (
+	cookie_header,
+	register,
+	workers
+)
+
+def test_revocation_list_forgets_expired_tokens():
+
+	revocations: RevocationList = RevocationList()
+	now: float = time.time()
+
+	revocations.revoke('expired', now - 1)
+	revocations.update({'live': now + 60, 'expiring': now + 0.01})
+
+	assert not revocations.is_revoked('expired')
+	assert revocations.is_revoked('live')
+
+	revocations.purge(now + 1)
+
+	assert len(revocations) == 1
+	assert revocations.is_revoked('live')
+
+def test_token_revoked_on_one_worker_is_rejected_by_another(monkeypatch, redis):
+
+	monkeypatch.setattr(initialiser.environment_vars, 'CACHE_BACKEND', 'redis')
+	monkeypatch.setattr(initialiser.environment_vars, 'AUTH_STATELESS', True)
+
+	async def test() -> None:
+		async with workers(2) as (first, second):
+			tokens: dict[str, str] = await register(first, 'alice')
+
+			response: httpx.Response = await second.post('/api/v1/auth/login/', headers = cookie_header(**tokens))
+			assert response.json()['username'] == 'alice'
+
+			response = await first.post('/api/v1/auth/logout/', headers = cookie_header(**tokens))
+			assert response.status_code == 200
+
+			## the revocation reaches the other workers through the broker
+			await asyncio.sleep(0.05)
+
+			response = await second.post('/api/v1/auth/login/', headers = cookie_header(**tokens))
+			assert response.status_code == 401
+
+		## and a worker started later loads it from the cache
+		async with workers(1) as (third, ):
+			response = await third.post('/api/v1/auth/login/', headers = cookie_header(**tokens))
+			assert response.status_code == 401
+
+	asyncio.run(test())
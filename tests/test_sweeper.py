@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+import httpx
+from tortoise.timezone import now
+
+from api_v1.projects.models import (
+	Token,
+	User
+)
+from api_v1.projects.sweeper import TokenSweeper
+
+async def create_tokens(
+	user: User,
+	**tokens: dict
+) -> None:
+
+	for name, fields in tokens.items():
+		await Token.create(token = name, user = user, **fields)
+
+def test_sweep_deletes_expired_and_force_expired_tokens(serve):
+
+	async def test(client: httpx.AsyncClient) -> None:
+		user: User = await User.create(username = 'alice', password = 'unused')
+
+		await create_tokens(
+			user,
+			expired = {'expires': now() - timedelta(minutes = 1)},
+			revoked = {'expires': now() + timedelta(days = 1), 'force_expiration': True},
+			live = {'expires': now() + timedelta(days = 1)}
+		)
+
+		sweeper: TokenSweeper = TokenSweeper(interval_seconds = 60, batch_size = 1, max_batches = 10)
+
+		assert await sweeper.sweep() == 2
+		assert await Token.all().values_list('token', flat = True) == ['live']
+		assert sweeper.to_dict()['total_purged'] == 2
+
+	serve(test)
+
+def test_sweep_is_bounded_by_max_batches(serve):
+
+	async def test(client: httpx.AsyncClient) -> None:
+		user: User = await User.create(username = 'alice', password = 'unused')
+
+		await create_tokens(user, **{
+			f'expired{index}': {'expires': now() - timedelta(minutes = 1)}
+			for index in range(5)
+		})
+
+		sweeper: TokenSweeper = TokenSweeper(interval_seconds = 60, batch_size = 2, max_batches = 2)
+
+		assert await sweeper.sweep() == 4
+		## the rest is left to the next run
+		assert await sweeper.sweep() == 1
+		assert await Token.all().count() == 0
+
+	serve(test)
@@ -0,0 +1,104 @@
+import asyncio
+
+import httpx
+
+from api_v1.cache.backends import CacheBackend
+from api_v1.projects.models import (
+	Bug,
+	Organisation,
+	Project,
+	User
+)
+from app import app
+
+from conftest import (
+	cookie_header,
+	register
+)
+
+def test_invalidate_tags(backend):
+
+	async def test() -> None:
+		cache: CacheBackend = backend()
+
+		await cache.set('projects', b'[1]', ttl_seconds = 60, tags = ('project:*', ))
+		await cache.set('project:1', b'{}', ttl_seconds = 60, tags = ('project:1', 'project:*'))
+		await cache.set('badges', b'[]', ttl_seconds = 60, tags = ('badge:*', ))
+
+		before: list[int] = await cache.versions(['project:*', 'badge:*'])
+
+		assert await cache.invalidate_tags(['project:*']) == 2
+
+		assert await cache.get('projects') is None
+		assert await cache.get('project:1') is None
+		assert await cache.get('badges') == b'[]'
+
+		after: list[int] = await cache.versions(['project:*', 'badge:*'])
+
+		assert after[0] != before[0]
+		assert after[1] == before[1]
+
+		await cache.close()
+
+	asyncio.run(test())
+
+def test_write_invalidates_cached_listing(serve, redis):
+
+	async def test(client: httpx.AsyncClient) -> None:
+		tokens: dict[str, str] = await register(client, 'alice')
+		organisation: Organisation = await Organisation.create(name = 'Acme')
+
+		async def create_project(name: str) -> None:
+			response: httpx.Response = await client.post('/api/v1/projects/', headers = cookie_header(
+				token = tokens['token']
+			), json = {'name': name, 'client_id': organisation.id})
+
+			assert response.status_code == 200
+
+		await create_project('First')
+
+		for _ in range(2):
+			assert len((await client.get('/api/v1/projects/')).json()) == 1
+
+		## the second listing was served from the cache
+		assert sum(stats.hits for stats in app.state.cache_stats.routes.values()) == 1
+
+		await create_project('Second')
+
+		assert [project['name'] for project in (await client.get('/api/v1/projects/')).json()] == ['First', 'Second']
+
+	serve(test, CACHE_BACKEND = 'redis')
+
+def test_bug_update_invalidates_the_project_its_in(serve):
+
+	async def test(client: httpx.AsyncClient) -> None:
+		tokens: dict[str, str] = await register(client, 'alice')
+		user: User = await User.get(username = 'alice')
+		organisation: Organisation = await Organisation.create(name = 'Acme')
+		first: Project = await Project.create(name = 'First', author = user, client = organisation)
+		second: Project = await Project.create(name = 'Second', author = user, client = organisation)
+		bug: Bug = await Bug.create(content = 'Broken', owner = user, project = first)
+
+		async def bug_contents() -> list[str]:
+			response: httpx.Response = await client.get(f'/api/v1/projects/?project_id={first.id}')
+
+			return [bug['content'] for project in response.json() for bug in project['bugs']]
+
+		assert await bug_contents() == ['Broken']
+
+		## naming another project than the bug is in
+		response: httpx.Response = await client.post('/api/v1/projects/bug/', headers = cookie_header(
+			token = tokens['token']
+		), json = {
+			'id': bug.id,
+			'project_id': second.id,
+			'content': 'Fixed',
+			'status': bug.status.value,
+			'priority': bug.priority.value,
+			'allocated_to_ids': []
+		})
+		assert response.status_code == 200
+
+		assert await bug_contents() == ['Fixed']
+
+	serve(test, CACHE_BACKEND = 'memory')
@@ -0,0 +1,84 @@
+import asyncio
+import typing
+
+import httpx
+import pytest
+
+from api_v1.projects.throttle import (
+	MemoryRateLimiter,
+	RateLimiter,
+	RedisRateLimiter,
+	retry_after
+)
+
+from conftest import PASSWORD
+
+@pytest.fixture(params = ['memory', 'redis'])
+def limiter(request) -> typing.Callable[[int, float], RateLimiter]:
+
+	if request.param == 'memory':
+		return MemoryRateLimiter
+
+	fakeredis = pytest.importorskip('fakeredis.aioredis')
+	pytest.importorskip('lupa')
+
+	return lambda capacity, refill_per_second: RedisRateLimiter(
+		fakeredis.FakeRedis(),
+		'throttle:test',
+		capacity,
+		refill_per_second
+	)
+
+def test_bucket_allows_a_burst_then_waits(limiter):
+
+	async def test() -> None:
+		bucket: RateLimiter = limiter(2, 1)
+
+		assert await bucket.take('alice') == 0
+		assert await bucket.take('alice') == 0
+		assert 0 < await bucket.take('alice') <= 1
+
+		## each key has a bucket of its own
+		assert await bucket.take('bob') == 0
+
+	asyncio.run(test())
+
+def test_rate_limiter_must_implement_take():
+
+	class Incomplete(RateLimiter):
+		pass
+
+	with pytest.raises(TypeError):
+		Incomplete(1, 1)
+
+def test_retry_after_is_in_whole_seconds():
+
+	assert retry_after(0.2) == '1'
+	assert retry_after(2.5) == '3'
+
+def test_logins_past_the_burst_are_throttled(serve):
+
+	async def test(client: httpx.AsyncClient) -> None:
+		responses: list[httpx.Response] = [
+			await client.post('/api/v1/auth/login/', json = {'username': 'alice', 'password': PASSWORD})
+			for _ in range(3)
+		]
+
+		assert [response.status_code for response in responses] == [401, 401, 429]
+		assert int(responses[-1].headers['Retry-After']) >= 1
+
+	serve(test, AUTH_RATE_LIMIT_USERNAME_BURST = 2, AUTH_RATE_LIMIT_USERNAME_PER_MINUTE = 0.01)
+
+@pytest.mark.parametrize('body', [
+	{'password': PASSWORD},
+	{'username': '', 'password': PASSWORD},
+	{'username': None, 'password': PASSWORD},
+])
+def test_login_without_username_is_unauthorised(serve, body):
+
+	async def test(client: httpx.AsyncClient) -> None:
+		response: httpx.Response = await client.post('/api/v1/auth/login/', json = body)
+
+		assert response.status_code == 401
+
+	serve(test)
@@ -0,0 +1,84 @@
+import asyncio
+import re
+import typing
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from api_v1.timing import (
+	RequestTimings,
+	TimingMiddleware,
+	current_timings,
+	timed
+)
+
+def timings_of(
+	stages: typing.Callable[[], typing.Awaitable[None]]
+) -> RequestTimings:
+	'''
+		Runs stages as if in a request being timed, and returns its timings
+	'''
+
+	async def run() -> RequestTimings:
+		timings: RequestTimings = RequestTimings()
+		current_timings.set(timings)
+
+		await stages()
+
+		return timings
+
+	return asyncio.run(run())
+
+def test_nested_stage_is_only_counted_once():
+
+	async def stages() -> None:
+		with timed('serialise'):
+			await asyncio.sleep(0.02)
+
+			with timed('db'):
+				await asyncio.sleep(0.02)
+
+	timings: RequestTimings = timings_of(stages)
+
+	assert timings.counts == {'db': 1, 'serialise': 1}
+	assert timings.durations['db'] == pytest.approx(0.02, abs = 0.01)
+	assert timings.durations['serialise'] == pytest.approx(0.02, abs = 0.01)
+
+def test_concurrent_stages_each_count_in_full():
+
+	async def query() -> None:
+		with timed('db'):
+			await asyncio.sleep(0.03)
+
+	async def stages() -> None:
+		## as Tortoise runs its prefetches
+		with timed('serialise'):
+			await asyncio.gather(query(), query())
+
+	timings: RequestTimings = timings_of(stages)
+
+	assert timings.counts == {'db': 2, 'serialise': 1}
+	assert timings.durations['db'] == pytest.approx(0.06, abs = 0.01)
+	## only the time the queries covered is taken off, once
+	assert 0 <= timings.durations['serialise'] < 0.01
+
+def test_server_timing_header():
+
+	async def endpoint(request) -> PlainTextResponse:
+		with timed('db'):
+			await asyncio.sleep(0.01)
+
+		return PlainTextResponse('')
+
+	app: TimingMiddleware = TimingMiddleware(Starlette(routes = [Route('/', endpoint)]), server_timing = True)
+
+	async def test() -> None:
+		async with httpx.AsyncClient(transport = httpx.ASGITransport(app = app), base_url = 'http://test') as client:
+			header: str = (await client.get('/')).headers['Server-Timing']
+
+		assert re.fullmatch(r'db;dur=\d+\.\d\d;desc="1", total;dur=\d+\.\d\d', header)
+
+	asyncio.run(test())
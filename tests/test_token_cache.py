@@ -0,0 +1,37 @@
+import asyncio
+
+import httpx
+import pytest
+
+from api_v1 import initialiser
+
+from conftest import (
+	cookie_header,
+	register,
+	workers
+)
+
+@pytest.mark.parametrize('cache_backend', ['none', 'memory', 'redis'])
+def test_token_revoked_on_one_worker_is_rejected_by_another(monkeypatch, redis, cache_backend):
+
+	## the token cache is chosen as the application is built
+	monkeypatch.setattr(initialiser.environment_vars, 'CACHE_BACKEND', cache_backend)
+
+	async def test() -> None:
+		async with workers(2) as (first, second):
+			tokens: dict[str, str] = await register(first, 'alice')
+
+			## verified, and cached if there's a token cache, by the second worker
+			response: httpx.Response = await second.post('/api/v1/auth/login/', headers = cookie_header(**tokens))
+			assert response.json()['username'] == 'alice'
+
+			response = await first.post('/api/v1/auth/logout/', headers = cookie_header(**tokens))
+			assert response.status_code == 200
+
+			## the invalidation reaches the other workers through the broker
+			await asyncio.sleep(0.05)
+
+			response = await second.post('/api/v1/auth/login/', headers = cookie_header(**tokens))
+			assert response.status_code == 401
+
+	asyncio.run(test())
@@ -0,0 +1,50 @@
+import httpx
+import pytest
+
+from api_v1.projects.models import (
+	Organisation,
+	Project,
+	User
+)
+from api_v1.queries import capture_queries
+
+from conftest import (
+	cookie_header,
+	register
+)
+
+def test_token_user_is_resolved_in_one_query(serve):
+
+	async def test(client: httpx.AsyncClient) -> None:
+		tokens: dict[str, str] = await register(client, 'alice')
+
+		with capture_queries() as queries:
+			response: httpx.Response = await client.post('/api/v1/auth/login/', headers = cookie_header(
+				token = tokens['token']
+			))
+
+		assert response.json()['username'] == 'alice'
+		assert queries.count == 1
+
+	## without Redis there's no token cache, so the token is looked up every time
+	serve(test)
+
+def test_user_from_identity_cant_be_saved(serve):
+
+	async def test(client: httpx.AsyncClient) -> None:
+		await register(client, 'alice')
+		stored: User = await User.get(username = 'alice')
+		user: User = User.from_identity(id = stored.id, username = 'alice')
+
+		with pytest.raises(RuntimeError):
+			await user.save()
+
+		## its row, and password, are as they were
+		assert (await User.get(id = stored.id)).password == stored.password
+
+		## but it can still be related to other rows
+		organisation: Organisation = await Organisation.create(name = 'Acme')
+		project: Project = await Project.create(name = 'First', author = user, client = organisation)
+		assert (await Project.get(id = project.id)).author_id == stored.id
+
+	serve(test)
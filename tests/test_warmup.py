@@ -0,0 +1,45 @@
+import asyncio
+
+import httpx
+
+from api_v1 import initialiser
+from api_v1.cache.stats import RouteCacheStats
+from app import app
+
+from conftest import workers
+
+def test_ready_needs_no_token(monkeypatch):
+
+	monkeypatch.setattr(initialiser.environment_vars, 'INTERNAL_ENDPOINTS_ENABLED', False)
+
+	async def test() -> None:
+		async with workers(1) as (client, ):
+			response: httpx.Response = await client.get('/api/v1/internal/ready/')
+
+			assert response.status_code == 200
+			assert response.json() == {'ready': True}
+
+			## while the operator endpoints are off
+			assert (await client.get('/api/v1/internal/cache/stats/')).status_code == 404
+
+	asyncio.run(test())
+
+def test_warmup_fills_the_cache_before_ready(serve):
+
+	async def test(client: httpx.AsyncClient) -> None:
+		await app.state.warmup
+
+		assert (await client.get('/api/v1/internal/ready/')).json() == {'ready': True}
+		assert (await client.get('/api/v1/projects/')).status_code == 200
+
+		stats: RouteCacheStats = app.state.cache_stats.route('get_projects')
+
+		## filled by the warmup, so the first client request is a hit
+		assert (stats.fills, stats.hits, stats.misses) == (1, 1, 1)
+
+	serve(
+		test,
+		CACHE_BACKEND = 'memory',
+		CACHE_WARMUP_ENABLED = True,
+		CACHE_WARMUP_PATHS = ['/api/v1/projects/']
+	)